@@ -0,0 +1,45 @@
+"""
+Production server: gunicorn forking uvicorn workers.
+
+    gunicorn main:app                      # from backend/, which holds this file
+    WEB_CONCURRENCY=8 gunicorn main:app
+
+preload_app imports the app once in the master and when_ready loads the
+read-only data (routes.serving.preload) before any worker is forked, so
+per-worker memory is what a request needs, not another copy of the risk
+tables. On SIGTERM each worker stops accepting, lets in-flight requests
+finish (DRAIN_TIMEOUT), then drains jobs and queued writes in the app's
+lifespan shutdown; GRACEFUL_TIMEOUT must cover all of it.
+
+For development keep `uvicorn main:app --reload`.
+"""
+import multiprocessing, os, tempfile
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "routes.serving.Worker"
+preload_app = True
+# request drain (DRAIN_TIMEOUT, 60: an analysis with tips can take ~40s)
+# + jobs (30) + writes (30) + audit (10)
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "140"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = 5
+# proxies whose X-Forwarded-For is trusted for the client IP, which admission
+# uses for anonymous requests; set to the load balancer's address (or "*"
+# when only it can reach the workers) or they all share its bucket
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+accesslog = "-"
+
+# the web workers are the parallelism here: score on a thread rather than a
+# spawned pool per worker, and run one job process per worker
+os.environ.setdefault("CPU_POOL_WORKERS", "0")
+os.environ.setdefault("JOB_WORKERS", "1")
+
+# one directory for this master's workers, so /metrics and /internal answer
+# for all of them (routes.worker_state); set before the app is imported
+os.environ.setdefault("WORKER_STATE_DIR", os.path.join(tempfile.gettempdir(), f"geneguard_workers_{os.getpid()}"))
+
+def when_ready(server):
+    # after the app is imported, before the first fork
+    from routes.serving import preload
+    preload()
@@ -1,16 +1,15 @@
 # main.py
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
 from pathlib import Path
-import io, csv, tempfile, shutil, uuid, os
+from contextlib import asynccontextmanager
+import tempfile, uuid, os
 
-from services.disease_ranker import disease_scores
-from services.genome_parser import parse_genome_file  # TXT handler
-from services.vcf_reader import stream_variants     # VCF handler
-from services.annotate import annotate_variants
-from services.burden import burden_scores
-from services.risk_annotator import annotate_risks
+from services import pipeline
+from services.pipeline import DISCLAIMER_TXT
+from services import cpu_pool
+from services.cpu_pool import CPUTaskTimeout
+from services.metrics import ANALYSES, stage_timer
 
 # Database imports
 from sqlalchemy import create_engine, text 
@@ -21,18 +20,37 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 from routes.database import get_db
-from routes.database_routes import router as database_router, get_firebase_uid, log_action
+from routes.database_routes import router as database_router, get_firebase_uid, log_action, save_analysis, analysis_writer
+from routes.write_queue import QueueFull
+from routes.audit import audit_writer
+from routes.export_routes import router as export_router
+from routes.internal_routes import router as internal_router
+from routes.job_routes import router as job_router, job_runner
+from routes.admission import AdmissionMiddleware
+from routes.profiling import ProfilingMiddleware
+from routes.metrics_routes import router as metrics_router
+from routes.worker_state import worker_state
 
 TMPDIR = Path(tempfile.gettempdir())
 SUPPORTED_DISEASES = ["alzheimers", "CHD", "hypertension", "multiple_sclerosis", "obesity",
                         "parkinsons", "stroke", "T1D", "T2D", "rheumatoid_arthritis"]
 
-DISCLAIMER_TXT = (
-    "Research-grade only; not a diagnostic tool. "
-    "Consult a licensed genetic counselor before acting."
-)
-
-app = FastAPI(title="GeneGuard API", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit_writer.start()
+    analysis_writer.start()
+    job_runner.start()
+    worker_state.start()
+    yield
+    worker_state.stop()
+    job_runner.stop(timeout=30)  # unfinished jobs go back to the queue
+    analysis_writer.stop(timeout=30)
+    cpu_pool.shutdown()
+    audit_writer.stop(timeout=10)  # last, so drained analyses get their audit rows
+
+app = FastAPI(title="GeneGuard API", version="0.2.0", lifespan=lifespan)
+# added before CORS so CORS wraps it and its 503s carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -45,17 +63,21 @@ app.add_middleware(
     allow_credentials=True,
     expose_headers=["*"]
 )
+# outermost, so a profile covers the whole request; a pass-through while profiling is off
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(database_router)
+app.include_router(export_router)
+app.include_router(internal_router)
+app.include_router(job_router)
+app.include_router(metrics_router)
 
 # utility
 def _detect_handler(filename: str):
-    if filename.endswith((".txt", ".tsv")):
-        return "TXT"
-    elif filename.endswith((".vcf", ".vcf.gz")):
-        return "VCF"
-    else:
+    handler = pipeline.file_kind(filename)
+    if handler is None:
         raise HTTPException(415, "Unsupported file type")
+    return handler
 
 # bad in-mem store (swap for DB later) (i got rid of this)
 # _USER_STORE: dict[str, dict] = {}
@@ -70,169 +92,98 @@ async def upload_genome(
     background: BackgroundTasks,
     disease: str,
     file: UploadFile = File(...),
-    max_records: int = 10_000,
+    max_records: Optional[int] = None,  # None: pipeline.record_limit decides
     firebase_uid: Optional[str] = None, 
     db: Session = Depends(get_db)
 ):
     if disease not in SUPPORTED_DISEASES:
         raise HTTPException(400, "Unsupported disease")
 
-    handler = _detect_handler(file.filename)
-
-    # parse variants
-    if handler == "TXT":
-        raw = await file.read()
-        genes = parse_genome_file(raw, max_rsids=max_records)
-        # quick path: MyVariant already used inside parse_genome_file
-        burden = None  # burden meaningless for TXT rsID only
-
-    else:  # VCF
-        # stream parse, annotate, collapse – avoid loading file fully
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp.flush()
-            variants = stream_variants(tmp.name, max_records=max_records)
-            ann      = annotate_variants(variants)
-            burden   = burden_scores(ann, severe_only=False)
-            genes    = set(burden.keys())
-
-    # disease-risk mapping
-    risks = annotate_risks(disease, burden or genes)
+    _detect_handler(file.filename)
+
+    # streamed straight from the spooled upload; large ones should go through /jobs/upload-genome
+    try:
+        result = await pipeline.analyze_async(file.file, file.filename, disease, max_records)
+    except CPUTaskTimeout as e:
+        ANALYSES.inc(endpoint="upload", outcome="timeout")
+        raise HTTPException(504, str(e))
+    except Exception:
+        ANALYSES.inc(endpoint="upload", outcome="error")
+        raise
+    ANALYSES.inc(endpoint="upload", outcome="ok")
+
+    gene_count, risks = result["gene_count"], result["risks"]
+    gene_list, burden_vec = result["genes"], result["burden"]
     analysis_id = str(uuid.uuid4())
 
-    # persist for CSV route
-    # user_id = str(uuid.uuid4())
-    # _USER_STORE[user_id] = {
-    #     "disease": disease,
-    #     "filename": file.filename,
-    #     "genes": list(genes),
-    #     "risks": risks,
-    # }
-    
+    # persistence is write-behind; poll /analyses/{id}/status for durability
+    persistence = None
     if firebase_uid and db:
         try:
-            user_id = get_firebase_uid(db, firebase_uid)
-            
-            save_query = text("""
-                INSERT INTO genetic_analyses (id, user_id, disease, filename, gene_count)
-                VALUES (:id, :user_id, :disease, :filename, :gene_count)
-            """)
-            db.execute(save_query, {
-                "id": analysis_id, 
-                "user_id": user_id, 
-                "disease": disease, 
+            await analysis_writer.submit_async(analysis_id, {
+                "analysis_id": analysis_id,
+                "firebase_uid": firebase_uid,
+                "disease": disease,
                 "filename": file.filename,
-                "gene_count": len(genes)
+                "gene_count": gene_count,
+                "risks": risks,
+                "genes": gene_list,
+                "burden": burden_vec
             })
+            persistence = "pending"
+
+        except (QueueFull, OSError):
+            # queue is backed up or the spool is unwritable: write inline
+            try:
+                user_id = get_firebase_uid(db, firebase_uid)
+                with stage_timer("persist", "upload"):
+                    save_analysis(db, analysis_id, user_id, disease, file.filename, gene_count, risks,
+                                  gene_list, burden_vec)
+                log_action(db, user_id, "analyze_genome", "analysis", analysis_id)
+                persistence = "durable"
             
-            # save the risk results
-            if risks:
-                for risk in risks:
-                    risk_id = str(uuid.uuid4())
-                    risk_query = text(""" 
-                        INSERT INTO risk_results (id, analysis_id, gene, risk_score, risk_level, rank)
-                        VALUES (:id, :analysis_id, :gene, :risk_score, :risk_level, :rank)
-                    """)
-                    db.execute(risk_query, {
-                        "id": risk_id, 
-                        "analysis_id": analysis_id,
-                        "gene": risk.get("gene"),
-                        "risk_score": risk.get("risk"),
-                        "risk_level": risk.get("level"),
-                        "rank": risk.get("rank")
-                    })
-                    
-                    if risk.get("tips"):
-                        for idx, tip in enumerate(risk.get("tips", [])):
-                            tip_query = text("""
-                                INSERT INTO recommendations (risk_result_id, tip_text, tip_order)
-                                VALUES (:risk_result_id, :tip_text, :tip_order)                               
-                            """)
-                            db.execute(tip_query, {
-                                "risk_result_id": risk_id, 
-                                "tip_text": tip, 
-                                "tip_order": idx
-                            })
-            db.commit()
-            log_action(db, user_id, "analyze_genome", "analysis", analysis_id)
-        
-        except Exception as e:
-            db.rollback()
-            print(f"Database save error: {e}")
+            except Exception as e:
+                db.rollback()
+                print(f"Database save error: {e}")
             
     # response
     return {
         "user_id": analysis_id,
-        "gene_count": len(genes),
+        "gene_count": gene_count,
         "disease": disease,
         "risks": risks,
         "disclaimer": DISCLAIMER_TXT,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "persistence": persistence
     }
 
 @app.post("/auto-rank")
 async def auto_rank_genome(
         background: BackgroundTasks,
         file: UploadFile = File(...),
-        max_records: int = 10_000,
+        max_records: Optional[int] = None,
     ):
     """
     Upload a TXT or VCF; return the top-3 diseases ranked by aggregate risk.
     """
-    handler = _detect_handler(file.filename)
-
-    if handler == "TXT":
-        raw   = await file.read()
-        genes = parse_genome_file(raw, max_rsids=max_records)
-
-    else:   # VCF
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp.flush()
-            variants = stream_variants(tmp.name, max_records=max_records)
-            ann      = annotate_variants(variants)
-            genes    = set(g["gene"].upper() for g in (v for v in ann.values()))
-            # fallback if empty
-            if not genes:
-                raise HTTPException(400, "No mappable rsIDs in file.")
-
-    if not genes:
-        raise HTTPException(400, "No gene symbols extracted from file.")
-
-    ranked = disease_scores(genes, top_n=3)
+    _detect_handler(file.filename)
+
+    try:
+        ranked = await pipeline.auto_rank_async(file.file, file.filename, max_records)
+    except ValueError as e:
+        ANALYSES.inc(endpoint="auto_rank", outcome="no_genes")
+        raise HTTPException(400, str(e))
+    except CPUTaskTimeout as e:
+        ANALYSES.inc(endpoint="auto_rank", outcome="timeout")
+        raise HTTPException(504, str(e))
+    except Exception:
+        ANALYSES.inc(endpoint="auto_rank", outcome="error")
+        raise
+    ANALYSES.inc(endpoint="auto_rank", outcome="ok")
+
     return {
         "user_id": str(uuid.uuid4()),
-        "gene_count": len(genes),
-        "candidates": ranked,
+        "gene_count": ranked["gene_count"],
+        "candidates": ranked["candidates"],
         "disclaimer": DISCLAIMER_TXT
     }
-
-@app.get("/results/{analysis_id}/csv")
-def export_csv(analysis_id: str, db: Session = Depends(get_db)):
-    # data = _USER_STORE.get(user_id)
-    # Store in database
-    query = text("""
-        SELECT rr.gene, rr.risk_score, rr.risk_level, rr.rank
-        FROM risk_results rr
-        WHERE rr.analysis_id = :analysis_id
-        ORDER BY rr.rank
-    """)
-    result = db.execute(query, {
-        "analysis_id": analysis_id
-    })
-    rows = result.fetchall()
-    
-    if not rows:
-        raise HTTPException(404, "Result id not found")
-
-    buf = io.StringIO()
-    # writer = csv.DictWriter(buf, fieldnames=data["risks"][0].keys())
-    writer = csv.writer(buf)
-    writer.writeheader()
-    writer.writerow(["gene", "risk_score", "risk_level", "rank"])
-    writer.writerows(rows)
-    buf.seek(0)
-    headers = {
-        "Content-Disposition": f'attachment; filename="{analysis_id}.csv"'
-    }
-    return StreamingResponse(buf, media_type="text/csv", headers=headers)
\ No newline at end of file
@@ -0,0 +1,73 @@
+-- 0001_initial.sql
+-- Baseline schema. IF NOT EXISTS so databases created from the old
+-- schema.sql can adopt the migration history without being rebuilt.
+
+CREATE TABLE IF NOT EXISTS users (
+    id            UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    firebase_uid  TEXT NOT NULL UNIQUE,
+    email         TEXT,
+    display_name  TEXT,
+    phone         TEXT,
+    theme         TEXT DEFAULT 'dark',
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_login    TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS groups (
+    id           UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name         TEXT NOT NULL,
+    invite_code  TEXT NOT NULL UNIQUE,
+    creator_id   UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    id         UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    group_id   UUID NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    user_id    UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    role       TEXT NOT NULL DEFAULT 'member',
+    joined_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS genetic_analyses (
+    id             UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id        UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    disease        TEXT NOT NULL,
+    filename       TEXT,
+    gene_count     INTEGER,
+    analysis_date  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS risk_results (
+    id           UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    analysis_id  UUID NOT NULL REFERENCES genetic_analyses(id) ON DELETE CASCADE,
+    gene         TEXT NOT NULL,
+    risk_score   DOUBLE PRECISION,
+    risk_level   TEXT,
+    rank         INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS recommendations (
+    id              UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    risk_result_id  UUID NOT NULL REFERENCES risk_results(id) ON DELETE CASCADE,
+    tip_text        TEXT NOT NULL,
+    tip_order       INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS shared_analyses (
+    id           UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    analysis_id  UUID NOT NULL REFERENCES genetic_analyses(id) ON DELETE CASCADE,
+    group_id     UUID NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    shared_by    UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    shared_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (analysis_id, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS audit_log (
+    id             BIGSERIAL PRIMARY KEY,
+    user_id        UUID,
+    action         TEXT NOT NULL,
+    resource_type  TEXT,
+    resource_id    TEXT,
+    created_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,50 @@
+-- 0002_hot_query_indexes.sql
+-- Indexes for the queries in routes/database_routes.py. Column order
+-- follows each query's filter then its ORDER BY, so the keyset pages
+-- read straight off the index. users(firebase_uid) is already covered
+-- by its UNIQUE constraint (sync_user's ON CONFLICT needs it).
+
+-- risk lists per analysis, ordered by rank
+CREATE INDEX IF NOT EXISTS risk_results_analysis_rank_idx
+    ON risk_results (analysis_id, rank);
+
+-- tips per risk row, ordered
+CREATE INDEX IF NOT EXISTS recommendations_risk_order_idx
+    ON recommendations (risk_result_id, tip_order);
+
+-- membership checks; also stops a user joining the same group twice.
+-- join_group's check-then-insert could race into duplicates before this
+-- index, so keep one row per member first: the creator row if any, else
+-- the earliest join
+DELETE FROM group_members gm
+USING (
+    SELECT id, row_number() OVER (
+        PARTITION BY group_id, user_id
+        ORDER BY (role = 'creator') DESC, joined_at, id
+    ) AS n
+    FROM group_members
+) ranked
+WHERE gm.id = ranked.id AND ranked.n > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS group_members_group_user_idx
+    ON group_members (group_id, user_id);
+
+-- "my groups"
+CREATE INDEX IF NOT EXISTS group_members_user_idx
+    ON group_members (user_id);
+
+-- member list, paged by join time
+CREATE INDEX IF NOT EXISTS group_members_group_joined_idx
+    ON group_members (group_id, joined_at, id);
+
+-- group feed, newest share first
+CREATE INDEX IF NOT EXISTS shared_analyses_group_shared_idx
+    ON shared_analyses (group_id, shared_at DESC, id DESC);
+
+-- has_shared flag in the member list
+CREATE INDEX IF NOT EXISTS shared_analyses_group_sharer_idx
+    ON shared_analyses (group_id, shared_by);
+
+-- analysis history, newest first
+CREATE INDEX IF NOT EXISTS genetic_analyses_user_date_idx
+    ON genetic_analyses (user_id, analysis_date DESC, id DESC);
@@ -0,0 +1,40 @@
+-- 0003_analysis_summaries.sql
+-- One compact row per analysis, written by save_analysis, so list views
+-- (history, group feeds) never aggregate risk_results. Detail views
+-- still read the full risk list.
+
+CREATE TABLE IF NOT EXISTS analysis_summaries (
+    analysis_id    UUID PRIMARY KEY REFERENCES genetic_analyses(id) ON DELETE CASCADE,
+    top_risks      JSONB NOT NULL DEFAULT '[]',  -- [{gene, risk, level, rank}], best 10 by rank
+    gene_count     INTEGER,
+    risk_count     INTEGER NOT NULL DEFAULT 0,
+    top_score      DOUBLE PRECISION,             -- highest single-gene risk
+    disease_score  DOUBLE PRECISION              -- sum of matched gene risks
+);
+
+-- backfill analyses saved before this migration
+INSERT INTO analysis_summaries (analysis_id, top_risks, gene_count, risk_count, top_score, disease_score)
+SELECT ga.id,
+       COALESCE(top.risks, '[]'::jsonb),
+       ga.gene_count,
+       COALESCE(agg.risk_count, 0),
+       agg.top_score,
+       agg.disease_score
+FROM genetic_analyses ga
+LEFT JOIN LATERAL (
+    SELECT COUNT(*) AS risk_count, MAX(risk_score) AS top_score, SUM(risk_score) AS disease_score
+    FROM risk_results
+    WHERE analysis_id = ga.id
+) agg ON TRUE
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object('gene', t.gene, 'risk', t.risk_score, 'level', t.risk_level, 'rank', t.rank)
+                     ORDER BY t.rank) AS risks
+    FROM (
+        SELECT gene, risk_score, risk_level, rank
+        FROM risk_results
+        WHERE analysis_id = ga.id
+        ORDER BY rank
+        LIMIT 10
+    ) t
+) top ON TRUE
+ON CONFLICT (analysis_id) DO NOTHING;
@@ -0,0 +1,15 @@
+-- 0004_analysis_inputs.sql
+-- What an analysis was scored from, so it can be re-scored when the
+-- ADAGIO tables change without the user re-uploading anything.
+
+CREATE TABLE IF NOT EXISTS analysis_inputs (
+    analysis_id         UUID PRIMARY KEY REFERENCES genetic_analyses(id) ON DELETE CASCADE,
+    genes               TEXT[] NOT NULL,     -- sorted gene symbols found in the upload
+    burden              INTEGER[],           -- impact burden aligned with genes; NULL for rsID-only (TXT) uploads
+    risk_table_version  TEXT NOT NULL,       -- adagio_loader.risk_table_version() used to score
+    scored_at           TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- the re-scoring job looks for analyses on an old version
+CREATE INDEX IF NOT EXISTS analysis_inputs_version_idx
+    ON analysis_inputs (risk_table_version, analysis_id);
@@ -0,0 +1,164 @@
+# routes/admission.py
+"""
+Admission control for the expensive analysis endpoints.
+
+Checked in ASGI middleware before the upload body is read, so a request
+over the limits costs a header parse and a fast 503 with Retry-After,
+not a spooled upload. Limits are per worker process:
+
+    ADMISSION_MAX_CONCURRENT   analyses running at once
+    ADMISSION_MAX_BYTES        request bytes (Content-Length) admitted at once
+    ADMISSION_MAX_PER_USER     analyses one user may run at once
+
+A user is the request's firebase_uid, or its client IP when it names
+none. Keying signed-in traffic on the IP would put everyone behind one
+NAT, or every request behind a proxy that isn't trusted, in a single
+bucket. The uid is an unverified query parameter, so this limit keeps
+honest clients from starving each other; the worker-wide limits above
+are what bound a caller who rotates uids. Anonymous requests need the
+real client IP: behind a reverse proxy, list it in FORWARDED_ALLOW_IPS
+(see gunicorn.conf.py; uvicorn --forwarded-allow-ips in development).
+"""
+import json, os, threading
+from typing import Optional
+from urllib.parse import unquote
+
+ADMITTED_PATHS = {
+    "/upload-genome", "/auto-rank",
+    "/jobs/upload-genome", "/jobs/auto-rank",
+}
+
+class AdmissionController:
+    def __init__(
+            self,
+            max_concurrent: int = 4,
+            max_bytes: int = 512 << 20,
+            max_per_user: int = 2,
+            unknown_bytes: int = 50 << 20,
+            retry_after: int = 5,
+        ):
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.max_per_user = max_per_user
+        self.unknown_bytes = unknown_bytes  # charged when there's no Content-Length
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self.active = 0
+        self.active_bytes = 0
+        self._per_user: dict[str, int] = {}
+        self.stats = {"admitted": 0, "rejected_concurrency": 0, "rejected_bytes": 0, "rejected_user": 0}
+
+    def try_admit(self, users: tuple[str, ...], nbytes: Optional[int]) -> Optional[str]:
+        """Reserve capacity, charged to every key in users; return None if admitted, else the limit hit."""
+        nbytes = self.unknown_bytes if nbytes is None else nbytes
+        with self._lock:
+            if self.active >= self.max_concurrent:
+                reason = "concurrency"
+            elif self.active and self.active_bytes + nbytes > self.max_bytes:
+                # an idle worker always admits one request, however large
+                reason = "bytes"
+            elif any(self._per_user.get(u, 0) >= self.max_per_user for u in users):
+                reason = "user"
+            else:
+                self.active += 1
+                self.active_bytes += nbytes
+                for u in users:
+                    self._per_user[u] = self._per_user.get(u, 0) + 1
+                self.stats["admitted"] += 1
+                return None
+
+            self.stats[f"rejected_{reason}"] += 1
+            return reason
+
+    def release(self, users: tuple[str, ...], nbytes: Optional[int]):
+        nbytes = self.unknown_bytes if nbytes is None else nbytes
+        with self._lock:
+            self.active -= 1
+            self.active_bytes -= nbytes
+            for u in users:
+                left = self._per_user.get(u, 1) - 1
+                if left:
+                    self._per_user[u] = left
+                else:
+                    self._per_user.pop(u, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "active_bytes": self.active_bytes,
+                "active_users": len(self._per_user),
+                "max_concurrent": self.max_concurrent,
+                "max_bytes": self.max_bytes,
+                "max_per_user": self.max_per_user,
+                **self.stats,
+            }
+
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "4")),
+    max_bytes=int(os.getenv("ADMISSION_MAX_BYTES", str(512 << 20))),
+    max_per_user=int(os.getenv("ADMISSION_MAX_PER_USER", "2")),
+    unknown_bytes=int(os.getenv("ADMISSION_UNKNOWN_BYTES", str(50 << 20))),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "5")),
+)
+
+MESSAGES = {
+    "concurrency": "Server is busy with other analyses; try again shortly",
+    "bytes": "Server is busy with other uploads; try again shortly",
+    "user": "You already have analyses running; wait for them to finish",
+}
+
+def client_key(scope) -> str:
+    """The request's user bucket: its firebase_uid if given, else its client IP. Takes a scope or Request."""
+    for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+        name, _, value = pair.partition("=")
+        if name == "firebase_uid" and value:
+            return "uid:" + unquote(value)
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+def user_keys(scope) -> tuple[str, ...]:
+    """Every bucket a request counts against."""
+    return (client_key(scope),)
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+class AdmissionMiddleware:
+    """Pure ASGI, so it can answer before anything reads the body."""
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in ADMITTED_PATHS:
+            return await self.app(scope, receive, send)
+
+        users, nbytes = user_keys(scope), _content_length(scope)
+        reason = self.controller.try_admit(users, nbytes)
+        if reason:
+            body = json.dumps({"detail": MESSAGES[reason]}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.controller.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(users, nbytes)
@@ -0,0 +1,107 @@
+# routes/audit.py
+"""
+Buffered audit log writer.
+
+log_action() used to INSERT and commit on the request's session. Events
+now go onto a bounded in-process queue and a background thread writes
+them in batches, flushing when a batch fills up or the interval passes.
+When the queue is full, events are dropped (AUDIT_OVERFLOW=drop, the
+default) or the caller waits up to AUDIT_BLOCK_TIMEOUT seconds for room
+(AUDIT_OVERFLOW=block) before dropping.
+"""
+import os, queue, threading, time
+from typing import Optional
+from .database import SessionLocal, bulk_insert
+
+AUDIT_COLUMNS = ["user_id", "action", "resource_type", "resource_id"]
+
+class AuditLogWriter:
+    def __init__(
+            self,
+            maxsize: int = 10_000,
+            batch_size: int = 500,
+            flush_interval: float = 1.0,
+            overflow: str = "drop",
+            block_timeout: float = 0.05,
+        ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flush everything still buffered, then stop."""
+        if self._thread is None:
+            return
+        self._queue.put(None)  # blocks until there is room: shutdown must not drop the sentinel
+        self._thread.join(timeout)
+        self._thread = None
+
+    def put(self, event: dict) -> bool:
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+        self.stats["queued"] += 1
+        return True
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch, stopping = [], False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            if batch:
+                self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: list[dict]):
+        db = SessionLocal()
+        try:
+            bulk_insert(db, "audit_log", AUDIT_COLUMNS, batch)
+            db.commit()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            db.rollback()
+            self.stats["failed"] += len(batch)
+            print(f"Audit log flush error ({len(batch)} events): {e}")
+        finally:
+            db.close()
+
+audit_writer = AuditLogWriter(
+    maxsize=int(os.getenv("AUDIT_QUEUE_MAX", "10000")),
+    batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0")),
+    overflow=os.getenv("AUDIT_OVERFLOW", "drop"),
+    block_timeout=float(os.getenv("AUDIT_BLOCK_TIMEOUT", "0.05")),
+)
@@ -1,21 +1,37 @@
 # database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 from dotenv import load_dotenv
+from .pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool, instrument
 
 load_dotenv()
 
+def _pool_settings(prefix: str) -> dict:
+    """
+    Pool sizing per deployment, e.g. DB_POOL_SIZE / DB_MAX_OVERFLOW for the
+    sync engine and DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW for the async
+    one (falling back to the DB_* values).
+    """
+    def setting(name: str, default: str) -> str:
+        return os.getenv(f"{prefix}{name}", os.getenv(f"DB_{name}", default))
+
+    return {
+        "pool_size": int(setting("POOL_SIZE", "5")),
+        "max_overflow": int(setting("MAX_OVERFLOW", "10")),
+        "pool_timeout": float(setting("POOL_TIMEOUT", "30")),
+        "pool_recycle": int(setting("POOL_RECYCLE", "3600")),
+        "pool_pre_ping": setting("POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/geneguard")
 engine = create_engine(
     DATABASE_URL, 
-    poolclass=QueuePool, 
-    pool_size=5, 
-    max_overflow=10,
-    pool_pre_ping=True,
-    pool_recycle=3600,
+    poolclass=InstrumentedQueuePool, 
+    **_pool_settings("DB_"),
 )
+instrument(engine, InstrumentedQueuePool.stats)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
@@ -23,4 +39,49 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# async path (asyncpg) for handlers that should not block the event loop
+def _async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgresql", "postgres", "postgresql+psycopg2"):
+        scheme = "postgresql+asyncpg"
+    return scheme + sep + rest
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    **_pool_settings("DB_ASYNC_"),
+)
+instrument(async_engine.sync_engine, InstrumentedAsyncQueuePool.stats)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Postgres caps a statement at 65535 bind params; stay well under it
+MAX_BIND_PARAMS = 30_000
+
+def bulk_insert(db: Session, table: str, columns: list[str], rows: list[dict], chunk_size: int = 1_000):
+    """
+    Insert many rows with multi-row VALUES statements instead of one
+    round trip per row. Does not commit; the caller owns the transaction.
+    """
+    if not rows:
+        return
+
+    chunk_size = max(1, min(chunk_size, MAX_BIND_PARAMS // len(columns)))
+    col_list = ", ".join(columns)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        values, params = [], {}
+        for i, row in enumerate(chunk):
+            values.append("(" + ", ".join(f":{c}_{i}" for c in columns) + ")")
+            for c in columns:
+                params[f"{c}_{i}"] = row.get(c)
+
+        db.execute(text(f"INSERT INTO {table} ({col_list}) VALUES {', '.join(values)}"), params)
+
@@ -1,11 +1,21 @@
 # routes/database_routes.py 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy import text 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
-import uuid
-from .database import get_db
+from pathlib import Path
+from datetime import datetime
+import uuid, os, tempfile, json, base64
+from .database import get_db, get_async_db, bulk_insert, SessionLocal
+from .write_queue import WriteBehindQueue
+from .audit import audit_writer
+from .cache import TTLCache
+from . import http_cache
+from services.adagio_loader import risk_table_version
+from services.metrics import stage_timer
 
 router = APIRouter(tags=["database"])
 
@@ -35,8 +45,45 @@ class UserPreferences(BaseModel):
  
 def generate_invite_code():
     return str(uuid.uuid4())[:16].upper()
+
+# keyset pagination: the cursor is the (timestamp, id) of the last row served
+def _encode_cursor(ts: datetime, row_id) -> str:
+    raw = json.dumps([ts.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(ts), str(uuid.UUID(row_id))
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+def _paginate(rows: list, limit: int, response: Response, ts_col: int) -> list:
+    """Trim the look-ahead row and advertise the next page in X-Next-Cursor."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last[ts_col], last[0])
+    return rows
         
+# firebase_uid -> users.id never changes once assigned; membership can, so
+# only positive membership answers are cached and leave_group evicts them.
+# The eviction is per process, so reads may see a membership up to
+# MEMBERSHIP_CACHE_TTL late; writes that depend on it ask the database.
+_user_ids = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_MAX", "50000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "600")),
+)
+_memberships = TTLCache(
+    maxsize=int(os.getenv("MEMBERSHIP_CACHE_MAX", "50000")),
+    ttl=float(os.getenv("MEMBERSHIP_CACHE_TTL", "60")),
+)
+
 def get_firebase_uid(db: Session, firebase_uid: str):
+    user_id = _user_ids.get(firebase_uid)
+    if user_id is not None:
+        return user_id
+
     query = text("""
         SELECT id 
         FROM users 
@@ -50,26 +97,209 @@ def get_firebase_uid(db: Session, firebase_uid: str):
     if not row:
         raise HTTPException(404, "User not found. Please sync user first")
 
-    return str(row[0])
+    user_id = str(row[0])
+    _user_ids.set(firebase_uid, user_id)
+    return user_id
+
+async def get_firebase_uid_async(db: AsyncSession, firebase_uid: str):
+    user_id = _user_ids.get(firebase_uid)
+    if user_id is not None:
+        return user_id
+
+    query = text("""
+        SELECT id 
+        FROM users 
+        WHERE firebase_uid = :uid
+        LIMIT 1
+    """)
+    
+    result = await db.execute(query, {"uid": firebase_uid})
+    row = result.fetchone()
+    
+    if not row:
+        raise HTTPException(404, "User not found. Please sync user first")
+
+    user_id = str(row[0])
+    _user_ids.set(firebase_uid, user_id)
+    return user_id
+
+def is_group_member(db: Session, group_id: str, user_id: str, cached: bool = True) -> bool:
+    if cached and _memberships.get((group_id, user_id)):
+        return True
+
+    query = text("""
+        SELECT id 
+        FROM group_members
+        WHERE group_id = :group_id AND user_id = :user_id
+    """)
+    is_member = db.execute(query, {
+        "group_id": group_id,
+        "user_id": user_id
+    }).fetchone() is not None
+
+    if is_member:
+        _memberships.set((group_id, user_id), True)
+    return is_member
 
 def log_action(db: Session, user_id: str, action: str, resource_type: str, resource_id: str = None):
+    event = {
+        "user_id": user_id, 
+        "action": action, 
+        "resource_type": resource_type, 
+        "resource_id": resource_id
+    }
+    # buffered path: the request does not wait on the audit insert
+    if audit_writer.running:
+        audit_writer.put(event)
+        return
+
     try:
         query = text("""
             INSERT INTO audit_log (user_id, action, resource_type, resource_id)
             VALUES (:user_id, :action, :resource_type, :resource_id)             
         """)
-        db.execute(query, {
-            "user_id": user_id, 
-            "action": action, 
-            "resource_type": resource_type, 
-            "resource_id": resource_id
-        })
+        db.execute(query, event)
         db.commit()
     except Exception as e:
         print(f"Audi log error: {e}")
 
+# how many of the best-ranked risks a summary row keeps for list views
+SUMMARY_TOP_N = 10
+
+def _no_nan(value):
+    # pd.cut leaves NaN for ranks outside its bins; store NULL instead
+    return None if isinstance(value, float) and value != value else value
+
+def write_risks(db: Session, analysis_id: str, gene_count: int, risks: list[dict]):
+    """
+    Batch-insert an analysis's risk rows, their tips and its summary row.
+    Does not commit; used by save_analysis and the re-scoring job.
+    """
+    risk_rows, tip_rows = [], []
+    for risk in risks or []:
+        risk_id = str(uuid.uuid4())
+        risk_rows.append({
+            "id": risk_id,
+            "analysis_id": analysis_id,
+            "gene": risk.get("gene"),
+            "risk_score": risk.get("risk"),
+            "risk_level": _no_nan(risk.get("level")),
+            "rank": risk.get("rank")
+        })
+        for idx, tip in enumerate(risk.get("tips") or []):
+            tip_rows.append({
+                "risk_result_id": risk_id,
+                "tip_text": tip,
+                "tip_order": idx
+            })
+
+    scores = [r["risk_score"] for r in risk_rows if r["risk_score"] is not None]
+    top = sorted(risk_rows, key=lambda r: (r["rank"] is None, r["rank"] or 0))[:SUMMARY_TOP_N]
+    summary = {
+        "analysis_id": analysis_id,
+        "top_risks": json.dumps([{
+            "gene": r["gene"],
+            "risk": r["risk_score"],
+            "level": r["risk_level"],
+            "rank": r["rank"]
+        } for r in top]),
+        "gene_count": gene_count,
+        "risk_count": len(risk_rows),
+        "top_score": max(scores) if scores else None,
+        "disease_score": sum(scores) if scores else None
+    }
+
+    bulk_insert(db, "risk_results",
+                ["id", "analysis_id", "gene", "risk_score", "risk_level", "rank"], risk_rows)
+    bulk_insert(db, "recommendations",
+                ["risk_result_id", "tip_text", "tip_order"], tip_rows)
+    db.execute(text("""
+        INSERT INTO analysis_summaries (analysis_id, top_risks, gene_count, risk_count, top_score, disease_score)
+        VALUES (:analysis_id, CAST(:top_risks AS JSONB), :gene_count, :risk_count, :top_score, :disease_score)
+        ON CONFLICT (analysis_id) DO UPDATE SET
+            top_risks = EXCLUDED.top_risks,
+            gene_count = EXCLUDED.gene_count,
+            risk_count = EXCLUDED.risk_count,
+            top_score = EXCLUDED.top_score,
+            disease_score = EXCLUDED.disease_score
+    """), summary)
+
+def save_analysis(
+        db: Session,
+        analysis_id: str,
+        user_id: str,
+        disease: str,
+        filename: str,
+        gene_count: int,
+        risks: list[dict],
+        genes: Optional[list[str]] = None,
+        burden: Optional[list[int]] = None,
+    ):
+    """
+    Persist an analysis with its risk rows and tips in one transaction,
+    batching the child rows instead of inserting them one at a time.
+    `genes` (sorted) and the aligned `burden` vector are kept so the
+    analysis can be re-scored later without the original upload.
+    """
+    try:
+        db.execute(text("""
+            INSERT INTO genetic_analyses (id, user_id, disease, filename, gene_count)
+            VALUES (:id, :user_id, :disease, :filename, :gene_count)
+        """), {
+            "id": analysis_id,
+            "user_id": user_id,
+            "disease": disease,
+            "filename": filename,
+            "gene_count": gene_count
+        })
+        write_risks(db, analysis_id, gene_count, risks)
+        if genes is not None:
+            db.execute(text("""
+                INSERT INTO analysis_inputs (analysis_id, genes, burden, risk_table_version)
+                VALUES (:analysis_id, :genes, :burden, :version)
+            """), {
+                "analysis_id": analysis_id,
+                "genes": genes,
+                "burden": burden,
+                "version": risk_table_version()
+            })
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def _persist_analysis(payload: dict):
+    """Write-behind handler: resolve the user and save one queued analysis."""
+    db = SessionLocal()
+    try:
+        exists = db.execute(text("""
+            SELECT 1 
+            FROM genetic_analyses 
+            WHERE id = :id
+        """), {"id": payload["analysis_id"]}).fetchone()
+        if exists:
+            return  # an earlier attempt committed before failing
+
+        user_id = get_firebase_uid(db, payload["firebase_uid"])
+        with stage_timer("persist", "write_behind"):
+            save_analysis(db, payload["analysis_id"], user_id, payload["disease"],
+                          payload["filename"], payload["gene_count"], payload["risks"],
+                          payload.get("genes"), payload.get("burden"))
+        log_action(db, user_id, "analyze_genome", "analysis", payload["analysis_id"])
+    finally:
+        db.close()
+
+analysis_writer = WriteBehindQueue(
+    spool_dir=Path(os.getenv("WRITE_QUEUE_DIR", Path(tempfile.gettempdir()) / "geneguard_writes")),
+    handler=_persist_analysis,
+    maxsize=int(os.getenv("WRITE_QUEUE_MAX", "1000")),
+    max_attempts=int(os.getenv("WRITE_QUEUE_ATTEMPTS", "5")),
+    permanent_errors=(HTTPException,),  # unknown user: retrying will not help
+    stale_after=float(os.getenv("WRITE_QUEUE_STALE_AFTER", "120")),
+)
+
 @router.post("/users/sync")
-async def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
+def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
     query = text("""
         INSERT INTO users (firebase_uid, email, display_name, phone, last_login)
         VALUES (:firebase_uid, :email, :display_name, :phone, CURRENT_TIMESTAMP)
@@ -87,9 +317,11 @@ async def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
         "display_name": user_data.display_name, 
         "phone": user_data.phone
     })
+    user = result.fetchone()  # before commit, which closes the RETURNING cursor
     db.commit()
     
-    user = result.fetchone()
+    _user_ids.invalidate(user_data.firebase_uid)
+    _user_ids.set(user[1], str(user[0]))
     return {
         "id": str(user[0]),
         "firebase_uid": user[1],
@@ -99,13 +331,13 @@ async def sync_user(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.get("/users/{firebase_uid}")
-async def get_user(firebase_uid: str, db: Session = Depends(get_db)):
+async def get_user(firebase_uid: str, db: AsyncSession = Depends(get_async_db)):
     query = text("""
         SELECT id, firebase_uid, email, display_name, phone
         FROM users 
         WHERE firebase_uid = :uid
     """)
-    result = db.execute(query, {"uid": firebase_uid})
+    result = await db.execute(query, {"uid": firebase_uid})
     user = result.fetchone()
 
     if not user:
@@ -120,7 +352,7 @@ async def get_user(firebase_uid: str, db: Session = Depends(get_db)):
     }
 
 @router.put("/users/{firebase_uid}/profile")
-async def update_profile(firebase_uid: str, profile: UserUpdate, db: Session = Depends(get_db)):
+def update_profile(firebase_uid: str, profile: UserUpdate, db: Session = Depends(get_db)):
     user_id =  get_firebase_uid(db, firebase_uid)
     
     query = text("""
@@ -135,16 +367,17 @@ async def update_profile(firebase_uid: str, profile: UserUpdate, db: Session = D
         "phone": profile.phone, 
         "uid": firebase_uid
     })
+    updated = result.fetchone()  # before commit, which closes the RETURNING cursor
     db.commit()
     
-    if not result.fetchone():
+    if not updated:
         raise HTTPException(404, "User not found")
 
     log_action(db, user_id, "update_profile", "user", user_id) # have david add function for logging
     return {"success": True}
 
 @router.post("/groups")
-async def create_group(group_data: GroupCreate, firebase_uid: str, db: Session = Depends(get_db)):
+def create_group(group_data: GroupCreate, firebase_uid: str, db: Session = Depends(get_db)):
     user_id = get_firebase_uid(db, firebase_uid)
     
     invite_code = generate_invite_code()
@@ -175,6 +408,7 @@ async def create_group(group_data: GroupCreate, firebase_uid: str, db: Session =
         "user_id": user_id
     })
     db.commit()
+    _memberships.set((group_id, user_id), True)
     
     log_action(db, user_id, "create_group", "group", group_id)
     
@@ -186,7 +420,7 @@ async def create_group(group_data: GroupCreate, firebase_uid: str, db: Session =
     }
 
 @router.post("/groups/join")
-async def join_group(join_data: GroupJoin, firebase_uid: str, db: Session = Depends(get_db)):
+def join_group(join_data: GroupJoin, firebase_uid: str, db: Session = Depends(get_db)):
     user_id = get_firebase_uid(db, firebase_uid)
     
     group_query = text("""
@@ -206,17 +440,8 @@ async def join_group(join_data: GroupJoin, firebase_uid: str, db: Session = Depe
     
     group_id = str(group[0])
     
-    check_query = text("""
-        SELECT id 
-        FROM group_members
-        WHERE group_id = :group_id AND user_id = :user_id
-    """)
-    existing = db.execute(check_query, {
-        "group_id": group_id,
-        "user_id": user_id
-    }).fetchone()
-    
-    if existing:
+    # not from the cache: a leave handled by another worker hasn't evicted this one's entry
+    if is_group_member(db, group_id, user_id, cached=False):
         raise HTTPException(400, "Already a member of this group")
 
     member_query = text("""
@@ -229,29 +454,41 @@ async def join_group(join_data: GroupJoin, firebase_uid: str, db: Session = Depe
         "user_id": user_id
     })
     db.commit()
+    _memberships.set((group_id, user_id), True)
     
     log_action(db, user_id, "join_group", "group", group_id)
     
     return {"success": True, "group_name": group[1], "group_id": group_id}
 
 @router.get("/groups/{firebase_uid}")
-async def get_user_groups(firebase_uid: str, db: Session = Depends(get_db)):
-    query = text("""
+async def get_user_groups(
+        firebase_uid: str,
+        response: Response,
+        limit: int = Query(100, ge=1, le=500),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+    params = {"uid": firebase_uid, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        keyset = "AND (g.created_at, g.id) < (:cursor_ts, :cursor_id)"
+
+    query = text(f"""
         SELECT g.id, g.name, g.invite_code, g.created_at, 
                creator.display_name as creator_name,
-               COUNT(gm.id) as member_count
+               (SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.id) as member_count
         FROM groups g
         JOIN group_members my_membership ON g.id = my_membership.group_id
         JOIN users me ON my_membership.user_id = me.id
         JOIN users creator ON g.creator_id = creator.id 
-        LEFT JOIN group_members gm ON g.id = gm.group_id
-        WHERE me.firebase_uid = :uid
-        GROUP BY g.id, g.name, g.invite_code, g.created_at, creator.display_name
-        ORDER BY g.created_at DESC
+        WHERE me.firebase_uid = :uid {keyset}
+        ORDER BY g.created_at DESC, g.id DESC
+        LIMIT :limit
     """)
     
-    result = db.execute(query, {"uid": firebase_uid})
-    groups = result.fetchall()
+    result = await db.execute(query, params)
+    groups = _paginate(result.fetchall(), limit, response, ts_col=3)
     
     return [{
         "id": str(group[0]),
@@ -263,23 +500,27 @@ async def get_user_groups(firebase_uid: str, db: Session = Depends(get_db)):
     } for group in groups]
     
 @router.get("/groups/{group_id}/members")
-async def get_group_members(group_id: str, firebase_uid: str, db: Session = Depends(get_db)):
+def get_group_members(
+        group_id: str,
+        firebase_uid: str,
+        response: Response,
+        limit: int = Query(100, ge=1, le=500),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db)
+    ):
     user_id = get_firebase_uid(db, firebase_uid) 
-    check_query = text("""
-        SELECT id 
-        FROM group_members
-        WHERE group_id = :group_id AND user_id = :user_id
-    """)
-    is_member = db.execute(check_query, {
-       "group_id": group_id, 
-       "user_id": user_id
-    }).fetchone()
-   
-    if not is_member:
+    if not is_group_member(db, group_id, user_id):
        raise HTTPException(403, "Not a member of this group")
 
-    query = text("""
-        SELECT u.id, u.display_name, u.email, u.phone, gm.joined_at, gm.role,
+    params = {"group_id": group_id, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        keyset = "AND (gm.joined_at, gm.id) > (:cursor_ts, :cursor_id)"
+
+    # gm.id leads so the cursor tracks the membership row, not the user
+    query = text(f"""
+        SELECT gm.id, u.id, u.display_name, u.email, u.phone, gm.joined_at, gm.role,
             u.firebase_uid, 
             EXISTS(
                 SELECT 1 
@@ -288,29 +529,27 @@ async def get_group_members(group_id: str, firebase_uid: str, db: Session = Depe
             ) as has_shared
         FROM group_members gm
         JOIN users u ON gm.user_id = u.id 
-        WHERE gm.group_id = :group_id
-        ORDER BY gm.joined_at
+        WHERE gm.group_id = :group_id {keyset}
+        ORDER BY gm.joined_at, gm.id
+        LIMIT :limit
     """)
     
-    result = db.execute(query, {
-        "group_id": group_id
-    })
-    
-    members = result.fetchall()
+    result = db.execute(query, params)
+    members = _paginate(result.fetchall(), limit, response, ts_col=5)
     
     return [{
-        "id": str(member[0]),
-        "name": member[1],
-        "email": member[2],
-        "phone": member[3],
-        "joined_at": member[4].isoformat(),
-        "role": member[5],
-        "firebase_uid": member[6],
-        "has_shared_analysis": member[7]
+        "id": str(member[1]),
+        "name": member[2],
+        "email": member[3],
+        "phone": member[4],
+        "joined_at": member[5].isoformat(),
+        "role": member[6],
+        "firebase_uid": member[7],
+        "has_shared_analysis": member[8]
     } for member in members]
    
 @router.delete("/groups/{group_id}/leave")
-async def leave_group(group_id: str, firebase_uid: str, db: Session = Depends(get_db)):
+def leave_group(group_id: str, firebase_uid: str, db: Session = Depends(get_db)):
     user_id = get_firebase_uid(db, firebase_uid)
     
     query = text("""
@@ -324,9 +563,11 @@ async def leave_group(group_id: str, firebase_uid: str, db: Session = Depends(ge
         "group_id": group_id, 
         "user_id": user_id
     })
+    left = result.fetchone()  # before commit, which closes the RETURNING cursor
     db.commit()
+    _memberships.invalidate((group_id, user_id))
     
-    if not result.fetchone():
+    if not left:
         raise HTTPException(404, "Not a member of this group")
 
     log_action(db, user_id, "leave_group", "group", group_id)
@@ -398,9 +639,10 @@ def unshare_analysis(analysis_id: str, group_id: str, firebase_uid: str, db: Ses
         "group_id": group_id, 
         "user_id": user_id        
     })
+    unshared = user_row.fetchone()  # before commit, which closes the RETURNING cursor
     db.commit()
     
-    if not user_row.fetchone():
+    if not unshared:
         raise HTTPException(404, "Share not found")
     
     log_action(db, user_id, "unshare_analysis", "analysis", analysis_id)
@@ -408,115 +650,139 @@ def unshare_analysis(analysis_id: str, group_id: str, firebase_uid: str, db: Ses
     return {"success": True}
 
 @router.get("/groups/{group_id}/analyses")
-def view_group_analyses(group_id: str, firebase_uid: str, db: Session = Depends(get_db)):
+def view_group_analyses(
+        group_id: str,
+        firebase_uid: str,
+        response: Response,
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db)
+    ):
     user_id = get_firebase_uid(db, firebase_uid)
     
-    check_query = text("""
-        SELECT id 
-        FROM group_members 
-        WHERE group_id = :group_id AND user_id = :user_id
-    """)
-    
-    is_member = db.execute(check_query, {
-        "group_id": group_id,
-        "user_id": user_id
-    }).fetchone()
-    
-    if not is_member:
+    if not is_group_member(db, group_id, user_id):
         raise HTTPException(403, "Not a member of this group")
     
-    query = text("""
-        SELECT ga.id, ga.disease, ga.analysis_date, u.display_name, sa.shared_at,
-            json_agg(
-                json_build_object(
-                    'gene', rr.gene,
-                    'risk_score', rr.risk_score,
-                    'risk_level', rr.risk_level,
-                    'rank', rr.rank
-                ) ORDER BY rr.rank
-            ) as risks
+    params = {"group_id": group_id, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        keyset = "AND (sa.shared_at, sa.id) < (:cursor_ts, :cursor_id)"
+
+    query = text(f"""
+        SELECT sa.id, ga.id, ga.disease, ga.analysis_date, u.display_name, sa.shared_at,
+            s.top_risks
         FROM shared_analyses sa
         JOIN genetic_analyses ga ON sa.analysis_id = ga.id
         JOIN users u ON sa.shared_by = u.id 
-        LEFT JOIN risk_results rr ON ga.id = rr.analysis_id
-        WHERE sa.group_id = :group_id
-        GROUP BY ga.id, ga.disease, ga.analysis_date, u.display_name, sa.shared_at
-        ORDER BY sa.shared_at DESC
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE sa.group_id = :group_id {keyset}
+        ORDER BY sa.shared_at DESC, sa.id DESC
+        LIMIT :limit
     """)
     
-    result = db.execute(query, {
-        "group_id": group_id
-    })
-    analyses = result.fetchall()
+    result = db.execute(query, params)
+    analyses = _paginate(result.fetchall(), limit, response, ts_col=5)
     
     log_action(db, user_id, "view_shared_analysis", "group", group_id)
     
     return [{
-        "id": str(analysis[0]),
-        "disease": analysis[1],
-        "analysis_date": analysis[2],
-        "shared_by": analysis[3],
-        "shared_at": analysis[4],
-        "risks": analysis[5][:10] if analysis[5] else []
+        "id": str(analysis[1]),
+        "disease": analysis[2],
+        "analysis_date": analysis[3],
+        "shared_by": analysis[4],
+        "shared_at": analysis[5],
+        "risks": [{
+            "gene": r["gene"],
+            "risk_score": r["risk"],
+            "risk_level": r["level"],
+            "rank": r["rank"]
+        } for r in analysis[6] or []]
         } for analysis in analyses]
     
 @router.get("/users/{firebase_uid}/analyses")
-async def get_user_analyses(firebase_uid: str, db: Session = Depends(get_db)):
-    user_id = get_firebase_uid(db, firebase_uid)
-    
-    query = text("""
-        SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date, 
-               COUNT(rr.id) as risk_count
+async def get_user_analyses(
+        firebase_uid: str,
+        response: Response,
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+    user_id = await get_firebase_uid_async(db, firebase_uid)
+    
+    params = {"user_id": user_id, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        keyset = "AND (ga.analysis_date, ga.id) < (:cursor_ts, :cursor_id)"
+
+    # list view reads the summary row; full risks come from /analyses/{id}
+    query = text(f"""
+        SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date,
+            s.top_risks, s.risk_count, s.top_score, s.disease_score
         FROM genetic_analyses ga
-        LEFT JOIN risk_results rr ON ga.id = rr.analysis_id
-        WHERE ga.user_id = :user_id
-        GROUP BY ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date
-        ORDER BY ga.analysis_date DESC
-        LIMIT 10
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE ga.user_id = :user_id {keyset}
+        ORDER BY ga.analysis_date DESC, ga.id DESC
+        LIMIT :limit
     """)
     
-    result = db.execute(query, {
-        "user_id": user_id
-    })
-    analyses = result.fetchall()
-    
-    analyses_with_risk = []
-    for analysis in analyses:
-        risks_query = text("""
-            SELECT gene, risk_score, risk_level, rank
-            FROM risk_results
-            WHERE analysis_id = :analysis_id
-            ORDER BY rank
-        """)
-        risks_result = db.execute(risks_query, {
-            "analysis_id": str(analysis[0])
-        })
-        risks = risks_result.fetchall()
-        analyses_with_risk.append({
-            "id": str(analysis[0]),
-            "user_id": str(analysis[0]),
-            "disease": analysis[1],
-            "filename": analysis[2],
-            "gene_count": analysis[3],
-            "timestamp": analysis[4].isoformat(),
-            "risks": [{
-                "gene": r[0], 
-                "risk": r[1],
-                "level": r[2],
-                "rank": r[3]
-            } for r in risks]   
-        })
-    return analyses_with_risk
+    result = await db.execute(query, params)
+    analyses = _paginate(result.fetchall(), limit, response, ts_col=4)
+    
+    return [{
+        "id": str(analysis[0]),
+        "user_id": str(analysis[0]),
+        "disease": analysis[1],
+        "filename": analysis[2],
+        "gene_count": analysis[3],
+        "timestamp": analysis[4].isoformat(),
+        "risks": analysis[5] or [],
+        "risk_count": analysis[6] or 0,
+        "top_score": analysis[7],
+        "disease_score": analysis[8]
+    } for analysis in analyses]
+
+@router.get("/analyses/{analysis_id}/status")
+def get_analysis_status(analysis_id: str, db: Session = Depends(get_db)):
+    status = analysis_writer.status(analysis_id)
+    if status:
+        return {"id": analysis_id, "status": status}
+
+    query = text("""
+        SELECT 1 
+        FROM genetic_analyses 
+        WHERE id = :analysis_id
+    """)
+    if not db.execute(query, {"analysis_id": analysis_id}).fetchone():
+        raise HTTPException(404, "Analysis not found")
+
+    return {"id": analysis_id, "status": "durable"}
 
 @router.get("/analyses/{analysis_id}")
-async def get_analysis_by_id(analysis_id: str, db: Session = Depends(get_db)):
+async def get_analysis_by_id(analysis_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # a re-score bumps the version, so an entry for the current one is current
+    version = http_cache.cached_version(analysis_id)
+    if version is None:
+        version = http_cache.remember_version(
+            analysis_id, (await db.execute(http_cache.VERSION_QUERY, {"analysis_id": analysis_id})).fetchone())
+    if version is None:
+        raise HTTPException(404, "Analysis not found")
+    key = ("analysis", analysis_id, version)
+    unchanged = http_cache.not_modified(request, key)
+    if unchanged:
+        return unchanged
+    cached = http_cache.lookup(key)
+    if cached:
+        return http_cache.respond(request, cached)
+
     analysis_query = text("""
         SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date
         FROM genetic_analyses ga 
         WHERE ga.id = :analysis_id
     """)
     
-    analysis_result = db.execute(analysis_query, {
+    analysis_result = await db.execute(analysis_query, {
         "analysis_id": analysis_id    
     })
     analysis = analysis_result.fetchone()
@@ -539,7 +805,7 @@ async def get_analysis_by_id(analysis_id: str, db: Session = Depends(get_db)):
         ORDER BY rr.rank
     """)
     
-    risks_result = db.execute(risks_query, {
+    risks_result = await db.execute(risks_query, {
         "analysis_id": analysis_id
     }) 
     risks = risks_result.fetchall()
@@ -558,7 +824,7 @@ async def get_analysis_by_id(analysis_id: str, db: Session = Depends(get_db)):
             "tips": tips
         })
     
-    return {
+    body = JSONResponse({
         "id": str(analysis[0]),
         "user_id": str(analysis[0]),
         "disease": analysis[1],
@@ -566,16 +832,18 @@ async def get_analysis_by_id(analysis_id: str, db: Session = Depends(get_db)):
         "gene_count": analysis[3],
         "timestamp": analysis[4].isoformat(),
         "risks": formatted_risks
-    }
+    }).body
+    entry = http_cache.store(key, body, "application/json")
+    return http_cache.respond(request, entry)
     
 @router.get("/users/{firebase_uid}/preferences")
-async def get_user_preferences(firebase_uid: str, db: Session = Depends(get_db)):
+async def get_user_preferences(firebase_uid: str, db: AsyncSession = Depends(get_async_db)):
     query = text("""
         SELECT theme 
         FROM users
         WHERE firebase_uid = :uid
     """)
-    result = db.execute(query, {"uid": firebase_uid})
+    result = await db.execute(query, {"uid": firebase_uid})
     user = result.fetchone()
     
     if not user:
@@ -586,7 +854,7 @@ async def get_user_preferences(firebase_uid: str, db: Session = Depends(get_db))
     }
 
 @router.put("/users/{firebase_uid}/preferences")
-async def update_user_preferences(firebase_uid: str, preferences: UserPreferences, db: Session = Depends(get_db)):
+def update_user_preferences(firebase_uid: str, preferences: UserPreferences, db: Session = Depends(get_db)):
     user_id = get_firebase_uid(db, firebase_uid)
     
     query = text("""
@@ -600,9 +868,10 @@ async def update_user_preferences(firebase_uid: str, preferences: UserPreference
         "theme": preferences.theme,
         "uid": firebase_uid
     })
+    updated = result.fetchone()  # before commit, which closes the RETURNING cursor
     db.commit()
     
-    if not result.fetchone():
+    if not updated:
         raise HTTPException(404, "User not found")
 
     log_action(db, user_id, "update_theme_preference", "user", user_id)
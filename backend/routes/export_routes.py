@@ -0,0 +1,226 @@
+# routes/export_routes.py
+"""
+Streaming exports. Rows come off a server-side cursor in batches and are
+encoded straight into the response, so memory stays flat no matter how
+many rows an export has. The generators open their own session because
+the request-scoped one from get_db is closed before the body streams.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Iterator
+import io, csv, json, os, zipfile
+from .database import get_db, SessionLocal
+from .database_routes import get_firebase_uid
+from . import http_cache
+
+router = APIRouter(tags=["export"])
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))
+
+RISK_COLUMNS = ["gene", "risk_score", "risk_level", "rank"]
+ARCHIVE_COLUMNS = ["gene", "risk_score", "risk_level", "rank", "tips"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+RISKS_QUERY = text("""
+    SELECT rr.gene, rr.risk_score, rr.risk_level, rr.rank
+    FROM risk_results rr
+    WHERE rr.analysis_id = :analysis_id
+    ORDER BY rr.rank
+""")
+
+def stream_rows(query, params: dict, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[list]:
+    """Yield lists of rows from a server-side cursor."""
+    db = SessionLocal()
+    try:
+        result = db.execute(query, params, execution_options={"stream_results": True, "yield_per": batch_rows})
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only, unseekable sink that hands back what was written since the
+    last drain(). tell() keeps counting across drains, which the parquet
+    writer relies on for footer offsets; zipfile sees an unseekable stream
+    and writes data descriptors instead of seeking back.
+    """
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# encoders: batches of row tuples -> bytes
+def encode_csv(batches: Iterator[list], columns: list[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+def encode_ndjson(batches: Iterator[list], columns: list[str]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in batch).encode()
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("gene", pa.string()),
+        ("risk_score", pa.float64()),
+        ("risk_level", pa.string()),
+        ("rank", pa.int64()),
+    ])
+
+def encode_parquet(batches: Iterator[list], columns: list[str]) -> Iterator[bytes]:
+    """One row group per batch; bytes are flushed as each group is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema = _parquet_schema()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            cols = list(zip(*batch)) if batch else [[] for _ in columns]
+            writer.write_table(pa.table(dict(zip(columns, cols)), schema=schema))
+            yield sink.drain()
+
+    yield sink.drain()  # footer
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson, "parquet": encode_parquet}
+
+def _check_format(fmt: str):
+    if fmt not in ENCODERS:
+        raise HTTPException(400, f"Unsupported format; choose one of {', '.join(ENCODERS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(501, "Parquet export needs pyarrow installed")
+
+def _require_analysis(db: Session, analysis_id: str):
+    query = text("""
+        SELECT 1
+        FROM genetic_analyses
+        WHERE id = :analysis_id
+    """)
+    if not db.execute(query, {"analysis_id": analysis_id}).fetchone():
+        raise HTTPException(404, "Result id not found")
+
+def export_response(analysis_id: str, fmt: str) -> StreamingResponse:
+    body = ENCODERS[fmt](stream_rows(RISKS_QUERY, {"analysis_id": analysis_id}), RISK_COLUMNS)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{analysis_id}.{fmt}"'
+    }
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+@router.get("/results/{analysis_id}/csv")
+def export_csv(analysis_id: str, request: Request, db: Session = Depends(get_db)):
+    # one analysis is at most one risk table (~500 rows), small enough to
+    # buffer, hash and cache; /export keeps streaming
+    version = http_cache.cached_version(analysis_id)
+    if version is None:
+        version = http_cache.remember_version(
+            analysis_id, db.execute(http_cache.VERSION_QUERY, {"analysis_id": analysis_id}).fetchone())
+    if version is None:
+        raise HTTPException(404, "Result id not found")
+    key = ("csv", analysis_id, version)
+    unchanged = http_cache.not_modified(request, key)
+    if unchanged:
+        return unchanged
+    cached = http_cache.lookup(key)
+    if cached:
+        return http_cache.respond(request, cached)
+
+    body = b"".join(encode_csv(stream_rows(RISKS_QUERY, {"analysis_id": analysis_id}), RISK_COLUMNS))
+    entry = http_cache.store(key, body, MEDIA_TYPES["csv"], {
+        "Content-Disposition": f'attachment; filename="{analysis_id}.csv"'
+    })
+    return http_cache.respond(request, entry)
+
+@router.get("/results/{analysis_id}/export")
+def export_analysis(analysis_id: str, format: str = "csv", db: Session = Depends(get_db)):
+    _check_format(format)
+    _require_analysis(db, analysis_id)
+    return export_response(analysis_id, format)
+
+# bulk archive; an analysis without risk rows still gets its member, with
+# one row of empty risk fields
+ARCHIVE_QUERY = text("""
+    SELECT ga.id, ga.disease, ga.analysis_date, rr.gene, rr.risk_score, rr.risk_level, rr.rank,
+        (
+            SELECT json_agg(r.tip_text ORDER BY r.tip_order)
+            FROM recommendations r
+            WHERE r.risk_result_id = rr.id
+        ) as tips
+    FROM genetic_analyses ga
+    LEFT JOIN risk_results rr ON rr.analysis_id = ga.id
+    WHERE ga.user_id = :user_id
+    ORDER BY ga.analysis_date DESC, ga.id, rr.rank
+""")
+
+def stream_user_archive(user_id: str) -> Iterator[bytes]:
+    """One CSV member per analysis, switched whenever the analysis id changes."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        current, member, writer = None, None, None
+        for batch in stream_rows(ARCHIVE_QUERY, {"user_id": user_id}):
+            for analysis_id, disease, analysis_date, *risk in batch:
+                if analysis_id != current:
+                    if member:
+                        member.close()
+                    name = f"{analysis_date:%Y%m%d-%H%M%S}_{disease}_{analysis_id}.csv"
+                    member = io.TextIOWrapper(zf.open(name, "w", force_zip64=True), encoding="utf-8", newline="")
+                    writer = csv.writer(member)
+                    writer.writerow(ARCHIVE_COLUMNS)
+                    current = analysis_id
+
+                if risk[0] is None:  # no risk rows (gene is NOT NULL)
+                    writer.writerow([""] * len(ARCHIVE_COLUMNS))
+                    continue
+                risk[-1] = json.dumps(risk[-1] or [])
+                writer.writerow(risk)
+
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+        if member:
+            member.close()
+
+    yield sink.drain()  # central directory
+
+@router.get("/users/{firebase_uid}/export.zip")
+def export_user_archive(firebase_uid: str, db: Session = Depends(get_db)):
+    user_id = get_firebase_uid(db, firebase_uid)
+    headers = {
+        "Content-Disposition": f'attachment; filename="geneguard-{firebase_uid}.zip"'
+    }
+    return StreamingResponse(stream_user_archive(user_id), media_type="application/zip", headers=headers)
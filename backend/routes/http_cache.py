@@ -0,0 +1,104 @@
+# routes/http_cache.py
+"""
+Response cache for saved analyses and their CSVs.
+
+An analysis changes only when tools/rescore.py re-scores it against new
+risk tables, which bumps its analysis_inputs (risk_table_version,
+scored_at). Entries are keyed and tagged by that version: a request
+looks the version up, answers a matching If-None-Match with a bodyless
+304, serves a cached body for the same version, and builds a new one
+otherwise. A re-scored analysis therefore never comes back from another
+worker's cache, and clients revalidate after a short max-age.
+
+The version itself is cached for VERSION_CACHE_TTL seconds, so repeat
+requests and 304s skip the database. The re-score runs in its own
+process and can't evict it here; the TTL bounds how late a worker sees
+the new version, and the default stays under the max-age clients
+already wait out.
+"""
+import hashlib, os
+from typing import NamedTuple, Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+from .cache import TTLCache
+
+# analyses are per-user health data, so shared caches are opted into per deployment
+CACHE_CONTROL = os.getenv("ANALYSIS_CACHE_CONTROL", "private, max-age=60, must-revalidate")
+
+# None if the analysis doesn't exist; version columns are NULL for analyses saved without inputs
+VERSION_QUERY = text("""
+    SELECT ai.risk_table_version, ai.scored_at
+    FROM genetic_analyses ga
+    LEFT JOIN analysis_inputs ai ON ai.analysis_id = ga.id
+    WHERE ga.id = :analysis_id
+""")
+
+# analysis_id -> version; only found analyses, so a new one is never a cached 404
+version_cache = TTLCache(
+    maxsize=int(os.getenv("VERSION_CACHE_MAX", "20000")),
+    ttl=float(os.getenv("VERSION_CACHE_TTL", "30")),
+)
+
+class CachedBody(NamedTuple):
+    etag: str
+    body: bytes
+    media_type: str
+    headers: dict
+
+response_cache = TTLCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_MAX", "2000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+)
+
+def version_of(row) -> Optional[str]:
+    """The cache version of a VERSION_QUERY row; None if there was no row."""
+    if row is None:
+        return None
+    table_version, scored_at = row
+    return f"{table_version}@{scored_at.isoformat()}" if scored_at else "unscored"
+
+def cached_version(analysis_id: str) -> Optional[str]:
+    return version_cache.get(analysis_id)
+
+def remember_version(analysis_id: str, row) -> Optional[str]:
+    """version_of(row), cached for the next request if the analysis exists."""
+    version = version_of(row)
+    if version is not None:
+        version_cache.set(analysis_id, version)
+    return version
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison is what If-None-Match calls for
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag in tags
+
+def store(key: tuple, body: bytes, media_type: str, headers: Optional[dict] = None) -> CachedBody:
+    """key is (kind, analysis_id, version)."""
+    entry = CachedBody(make_etag(*key), body, media_type, headers or {})
+    response_cache.set(key, entry)
+    return entry
+
+def lookup(key: tuple) -> Optional[CachedBody]:
+    return response_cache.get(key)
+
+def not_modified(request: Request, key: tuple) -> Optional[Response]:
+    """A 304 if the client already holds this version, before any body is built."""
+    etag = make_etag(*key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+def respond(request: Request, entry: CachedBody) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(entry.body, media_type=entry.media_type, headers={**entry.headers, **headers})
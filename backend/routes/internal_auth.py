@@ -0,0 +1,23 @@
+# routes/internal_auth.py
+"""
+Who may use the operational surface: /internal/*, /metrics and the
+X-Profile header. With INTERNAL_TOKEN set, callers must send it as
+X-Internal-Token. Without one, only loopback clients get in, so a
+deployment that forgets the token exposes nothing. A reverse proxy on
+the same host looks like loopback too; set the token behind one.
+"""
+import hmac, ipaddress, os
+from typing import Optional
+
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN")
+
+def _loopback(host: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except (TypeError, ValueError):
+        return False
+
+def internal_allowed(token: Optional[str], client_host: Optional[str]) -> bool:
+    if INTERNAL_TOKEN:
+        return token is not None and hmac.compare_digest(token.encode(), INTERNAL_TOKEN.encode())
+    return _loopback(client_host)
@@ -0,0 +1,108 @@
+# routes/internal_routes.py
+"""
+Operational endpoints under /internal. Set INTERNAL_TOKEN to require a
+matching X-Internal-Token header; without it only loopback clients are
+served (see internal_auth).
+
+Stats are per worker process, so they come back as {"workers": {pid:
+...}} for every live worker (worker_state), whichever one answers; the
+others' are up to WORKER_PUBLISH_SECONDS old. Resets and profiling
+settings apply to every worker.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional
+from .database import engine, async_engine
+from .pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from .admission import admission
+from .internal_auth import internal_allowed
+from .profiling import profiler, MODES
+from .worker_state import worker_state
+from services import cpu_pool
+from services.annotate import myvariant_flight
+from services.tip_service import tips_flight
+
+def require_internal(request: Request, x_internal_token: Optional[str] = Header(None)):
+    if not internal_allowed(x_internal_token, request.client.host if request.client else None):
+        raise HTTPException(403, "Internal endpoint")
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal)])
+
+def _reset_pool_stats():
+    InstrumentedQueuePool.stats.reset()
+    InstrumentedAsyncQueuePool.stats.reset()
+
+worker_state.section("pool", lambda: {
+    "sync": InstrumentedQueuePool.stats.snapshot(engine.pool),
+    "async": InstrumentedAsyncQueuePool.stats.snapshot(async_engine.sync_engine.pool),
+})
+worker_state.section("cpu_pool", lambda: {
+    "workers": cpu_pool.CPU_POOL_WORKERS, "task_timeout_seconds": cpu_pool.CPU_TASK_TIMEOUT, **cpu_pool.stats,
+})
+worker_state.section("singleflight", lambda: {f.name: f.snapshot() for f in (myvariant_flight, tips_flight)})
+worker_state.section("admission", admission.snapshot)
+worker_state.on("pool_reset", _reset_pool_stats)
+
+@router.get("/pool")
+def pool_stats():
+    return {"workers": worker_state.collect("pool")}
+
+@router.post("/pool/reset")
+def reset_pool_stats():
+    worker_state.broadcast("pool_reset")
+    return {"success": True}
+
+@router.get("/cpu-pool")
+def cpu_pool_stats():
+    return {"workers": worker_state.collect("cpu_pool")}
+
+@router.get("/singleflight")
+def singleflight_stats():
+    return {"workers": worker_state.collect("singleflight")}
+
+@router.get("/admission")
+def admission_stats():
+    return {"workers": worker_state.collect("admission")}
+
+class ProfilingSettings(BaseModel):
+    mode: Optional[str] = None
+    slow_ms: Optional[float] = None
+    hz: Optional[float] = None
+
+def _profiling_state() -> dict:
+    profiler.sync()
+    return {"mode": profiler.mode, "slow_ms": profiler.slow_ms, "hz": profiler.hz,
+            "kept": len(profiler.listing()), "buffer_per_worker": profiler.buffer}
+
+@router.get("/profiling")
+def profiling_state():
+    return _profiling_state()
+
+@router.post("/profiling")
+def update_profiling(settings: ProfilingSettings):
+    if settings.mode is not None and settings.mode not in MODES:
+        raise HTTPException(400, f"mode must be one of {', '.join(MODES)}")
+    if settings.hz is not None and not 1 <= settings.hz <= 1000:
+        raise HTTPException(400, "hz must be between 1 and 1000")
+    profiler.update(**settings.model_dump(exclude_none=True))
+    return _profiling_state()
+
+@router.get("/profiles")
+def list_profiles():
+    return profiler.listing()
+
+@router.delete("/profiles")
+def clear_profiles():
+    profiler.clear()
+    return {"success": True}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: str):
+    """Folded stacks, one per line: feed to flamegraph.pl, speedscope or inferno."""
+    stacks = profiler.get(profile_id)
+    if stacks is None:
+        raise HTTPException(404, "Profile not found")
+    return PlainTextResponse(stacks, headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.folded"'
+    })
@@ -0,0 +1,140 @@
+# routes/job_routes.py
+"""
+Asynchronous uploads. POST returns a job id straight away; the analysis
+runs in the job worker pool and clients poll GET /jobs/{id} or subscribe
+to GET /jobs/{id}/events (Server-Sent Events) for status and progress.
+The finished job's result has the same shape as the synchronous route.
+"""
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pathlib import Path
+from datetime import datetime
+from typing import Optional
+import asyncio, json, os, tempfile
+from .jobs import JobRunner, JobQueueFull, TERMINAL
+from .database_routes import analysis_writer, _persist_analysis
+from .write_queue import QueueFull
+from .admission import client_key
+from services.pipeline import file_kind, DISCLAIMER_TXT
+from services.disease_ranker import SUPPORTED_DISEASES
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+EVENT_POLL_SECONDS = float(os.getenv("JOB_EVENT_POLL", "0.5"))
+
+def _finish_job(job: dict, result: dict) -> dict:
+    """Runs on the job runner's finishing thread when a worker returns: persist and shape the result."""
+    params = json.loads(job["params"])
+    if job["kind"] == "auto_rank":
+        return {"user_id": job["id"], **result, "disclaimer": DISCLAIMER_TXT}
+
+    # the job id doubles as the analysis id, so a retried job can't save twice
+    persistence = None
+    if params.get("firebase_uid"):
+        payload = {
+            "analysis_id": job["id"],
+            "firebase_uid": params["firebase_uid"],
+            "disease": params["disease"],
+            "filename": params["filename"],
+            **result
+        }
+        try:
+            analysis_writer.submit(job["id"], payload)
+            persistence = "pending"
+        except (QueueFull, OSError):
+            try:
+                _persist_analysis(payload)
+                persistence = "durable"
+            except Exception as e:
+                print(f"Database save error: {e}")
+
+    return {
+        "user_id": job["id"],
+        "gene_count": result["gene_count"],
+        "disease": params["disease"],
+        "risks": result["risks"],
+        "disclaimer": DISCLAIMER_TXT,
+        "timestamp": datetime.now().isoformat(),
+        "persistence": persistence
+    }
+
+job_runner = JobRunner(
+    job_dir=Path(os.getenv("JOB_DIR", Path(tempfile.gettempdir()) / "geneguard_jobs")),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("JOB_QUEUE_MAX", "100")),
+    max_per_user=int(os.getenv("JOB_MAX_PER_USER", "5")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+    stale_after=float(os.getenv("JOB_STALE_AFTER", "120")),
+    retain=float(os.getenv("JOB_RETAIN", "86400")),
+    on_done=_finish_job,
+)
+
+def _upload_suffix(filename: str) -> str:
+    return ".vcf.gz" if filename.endswith(".vcf.gz") else Path(filename).suffix
+
+def _enqueue(kind: str, file: UploadFile, params: dict, owner: str) -> JSONResponse:
+    if not file_kind(file.filename):
+        raise HTTPException(415, "Unsupported file type")
+    try:
+        job_id = job_runner.enqueue(kind, {"filename": file.filename, **params},
+                                    file.file, _upload_suffix(file.filename), owner)
+    except JobQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+
+    return JSONResponse(
+        {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"},
+        status_code=202,
+        headers={"Location": f"/jobs/{job_id}"}
+    )
+
+@router.post("/upload-genome")
+def enqueue_upload_genome(
+    request: Request,
+    disease: str,
+    file: UploadFile = File(...),
+    max_records: Optional[int] = None,  # None: pipeline.record_limit decides
+    firebase_uid: Optional[str] = None
+):
+    if disease not in SUPPORTED_DISEASES:
+        raise HTTPException(400, "Unsupported disease")
+    params = {"disease": disease, "max_records": max_records, "firebase_uid": firebase_uid}
+    # queued per user, as admission counts them
+    return _enqueue("analyze", file, params, client_key(request))
+
+@router.post("/auto-rank")
+def enqueue_auto_rank(request: Request, file: UploadFile = File(...), max_records: Optional[int] = None):
+    return _enqueue("auto_rank", file, {"max_records": max_records}, client_key(request))
+
+@router.get("/stats")
+def job_stats():
+    return {**job_runner.depth(), **job_runner.stats}
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    if await asyncio.to_thread(job_runner.get, job_id) is None:
+        raise HTTPException(404, "Job not found")
+
+    async def events():
+        last = None
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(job_runner.get, job_id)
+            if job is None:
+                return
+            state = (job["status"], job["stage"], job["progress"])
+            if state != last:
+                last = state
+                if job["status"] not in TERMINAL:
+                    job = {k: v for k, v in job.items() if k != "result"}
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            if job["status"] in TERMINAL:
+                return
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
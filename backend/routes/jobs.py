@@ -0,0 +1,437 @@
+# routes/jobs.py
+"""
+Background analysis jobs on a local SQLite queue, run by a pool of worker
+processes. No broker is needed: the job table and the spooled uploads
+live under JOB_DIR, so queued work survives a restart and any API
+process sharing that directory can pick it up.
+
+    JOB_DIR/jobs.sqlite3        job state: queued → running → done | failed
+    JOB_DIR/uploads/<id><ext>   upload being worked on; removed when the job ends
+
+A running job belongs to the process that claimed it. If that process dies
+(or stops heartbeating) the job is put back in the queue, up to
+JOB_MAX_ATTEMPTS times.
+
+Results are recorded on a finishing thread of the runner's own: the
+pool's done-callbacks run on its management thread, so they only hand
+the future over and never touch the store, the disk or on_done.
+"""
+import json, multiprocessing, os, queue, socket, sqlite3, threading, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from .write_queue import _jsonable
+from services.metrics import ANALYSES, replay
+
+TERMINAL = ("done", "failed")
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueueFull(Exception):
+    """Raised by enqueue() when too many jobs are waiting."""
+
+class JobStore:
+    """Job state in SQLite; safe to open from the API and worker processes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # autocommit: every statement here is its own transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def init(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id            TEXT PRIMARY KEY,
+                    kind          TEXT NOT NULL,
+                    status        TEXT NOT NULL DEFAULT 'queued',
+                    params        TEXT NOT NULL,
+                    upload        TEXT,
+                    stage         TEXT,
+                    progress      REAL NOT NULL DEFAULT 0,
+                    result        TEXT,
+                    error         TEXT,
+                    attempts      INTEGER NOT NULL DEFAULT 0,
+                    owner         TEXT,
+                    owner_pid     INTEGER,
+                    heartbeat_at  REAL,
+                    created_at    REAL NOT NULL,
+                    started_at    REAL,
+                    finished_at   REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue_idx ON jobs (status, created_at)")
+            # added after the first release; older job files lack it
+            if "user_key" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN user_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_user_idx ON jobs (user_key, status)")
+
+    def add(self, job_id: str, kind: str, params: dict, upload: Optional[str], user_key: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, params, upload, user_key, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, json.dumps(params), upload, user_key, time.time()))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self, status: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT count(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def count_open(self, user_key: str) -> int:
+        """Queued plus running jobs for one user."""
+        with self._connect() as conn:
+            return conn.execute("""
+                SELECT count(*) FROM jobs
+                WHERE user_key = ? AND status IN ('queued', 'running')
+            """, (user_key,)).fetchone()[0]
+
+    def claim(self, owner: str) -> Optional[dict]:
+        """Atomically move the oldest queued job to running under `owner`."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("""
+                UPDATE jobs
+                SET status = 'running', owner = ?, owner_pid = ?, attempts = attempts + 1,
+                    started_at = ?, heartbeat_at = ?, stage = 'queued', progress = 0
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued'
+                    ORDER BY created_at
+                    LIMIT 1
+                )
+                RETURNING *
+            """, (owner, os.getpid(), now, now)).fetchone()
+        return dict(row) if row else None
+
+    def set_progress(self, job_id: str, stage: str, progress: float):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET stage = ?, progress = ?
+                WHERE id = ? AND status = 'running'
+            """, (stage, progress, job_id))
+
+    def heartbeat(self, owner: str):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET heartbeat_at = ?
+                WHERE owner = ? AND status = 'running'
+            """, (time.time(), owner))
+
+    def finish(self, job_id: str, owner: str, result: dict) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute("""
+                UPDATE jobs
+                SET status = 'done', stage = 'done', progress = 1, result = ?, finished_at = ?
+                WHERE id = ? AND owner = ? AND status = 'running'
+            """, (json.dumps(result, default=_jsonable), time.time(), job_id, owner))
+        return cur.rowcount == 1
+
+    def fail(self, job_id: str, owner: Optional[str], error: str) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute("""
+                UPDATE jobs
+                SET status = 'failed', error = ?, finished_at = ?
+                WHERE id = ? AND (owner = ? OR ? IS NULL) AND status IN ('queued', 'running')
+            """, (error, time.time(), job_id, owner, owner))
+        return cur.rowcount == 1
+
+    def requeue(self, job_id: str, owner: str):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = 'queued', owner = NULL, owner_pid = NULL
+                WHERE id = ? AND owner = ? AND status = 'running'
+            """, (job_id, owner))
+
+    def orphaned(self, stale_after: float) -> list[dict]:
+        """Running jobs whose process is gone or has stopped heartbeating."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+
+        host = socket.gethostname()
+        cutoff = time.time() - stale_after
+        out = []
+        for row in rows:
+            same_host = (row["owner"] or "").startswith(host + ":")
+            if (same_host and not _pid_alive(row["owner_pid"])) or (row["heartbeat_at"] or 0) < cutoff:
+                out.append(dict(row))
+        return out
+
+    def purge(self, older_than: float) -> int:
+        with self._connect() as conn:
+            cur = conn.execute("""
+                DELETE FROM jobs
+                WHERE status IN ('done', 'failed') AND finished_at < ?
+            """, (time.time() - older_than,))
+        return cur.rowcount
+
+# runs in a worker process
+_stores: dict[str, JobStore] = {}
+
+def run_job(store_path: str, job_id: str, kind: str, params: dict, upload: Optional[str]) -> dict:
+    from services import pipeline, metrics
+
+    store = _stores.setdefault(store_path, JobStore(Path(store_path)))
+    report = lambda stage, fraction: store.set_progress(job_id, stage, fraction)
+
+    # stage timings are recorded here and replayed in the API process
+    with metrics.capture() as events:
+        if kind == "analyze":
+            result = pipeline.analyze(upload, params["filename"], params["disease"], params["max_records"], report)
+        elif kind == "auto_rank":
+            result = pipeline.auto_rank(upload, params["filename"], params["max_records"], report)
+        else:
+            raise ValueError(f"Unknown job kind {kind!r}")
+    return {**result, "_metrics": events}
+
+class JobRunner:
+    def __init__(
+            self,
+            job_dir: Path,
+            workers: int = 2,
+            max_queued: int = 100,
+            max_per_user: int = 5,
+            max_attempts: int = 3,
+            stale_after: float = 120.0,
+            retain: float = 86_400.0,
+            on_done: Optional[Callable[[dict, dict], dict]] = None,
+        ):
+        self.job_dir = Path(job_dir)
+        self.uploads = self.job_dir / "uploads"
+        self.store = JobStore(self.job_dir / "jobs.sqlite3")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.retain = retain
+        self.on_done = on_done
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._slots = threading.Semaphore(workers)
+        self._inflight: dict[str, object] = {}
+        self._abandoned: set[str] = set()  # requeued by stop(); their futures are ignored
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._finished: queue.Queue = queue.Queue()
+        self._finisher: Optional[threading.Thread] = None
+        self.stats = {"enqueued": 0, "done": 0, "failed": 0, "requeued": 0, "rejected": 0}
+
+    # lifecycle
+    def start(self):
+        self.uploads.mkdir(parents=True, exist_ok=True)
+        self.store.init()
+        # owner names the process, so pid reuse after a restart can't hide a dead owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping.clear()
+        self._abandoned.clear()
+        self._pool = self._new_pool()
+        self._finisher = threading.Thread(target=self._finish_loop, name="job-finish", daemon=True)
+        self._finisher.start()
+        self._thread = threading.Thread(target=self._run, name="job-dispatch", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop taking jobs; wait for running ones, requeue what is left. All within `timeout`."""
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def left() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(left())
+        while self._inflight and left() != 0.0:
+            time.sleep(0.1)
+
+        with self._lock:
+            for job_id in list(self._inflight):
+                self.store.requeue(job_id, self.owner)
+                # its future fails with BrokenProcessPool below; that must not touch the job
+                self._abandoned.add(job_id)
+            self._inflight.clear()
+        # the jobs are back in the queue, so don't let workers hold up exit
+        for proc in list((self._pool._processes or {}).values()):
+            proc.terminate()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._finished.put(None)
+        self._finisher.join(left())
+        self._thread = self._finisher = None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: the API process has threads running, which fork does not copy safely
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    # producer side
+    def enqueue(self, kind: str, params: dict, upload_src=None, suffix: str = "", user_key: Optional[str] = None) -> str:
+        """Spool the upload (a file object) next to the queue and add a job."""
+        if self.store.count("queued") >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise JobQueueFull(f"job queue is full ({self.max_queued} waiting)")
+        # fairness: one account can't fill the queue
+        if user_key and self.store.count_open(user_key) >= self.max_per_user:
+            self.stats["rejected"] += 1
+            raise JobQueueFull(f"{self.max_per_user} of your analyses are already queued or running")
+
+        job_id = str(uuid.uuid4())
+        upload = None
+        if upload_src is not None:
+            dest = self.uploads / f"{job_id}{suffix}"
+            tmp = self.uploads / f".{job_id}.tmp"
+            with open(tmp, "wb") as f:
+                while chunk := upload_src.read(1 << 20):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.rename(dest)
+            upload = str(dest)
+
+        self.store.add(job_id, kind, params, upload, user_key)
+        self.stats["enqueued"] += 1
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "progress": round(job["progress"], 3),
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error"],
+        }
+
+    def depth(self) -> dict:
+        return {"queued": self.store.count("queued"), "running": len(self._inflight), "workers": self.workers}
+
+    # dispatcher
+    def _run(self):
+        last_sweep = 0.0
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            if now - last_sweep >= min(30.0, self.stale_after / 4):
+                self._sweep()
+                last_sweep = now
+
+            if not self._slots.acquire(timeout=1.0):
+                continue
+            job = None if self._stopping.is_set() else self.store.claim(self.owner)
+            if job is None:
+                self._slots.release()
+                # other API processes can enqueue too, so poll as well as wait
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._submit(job)
+
+    def _submit(self, job: dict):
+        job_id = job["id"]
+        args = (str(self.store.path), job_id, job["kind"], json.loads(job["params"]), job["upload"])
+        try:
+            fut = self._pool.submit(run_job, *args)
+        except BrokenProcessPool:
+            self._pool = self._new_pool()
+            fut = self._pool.submit(run_job, *args)
+        with self._lock:
+            self._inflight[job_id] = fut
+        # runs on the pool's management thread: no I/O there, just hand over
+        fut.add_done_callback(lambda f, job=job: self._finished.put((job, f)))
+
+    def _finish_loop(self):
+        while (item := self._finished.get()) is not None:
+            self._done(*item)
+
+    def _done(self, job: dict, fut):
+        job_id = job["id"]
+        try:
+            if fut.cancelled() or job_id in self._abandoned:
+                return
+            try:
+                result = fut.result()
+            except BrokenProcessPool:
+                # a worker died (most likely OOM); every job in the pool lands
+                # here, and _submit replaces the pool on its next use
+                self._retry_or_fail(job, "worker process died")
+                return
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                if self.store.fail(job_id, self.owner, str(e)):
+                    self.stats["failed"] += 1
+                    ANALYSES.inc(endpoint=f"job_{job['kind']}", outcome="error")
+                    self._cleanup(job)
+                return
+
+            replay(result.pop("_metrics", None))
+            ANALYSES.inc(endpoint=f"job_{job['kind']}", outcome="ok")
+            if self.on_done:
+                try:
+                    result = self.on_done(job, result)
+                except Exception as e:
+                    print(f"Job {job_id} post-processing failed: {e}")
+            if self.store.finish(job_id, self.owner, result):
+                self.stats["done"] += 1
+                self._cleanup(job)
+        finally:
+            with self._lock:
+                self._inflight.pop(job_id, None)
+            self._slots.release()
+            self._wake.set()
+
+    def _retry_or_fail(self, job: dict, reason: str):
+        if job["attempts"] >= self.max_attempts:
+            # only if it was still ours: a requeued job needs its upload
+            if self.store.fail(job["id"], job["owner"], f"{reason} ({job['attempts']} attempts)"):
+                self.stats["failed"] += 1
+                self._cleanup(job)
+        else:
+            self.store.requeue(job["id"], job["owner"])
+            self.stats["requeued"] += 1
+
+    def _sweep(self):
+        self.store.heartbeat(self.owner)
+        for job in self.store.orphaned(self.stale_after):
+            if job["owner"] != self.owner:
+                print(f"Job {job['id']} orphaned by {job['owner']}; requeueing")
+                self._retry_or_fail(job, "worker process lost")
+        self.store.purge(self.retain)
+
+    def _cleanup(self, job: dict):
+        if job["upload"]:
+            Path(job["upload"]).unlink(missing_ok=True)
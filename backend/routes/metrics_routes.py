@@ -0,0 +1,110 @@
+# routes/metrics_routes.py
+"""
+GET /metrics in the Prometheus text format: the pipeline's stage
+histograms (services/metrics.py) plus scrape-time readings of the caches,
+pools and queues the rest of the app already counts. Guarded like
+/internal: the INTERNAL_TOKEN, or loopback clients when none is set.
+
+Every series carries a `worker` label (the pid), and a scrape returns
+all live workers' series whichever worker answers it: the others' as
+published to worker_state, up to WORKER_PUBLISH_SECONDS old. A restarted
+worker's counters start again under its new pid.
+"""
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from services.metrics import registry, merge
+from services.adagio_loader import get_risk_table
+from services.annotate import myvariant_flight
+from services.tip_service import get_tips, tips_flight
+from services import cpu_pool
+from .database import engine, async_engine
+from .pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from .database_routes import _user_ids, _memberships, analysis_writer
+from .http_cache import response_cache, version_cache
+from .audit import audit_writer
+from .admission import admission
+from .job_routes import job_runner
+from .internal_routes import require_internal
+from .worker_state import worker_state
+
+router = APIRouter(tags=["metrics"])
+
+# caches: hit ratio = hits / (hits + misses)
+def _caches() -> dict:
+    out = {}
+    for name, c in (("users", _user_ids), ("memberships", _memberships), ("responses", response_cache),
+                    ("versions", version_cache)):
+        out[(name,)] = (c.hits, c.misses, len(c))
+    for name, fn in (("tips", get_tips), ("risk_tables", get_risk_table)):
+        info = fn.cache_info()
+        out[(name,)] = (info.hits, info.misses, info.currsize)
+    return out
+
+registry.counter_fn("geneguard_cache_hits_total", "Cache hits.",
+                    lambda: {k: v[0] for k, v in _caches().items()}, ("cache",))
+registry.counter_fn("geneguard_cache_misses_total", "Cache misses.",
+                    lambda: {k: v[1] for k, v in _caches().items()}, ("cache",))
+registry.gauge_fn("geneguard_cache_entries", "Entries held per cache.",
+                  lambda: {k: v[2] for k, v in _caches().items()}, ("cache",))
+
+# single-flight coalescing
+_flights = (myvariant_flight, tips_flight)
+registry.counter_fn("geneguard_upstream_calls_total", "Keys fetched from an upstream service.",
+                    lambda: {(f.name,): f.stats["calls"] for f in _flights}, ("service",))
+registry.counter_fn("geneguard_upstream_shared_total", "Duplicate keys served by a call already in flight.",
+                    lambda: {(f.name,): f.stats["shared"] for f in _flights}, ("service",))
+
+# database pools
+def _pools() -> dict:
+    return {
+        ("sync",): InstrumentedQueuePool.stats.snapshot(engine.pool),
+        ("async",): InstrumentedAsyncQueuePool.stats.snapshot(async_engine.sync_engine.pool),
+    }
+
+for _field, _type, _help in (
+    ("checked_out", "gauge", "Connections checked out."),
+    ("overflow", "gauge", "Overflow connections open."),
+    ("size", "gauge", "Configured pool size."),
+    ("checkouts", "counter", "Connection checkouts."),
+    ("timeouts", "counter", "Checkouts that timed out waiting."),
+    ("invalidations", "counter", "Connections invalidated."),
+):
+    _name = f"geneguard_db_pool_{_field}" + ("_total" if _type == "counter" else "")
+    _fn = lambda f=_field: {k: v[f] for k, v in _pools().items()}
+    (registry.counter_fn if _type == "counter" else registry.gauge_fn)(_name, _help, _fn, ("pool",))
+
+registry.counter_fn("geneguard_db_pool_wait_seconds_total", "Time spent waiting for a connection.",
+                    lambda: {k: v["checkout_wait"]["sum_seconds"] for k, v in _pools().items()}, ("pool",))
+
+# admission control
+registry.gauge_fn("geneguard_admission_active", "Analyses admitted and running.",
+                  lambda: {(): admission.active})
+registry.gauge_fn("geneguard_admission_active_bytes", "Request bytes admitted and in flight.",
+                  lambda: {(): admission.active_bytes})
+registry.counter_fn("geneguard_admission_rejected_total", "Requests turned away with 503, by limit.",
+                    lambda: {(r,): admission.stats[f"rejected_{r}"] for r in ("concurrency", "bytes", "user")},
+                    ("reason",))
+
+# worker pools and queues
+registry.counter_fn("geneguard_cpu_pool_events_total", "CPU pool tasks, timeouts and restarts.",
+                    lambda: {(k,): v for k, v in cpu_pool.stats.items()}, ("event",))
+registry.gauge_fn("geneguard_queue_depth", "Items waiting per background queue.",
+                  lambda: {
+                      ("analysis_writes",): analysis_writer.depth(),
+                      ("audit",): audit_writer.depth(),
+                      ("jobs",): job_runner.depth()["queued"],
+                  }, ("queue",))
+registry.gauge_fn("geneguard_jobs_running", "Jobs running in this process's worker pool.",
+                  lambda: {(): job_runner.depth()["running"]})
+registry.counter_fn("geneguard_queue_events_total", "Background queue outcomes.",
+                    lambda: {
+                        **{("analysis_writes", k): v for k, v in analysis_writer.stats.items()},
+                        **{("audit", k): v for k, v in audit_writer.stats.items()},
+                        **{("jobs", k): v for k, v in job_runner.stats.items()},
+                    }, ("queue", "event"))
+
+worker_state.section("metrics", registry.render)
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_internal)])
+def metrics():
+    return PlainTextResponse(merge(worker_state.collect("metrics")), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,104 @@
+# routes/pool_stats.py
+"""
+Connection-pool instrumentation: checkout wait histogram, timeouts,
+pre-ping failures and invalidations, on top of the pool's own gauges.
+"""
+import threading, time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# checkout wait buckets, in seconds (upper bounds)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)  # last slot is +Inf
+            self.wait_sum = 0.0
+            self.checkouts = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.pre_ping_failures = 0
+
+    def observe_wait(self, seconds: float):
+        with self._lock:
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    break
+            else:
+                i = len(WAIT_BUCKETS)
+            self.wait_counts[i] += 1
+            self.wait_sum += seconds
+
+    def incr(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            cumulative, total = [], 0
+            for bound, n in zip(WAIT_BUCKETS + (float("inf"),), self.wait_counts):
+                total += n
+                cumulative.append({"le": "+Inf" if bound == float("inf") else bound, "count": total})
+            waits = {
+                "count": total,
+                "sum_seconds": round(self.wait_sum, 6),
+                "buckets": cumulative,
+            }
+            counters = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pre_ping_failures": self.pre_ping_failures,
+            }
+
+        return {
+            "pool": self.name,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+            **counters,
+            "checkout_wait": waits,
+        }
+
+class _TimedCheckout:
+    """Mixin timing how long callers wait for a connection."""
+    stats: PoolStats
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.incr("timeouts")
+            raise
+        finally:
+            self.stats.observe_wait(time.perf_counter() - t0)
+
+# one stats object per pool class: pool.recreate() builds a fresh instance
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    stats = PoolStats("sync")
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats = PoolStats("async")
+
+def instrument(sync_engine, stats: PoolStats):
+    """Attach event counters to an Engine (use AsyncEngine.sync_engine for async)."""
+    event.listen(sync_engine, "checkout", lambda *a: stats.incr("checkouts"))
+    event.listen(sync_engine, "connect", lambda *a: stats.incr("connects"))
+    event.listen(sync_engine, "invalidate", lambda *a: stats.incr("invalidations"))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(ctx):
+        if ctx.is_pre_ping:
+            stats.incr("pre_ping_failures")
@@ -0,0 +1,230 @@
+# routes/profiling.py
+"""
+Opt-in sampling profiler for slow requests.
+
+A background thread samples every thread's Python stack while at least
+one profiled request is in flight. Samples are kept as folded stacks
+(`frame;frame;frame count`), which flamegraph.pl, speedscope and
+inferno read directly. Handlers hop between the event loop, thread pools
+and the CPU pool, so the sampler looks at the whole process rather than
+one thread. Requests that overlap a profiled one share its samples.
+
+Modes (PROFILE_MODE, or POST /internal/profiling for every worker):
+    off     nothing is sampled; the middleware is one attribute check
+    header  only requests carrying X-Profile: 1 are profiled
+    slow    every request is sampled; a profile is kept only when the
+            request took at least PROFILE_SLOW_MS (or asked via header)
+
+Each worker keeps its last PROFILE_BUFFER profiles as files in the
+shared worker state directory (worker_state), so whichever worker answers
+GET /internal/profiles lists all of them and GET /internal/profiles/{id}
+downloads any one as text; a profile asked for by header names its id in
+the X-Profile-Id response header. Settings changed through
+/internal/profiling are saved there too, and each worker picks them up on
+its next request. The X-Profile header is honoured
+only for callers internal_auth lets in: a matching X-Internal-Token when
+INTERNAL_TOKEN is set, loopback clients when it is not.
+"""
+import itertools, json, os, sys, threading, time
+from collections import Counter, deque
+from typing import Optional
+from .internal_auth import internal_allowed
+from .worker_state import WorkerState, worker_state
+
+MODES = ("off", "header", "slow")
+
+# leaf frames that mean "this thread is parked", left out of the samples
+_IDLE = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("queue.py", "get"), ("connection.py", "wait"),
+    ("thread.py", "_worker"),  # ThreadPoolExecutor worker blocked on its SimpleQueue
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class _Session:
+    __slots__ = ("stacks", "samples")
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+class Profiler:
+    def __init__(self, state: WorkerState, mode: str = "off", slow_ms: float = 2_000, hz: float = 100,
+                 buffer: int = 50):
+        self.state = state
+        self.mode = mode
+        self.slow_ms = slow_ms
+        self.hz = hz
+        self.buffer = buffer
+        self._kept: deque = deque()  # ids of this worker's profiles, oldest first
+        self._ids = itertools.count(1)
+        self._session_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sessions: dict[int, _Session] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # sessions
+    def begin(self) -> int:
+        sid = next(self._session_ids)
+        with self._lock:
+            self._sessions[sid] = _Session()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._thread.start()
+        return sid
+
+    def end(self, sid: int) -> _Session:
+        with self._lock:
+            return self._sessions.pop(sid)
+
+    # settings, shared by every worker
+    def sync(self):
+        """Adopt the settings last saved by update(), in whichever worker."""
+        saved = self.state.setting("profiling")
+        if saved:
+            self.mode, self.slow_ms, self.hz = saved["mode"], saved["slow_ms"], saved["hz"]
+
+    def update(self, **changes):
+        self.sync()
+        settings = {"mode": self.mode, "slow_ms": self.slow_ms, "hz": self.hz}
+        self.state.put_setting("profiling", {**settings, **changes})
+        self.sync()
+
+    # kept profiles: <id>.folded, a JSON header line then the folded stacks
+    def _dir(self):
+        return self.state.subdir("profiles")
+
+    def new_id(self) -> str:
+        return f"p{os.getpid()}-{next(self._ids)}"
+
+    def keep(self, session: _Session, profile_id: Optional[str] = None, **meta) -> dict:
+        profile = {"id": profile_id or self.new_id(), "samples": session.samples, **meta}
+        body = json.dumps(profile) + "\n" + folded({"stacks": session.stacks})
+        (self._dir() / f"{profile['id']}.folded").write_text(body)
+        self._kept.append(profile["id"])
+        while len(self._kept) > self.buffer:
+            (self._dir() / f"{self._kept.popleft()}.folded").unlink(missing_ok=True)
+        return profile
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """The profile's folded stacks, from any worker."""
+        path = self._dir() / f"{profile_id}.folded"
+        if not profile_id.replace("-", "").isalnum() or not path.exists():
+            return None
+        return path.read_text().split("\n", 1)[1]
+
+    def listing(self) -> list[dict]:
+        out = []
+        for path in self._dir().glob("*.folded"):
+            try:
+                with open(path) as f:
+                    out.append(json.loads(f.readline()))
+            except (OSError, ValueError):
+                continue  # removed meanwhile
+        return sorted(out, key=lambda p: p["started_at"], reverse=True)
+
+    def clear(self):
+        for path in self._dir().glob("*.folded"):
+            path.unlink(missing_ok=True)
+        self._kept.clear()
+
+    # sampler
+    def _sample_loop(self):
+        me = threading.get_ident()
+        names = {}
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions.values())
+
+            stacks = []
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                labels.append(names.get(tid, str(tid)))
+                stacks.append(";".join(reversed(labels)))
+
+            for s in sessions:
+                s.samples += 1
+                s.stacks.update(stacks)
+            time.sleep(1 / self.hz)
+
+def folded(profile: dict) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in profile["stacks"].most_common())
+
+profiler = Profiler(
+    worker_state,
+    mode=os.getenv("PROFILE_MODE", "off"),
+    slow_ms=float(os.getenv("PROFILE_SLOW_MS", "2000")),
+    hz=float(os.getenv("PROFILE_HZ", "100")),
+    buffer=int(os.getenv("PROFILE_BUFFER", "50")),
+)
+
+def _wants_profile(scope) -> bool:
+    headers = dict(scope.get("headers", ()))
+    if headers.get(b"x-profile") not in (b"1", b"true"):
+        return False
+    token = headers.get(b"x-internal-token")
+    client = scope.get("client") or (None, None)
+    return internal_allowed(token.decode() if token is not None else None, client[0])
+
+class ProfilingMiddleware:
+    """Pure ASGI so it can time the whole response, streamed bodies included."""
+
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        self.profiler.sync()
+        mode = self.profiler.mode
+        if mode == "off" or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        asked = _wants_profile(scope)
+        if mode == "header" and not asked:
+            return await self.app(scope, receive, send)
+
+        # a profile asked for by header is always kept, so its id can go out with the response
+        profile_id = self.profiler.new_id() if asked else None
+        status = {}
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if profile_id:
+                    message["headers"] = [*message.get("headers", ()), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sid = self.profiler.begin()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - t0) * 1000
+            session = self.profiler.end(sid)
+            if asked or duration_ms >= self.profiler.slow_ms:
+                p = self.profiler.keep(
+                    session,
+                    profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status.get("code"),
+                    duration_ms=round(duration_ms, 1),
+                    started_at=time.time() - duration_ms / 1000,
+                    trigger="header" if asked else "slow",
+                )
+                print(f"Profiled {scope['method']} {scope['path']} ({duration_ms:.0f} ms) as {p['id']}")
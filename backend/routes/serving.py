@@ -0,0 +1,55 @@
+# routes/serving.py
+"""
+Pieces of the production server mode (gunicorn.conf.py): gunicorn forks
+uvicorn workers from a master that has already imported the app.
+
+`preload` runs in the master just before the fork. It loads everything
+read-only the workers use (risk tables and their scoring arrays, the
+gene list, the rsID index) and then freezes the GC, so the workers share
+those pages copy-on-write instead of each building and scanning its own
+copy. The rsID index is memory-mapped and shared through the page cache.
+
+`Worker` is the uvicorn worker with a bound on the request drain. On
+SIGTERM it stops accepting, gives in-flight requests DRAIN_TIMEOUT
+seconds, and then runs the lifespan shutdown: jobs requeued, queued
+writes flushed (main.lifespan). All of that fits inside gunicorn's
+graceful_timeout.
+"""
+import gc, os, time
+from uvicorn_worker import UvicornWorker
+from services.adagio_loader import all_genes, risk_table_version
+from services.disease_ranker import SUPPORTED_DISEASES
+from services.risk_annotator import score_risks
+from services.rsid_index import get_rsid_index
+
+DRAIN_TIMEOUT = int(os.getenv("DRAIN_TIMEOUT", "60"))  # seconds in-flight requests get on shutdown
+
+def preload() -> dict:
+    """
+    Load the shared read-only data, then gc.freeze() it; returns what was
+    loaded. Starts no threads: the master must have none when it forks.
+    """
+    t0 = time.perf_counter()
+    probe = all_genes()[:1]
+    for disease in SUPPORTED_DISEASES:
+        score_risks(disease, probe)  # scoring arrays plus the index's hash table
+    index = get_rsid_index()
+
+    gc.collect()
+    gc.freeze()  # the GC never touches these again, so their pages stay shared
+    loaded = {
+        "risk_tables": len(SUPPORTED_DISEASES),
+        "risk_table_version": risk_table_version(),
+        "rsid_index": len(index) if index is not None else None,
+        "frozen_objects": gc.get_freeze_count(),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    print(f"preloaded {loaded}")
+    return loaded
+
+class Worker(UvicornWorker):
+    """UvicornWorker whose shutdown waits at most DRAIN_TIMEOUT for in-flight requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = DRAIN_TIMEOUT
@@ -0,0 +1,154 @@
+# routes/worker_state.py
+"""
+Readings and settings shared by the web workers of one server. Under
+gunicorn.conf.py there are WEB_CONCURRENCY of them behind one socket, so
+any operational request lands on just one; through this it can still
+answer for all of them.
+
+    WORKER_STATE_DIR/workers/<pid>.json   each worker's latest snapshot
+    WORKER_STATE_DIR/settings/<name>.json settings every worker follows
+    WORKER_STATE_DIR/commands/<name>      touched to have every worker run it
+
+Every PUBLISH_SECONDS a worker writes a snapshot of the sections
+registered with section() (rendered metrics, pool and admission stats,
+...). collect(name) returns {pid: value} for every worker that published
+in the last three intervals, with this worker's own value read live; the
+others are up to PUBLISH_SECONDS old. A worker that exits drops out. gunicorn.conf.py gives the master's
+workers one directory; a single process just has its own.
+"""
+import json, os, tempfile, threading, time
+from pathlib import Path
+from typing import Callable, Optional
+
+PUBLISH_SECONDS = float(os.getenv("WORKER_PUBLISH_SECONDS", "5"))
+
+def _write_atomic(path: Path, data: str):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(data)
+    os.replace(tmp, path)
+
+class WorkerState:
+    def __init__(self, state_dir: Path, interval: float = PUBLISH_SECONDS):
+        self.dir = Path(state_dir)
+        self.interval = interval
+        self.stale_after = 3 * interval
+        self._sections: dict[str, Callable[[], object]] = {}
+        self._commands: dict[str, Callable[[], None]] = {}
+        self._seen: dict[str, int] = {}       # command -> mtime_ns last run
+        self._settings: dict[str, tuple] = {}  # name -> (mtime_ns, value)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pid(self) -> str:
+        return str(os.getpid())  # read per call: the module is imported before the fork
+
+    def subdir(self, kind: str) -> Path:
+        path = self.dir / kind
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    # snapshots
+    def section(self, name: str, fn: Callable[[], object]):
+        """Publish fn() (JSON-able) under name."""
+        self._sections[name] = fn
+
+    def collect(self, name: str) -> dict[str, object]:
+        """{pid: value} of section `name` for every live worker, this one read now."""
+        out = {}
+        cutoff = time.time() - self.stale_after
+        for fp in sorted(self.subdir("workers").glob("*.json")):
+            if fp.stem == self.pid:
+                continue
+            try:
+                snapshot = json.loads(fp.read_text())
+            except (OSError, ValueError):
+                continue  # being replaced, or gone
+            if snapshot["at"] >= cutoff and name in snapshot["sections"]:
+                out[fp.stem] = snapshot["sections"][name]
+        out[self.pid] = self._sections[name]()
+        return out
+
+    def publish(self):
+        sections = {}
+        for name, fn in self._sections.items():
+            try:
+                sections[name] = fn()
+            except Exception as e:
+                print(f"Worker state {name} failed: {e}")
+        _write_atomic(self.subdir("workers") / f"{self.pid}.json",
+                      json.dumps({"at": time.time(), "sections": sections}, default=str))
+
+    # settings: read by every worker on its next use
+    def put_setting(self, name: str, value: dict):
+        _write_atomic(self.subdir("settings") / f"{name}.json", json.dumps(value))
+
+    def setting(self, name: str) -> Optional[dict]:
+        """The setting's current value; one stat per call, a read only when it changed."""
+        path = self.dir / "settings" / f"{name}.json"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+        cached = self._settings.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cached[1] if cached else None
+        self._settings[name] = (mtime, value)
+        return value
+
+    # commands: run here now, and by the other workers within PUBLISH_SECONDS
+    def on(self, name: str, fn: Callable[[], None]):
+        self._commands[name] = fn
+
+    def broadcast(self, name: str):
+        path = self.subdir("commands") / name
+        path.touch()
+        self._seen[name] = path.stat().st_mtime_ns
+        self._commands[name]()
+
+    def _command_mtime(self, name: str) -> int:
+        try:
+            return (self.dir / "commands" / name).stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    def _run_commands(self):
+        for name, fn in self._commands.items():
+            mtime = self._command_mtime(name)
+            if mtime != self._seen.get(name, 0):
+                self._seen[name] = mtime
+                fn()
+
+    # lifecycle: one publisher thread per worker, started after the fork
+    def start(self):
+        self._stopping.clear()
+        # commands given before this worker started are not for it
+        self._seen = {name: self._command_mtime(name) for name in self._commands}
+        self._thread = threading.Thread(target=self._run, name="worker-state", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        (self.dir / "workers" / f"{self.pid}.json").unlink(missing_ok=True)
+
+    def _run(self):
+        while True:
+            try:
+                self._run_commands()
+                self.publish()
+            except OSError as e:
+                print(f"Worker state publish failed: {e}")
+            if self._stopping.wait(self.interval):
+                return
+
+worker_state = WorkerState(
+    Path(os.getenv("WORKER_STATE_DIR", Path(tempfile.gettempdir()) / f"geneguard_workers_{os.getpid()}")),
+)
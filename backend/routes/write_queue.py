@@ -0,0 +1,208 @@
+# routes/write_queue.py
+"""
+Durable write-behind queue.
+
+Jobs are spooled to disk as JSON before submit() returns, so a crash or
+restart does not lose them; a background thread replays them through the
+handler with retries and moves jobs that keep failing to a dead-letter dir.
+
+    spool/pending/<id>.json             accepted, not yet written
+    spool/claimed/<id>.<owner>.json     being written by queue instance <owner>
+    spool/dead/<id>.json                gave up; payload + last error kept
+
+The owner writing a job touches its claimed file every few seconds. A
+claimed file nobody has touched for stale_after seconds belongs to a
+process that died mid-write (container PIDs are reused after a restart,
+so a PID can't tell), and any queue on the spool hands it back; each
+queue looks every stale_after/2 seconds, busy or not.
+
+submit() blocks on an fsync; async handlers call submit_async().
+"""
+import asyncio, json, os, queue, threading, time, uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue is at capacity."""
+
+def _jsonable(o):
+    # numpy scalars coming out of pandas frames
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+class WriteBehindQueue:
+    def __init__(
+            self,
+            spool_dir: Path,
+            handler: Callable[[dict], None],
+            maxsize: int = 1_000,
+            max_attempts: int = 5,
+            backoff: float = 0.5,
+            permanent_errors: tuple = (),
+            stale_after: float = 120.0,
+        ):
+        self.spool_dir = Path(spool_dir)
+        self.handler = handler
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.permanent_errors = permanent_errors
+        self.stale_after = stale_after
+        self.owner = uuid.uuid4().hex[:12]
+
+        self._pending = self.spool_dir / "pending"
+        self._claimed = self.spool_dir / "claimed"
+        self._dead = self.spool_dir / "dead"
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._reserved = 0  # submits past the capacity check, still spooling
+        self._thread: Optional[threading.Thread] = None
+        self._beat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._current: Optional[Path] = None
+        self.stats = {"submitted": 0, "written": 0, "retries": 0, "dead": 0, "rejected": 0, "reclaimed": 0}
+
+    # lifecycle
+    def start(self):
+        for d in (self._pending, self._claimed, self._dead):
+            d.mkdir(parents=True, exist_ok=True)
+
+        # a new owner per start, so nothing claimed before a restart looks live
+        self.owner = uuid.uuid4().hex[:12]
+        self._reclaim_stale(enqueue=False)
+        for fp in sorted(self._pending.glob("*.json"), key=lambda p: p.stat().st_mtime):
+            self._queue.put(fp.stem)
+
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        self._beat = threading.Thread(target=self._heartbeat, name="write-behind-heartbeat", daemon=True)
+        self._beat.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Drain what is queued, then stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self._stopping.set()
+        self._beat.join(timeout)
+        self._beat = None
+
+    # producer side
+    def submit(self, job_id: str, payload: dict):
+        with self._lock:
+            if self._queue.qsize() + self._reserved >= self.maxsize:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"write queue is full ({self.maxsize} jobs)")
+            self._reserved += 1
+
+        # spooled outside the lock, so submits fsync in parallel
+        try:
+            tmp = self._pending / f".{job_id}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(payload, f, default=_jsonable)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.rename(self._pending / f"{job_id}.json")
+        finally:
+            with self._lock:
+                self._reserved -= 1
+
+        with self._lock:
+            self.stats["submitted"] += 1
+        self._queue.put(job_id)
+
+    async def submit_async(self, job_id: str, payload: dict):
+        """submit() on a thread, off the event loop."""
+        await asyncio.to_thread(self.submit, job_id, payload)
+
+    def status(self, job_id: str) -> Optional[str]:
+        """'pending' or 'failed' while the queue still owns the job, else None."""
+        if (self._pending / f"{job_id}.json").exists() or any(self._claimed.glob(f"{job_id}.*.json")):
+            return "pending"
+        if (self._dead / f"{job_id}.json").exists():
+            return "failed"
+        return None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    # consumer side
+    def _run(self):
+        reclaim_at = time.monotonic() + self.stale_after / 2
+        while True:
+            # jobs of a sibling process that died, however busy this queue is
+            if time.monotonic() >= reclaim_at:
+                self._reclaim_stale()
+                reclaim_at = time.monotonic() + self.stale_after / 2
+            try:
+                job_id = self._queue.get(timeout=max(0.0, reclaim_at - time.monotonic()))
+            except queue.Empty:
+                continue
+            if job_id is None:
+                return
+
+            claimed = self._claimed / f"{job_id}.{self.owner}.json"
+            try:
+                (self._pending / f"{job_id}.json").rename(claimed)
+                os.utime(claimed)  # rename keeps the mtime of when it was submitted
+                with open(claimed) as f:
+                    payload = json.load(f)
+            except FileNotFoundError:
+                continue  # another worker process got it first
+            self._current = claimed
+            try:
+                self._write(job_id, payload, claimed)
+            finally:
+                self._current = None
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.stale_after / 4):
+            current = self._current
+            if current is not None:
+                try:
+                    os.utime(current)
+                except FileNotFoundError:
+                    pass
+
+    def _reclaim_stale(self, enqueue: bool = True):
+        """Hand back claimed jobs whose owner stopped touching them."""
+        cutoff = time.time() - self.stale_after
+        for fp in self._claimed.glob("*.json"):
+            job_id, _, owner = fp.stem.rpartition(".")
+            try:
+                if owner == self.owner or fp.stat().st_mtime >= cutoff:
+                    continue
+                fp.rename(self._pending / f"{job_id}.json")
+            except FileNotFoundError:
+                continue  # finished, or another process reclaimed it
+            self.stats["reclaimed"] += 1
+            print(f"Write-behind job {job_id} reclaimed from stale owner {owner}")
+            if enqueue:
+                self._queue.put(job_id)
+
+    def _write(self, job_id: str, payload: dict, claimed: Path):
+        error = None
+        for attempt in range(self.max_attempts):
+            try:
+                self.handler(payload)
+                claimed.unlink(missing_ok=True)
+                self.stats["written"] += 1
+                return
+            except self.permanent_errors as e:
+                error = e
+                break
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.max_attempts:
+                    self.stats["retries"] += 1
+                    time.sleep(self.backoff * 2 ** attempt)
+
+        print(f"Write-behind job {job_id} failed: {error}")
+        with open(self._dead / f"{job_id}.json", "w") as f:
+            json.dump({"payload": payload, "error": repr(error), "failed_at": time.time()}, f, default=_jsonable)
+        claimed.unlink(missing_ok=True)
+        self.stats["dead"] += 1
@@ -1,7 +1,27 @@
-import json, pathlib, pandas as pd
+import json, pathlib, hashlib, functools, pandas as pd
 DATA_DIR = pathlib.Path(__file__).resolve().parent.parent / "data"
 
 def load_risk_table(disease: str) -> pd.DataFrame:
     fp = DATA_DIR / f"adagio_{disease}.json"
     with open(fp) as f:
-        return pd.DataFrame.from_dict(json.load(f), orient="index")
\ No newline at end of file
+        return pd.DataFrame.from_dict(json.load(f), orient="index")
+
+@functools.lru_cache(maxsize=None)
+def get_risk_table(disease: str) -> pd.DataFrame:
+    """Shared, cached copy of a risk table; treat it as read-only."""
+    return load_risk_table(disease)
+
+@functools.lru_cache(maxsize=1)
+def risk_table_version() -> str:
+    """Content hash of every adagio_*.json; changes whenever any table does."""
+    h = hashlib.sha256()
+    for fp in sorted(DATA_DIR.glob("adagio_*.json")):
+        h.update(fp.name.encode())
+        h.update(fp.read_bytes())
+    return h.hexdigest()[:16]
+
+@functools.lru_cache(maxsize=1)
+def all_genes() -> tuple[str, ...]:
+    """Every gene in any adagio_*.json, sorted."""
+    return tuple(sorted({g for fp in DATA_DIR.glob("adagio_*.json")
+                         for g in get_risk_table(fp.stem[len("adagio_"):]).index}))
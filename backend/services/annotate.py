@@ -1,10 +1,18 @@
 # services/annotate.py
 from typing import Optional, Dict, Iterable
 from myvariant import MyVariantInfo
-import requests
+import os, requests
+from .singleflight import SingleFlight
 
 VEP_ENDPOINT = "https://rest.ensembl.org/vep/human/region"
 FIELDS = "gene.symbol,dbsnp.gene.symbol,snpeff.ann.impact"
+MYVARIANT_URL = os.getenv("MYVARIANT_URL")  # None = the public myvariant.info/v1
+# biothings sleeps this long after every 1000-ID POST, the last one included;
+# callers batch and bound their own concurrency, so the default is no sleep
+MYVARIANT_DELAY = float(os.getenv("MYVARIANT_DELAY", "0"))
+
+# keyed by (fields, rsid); genome_parser shares it for TXT uploads
+myvariant_flight = SingleFlight("myvariant")
 
 def vep_batch(hgvs_list: Iterable[str]):
     """
@@ -46,46 +54,71 @@ def _impact_from_hit(hit: dict) -> Optional[str]:
 
     return None
 
-def annotate_variants(variants) -> Dict[str, Dict[str, Optional[str]]]:
+def annotate_variants(variants, batch_size: int = 1000) -> Dict[str, Dict[str, Optional[str]]]:
     """
     Return {rsid: {'gene': str, 'impact': Optional[str]}}.
 
     Notes:
-      - Uses MyVariant's querymany for batching (fast, no manual sleeps).
+      - Consumes `variants` lazily and looks rsIDs up batch_size at a time,
+        so a variant generator is never held in memory.
       - De-duplicates rsIDs and upper-cases gene symbols like before.
       - Keys the result by the variant's rsID (input), not MyVariant _id.
     """
-    # Collect unique, valid rsIDs from the variant objects
-    by_rsid = {v.rsid: v for v in variants if getattr(v, "rsid", None) and v.rsid != "."}
-    rsids = [r for r in by_rsid.keys() if isinstance(r, str) and r.startswith("rs")]
+    ann: Dict[str, Dict[str, Optional[str]]] = {}
+    seen, batch = set(), []
+    for v in variants:
+        rsid = getattr(v, "rsid", None)
+        if not (isinstance(rsid, str) and rsid.startswith("rs")) or rsid in seen:
+            continue
+        seen.add(rsid)
+        batch.append(rsid)
+        if len(batch) >= batch_size:
+            ann.update(annotate_rsids(batch))
+            batch = []
+    ann.update(annotate_rsids(batch))
+    return ann
+
+def query_rsids(rsids: list[str], fields: str) -> Dict[str, Optional[dict]]:
+    """
+    {rsid: top MyVariant record or None}. Concurrent requests for the same
+    rsIDs share one upstream lookup (see singleflight).
+    """
+    def fetch(keys: list) -> dict:
+        mv = MyVariantInfo(url=MYVARIANT_URL)
+        mv.delay = MYVARIANT_DELAY
+        # querymany returns a list of dicts; preserves input order as much as possible
+        out = mv.querymany(
+            [rsid for _, rsid in keys],
+            scopes="dbsnp.rsid",
+            fields=fields,
+            species="human",
+            returnall=False,
+            as_dataframe=False,
+            verbose=False,
+            size=1,  # one top hit per rsID
+        )
+        got = {}
+        for res in out:
+            # For each input query, MyVariant returns either flattened fields or a 'hits' list
+            record = res["hits"][0] if ("hits" in res and res["hits"]) else res
+            got.setdefault((fields, res.get("query") or record.get("_id")), record)
+        return got
+
+    found = myvariant_flight.do_many([(fields, r) for r in rsids], fetch)
+    return {rsid: found[(fields, rsid)] for rsid in rsids}
+
+def annotate_rsids(rsids: list[str]) -> Dict[str, Dict[str, Optional[str]]]:
+    """annotate_variants for rsIDs already collected (e.g. by vcf_reader.iter_rsid_batches)."""
     if not rsids:
         return {}
 
-    mv = MyVariantInfo()
-    # querymany returns a list of dicts; preserves input order as much as possible
-    out = mv.querymany(
-        rsids,
-        scopes="dbsnp.rsid",
-        fields=FIELDS,
-        species="human",
-        returnall=False,
-        as_dataframe=False,
-        verbose=False,
-        size=1,  # one top hit per rsID
-    )
-
     ann: Dict[str, Dict[str, Optional[str]]] = {}
-    for res in out:
-        # For each input query, MyVariant returns either flattened fields or a 'hits' list
-        record = res["hits"][0] if ("hits" in res and res["hits"]) else res
-        gene = _gene_symbol_from_hit(record)
-        impact = _impact_from_hit(record)
-
-        # Prefer the original input rsID as the key (res['query']); fall back to _id if missing
-        key = res.get("query") or record.get("_id")
-        if not key:
+    for key, record in query_rsids(rsids, FIELDS).items():
+        if record is None:
             continue
 
+        gene = _gene_symbol_from_hit(record)
+        impact = _impact_from_hit(record)
         if gene:
             ann[key] = {"gene": gene.upper(), "impact": impact}
 
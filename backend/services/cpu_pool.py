@@ -0,0 +1,81 @@
+# services/cpu_pool.py
+"""
+Process pool for the CPU-bound pipeline stages (risk scoring, disease
+ranking), so async handlers don't run them on the event loop. The upload
+parse stays on a thread next to its lookups (pipeline.scan_async).
+
+Tasks take and return plain lists and dicts, never DataFrames, to keep
+pickling cheap. A task that overruns CPU_TASK_TIMEOUT can't be
+interrupted, so the pool is torn down and rebuilt; tasks that were
+running on it at the time are retried once on the new pool.
+
+CPU_POOL_WORKERS=0 runs tasks on a thread instead. That is the server
+mode's default (gunicorn.conf.py): there the web workers are the
+processes, forked with the risk tables already loaded, and a spawned pool
+per worker would only load its own copies again.
+"""
+import asyncio, multiprocessing, os, threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_TASK_TIMEOUT = float(os.getenv("CPU_TASK_TIMEOUT", "120"))
+
+class CPUTaskTimeout(Exception):
+    """A pooled task ran longer than its timeout."""
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+stats = {"tasks": 0, "timeouts": 0, "restarts": 0}
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: the API process has threads running, which fork does not copy safely
+            _pool = ProcessPoolExecutor(CPU_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _restart(broken: ProcessPoolExecutor):
+    global _pool
+    with _lock:
+        if _pool is not broken:
+            return  # someone else already replaced it
+        _pool = None
+        stats["restarts"] += 1
+    for proc in list((broken._processes or {}).values()):
+        proc.terminate()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+async def run_cpu(fn, *args, timeout: Optional[float] = None):
+    """Run fn(*args) in the pool and await the result."""
+    loop = asyncio.get_running_loop()
+    timeout = CPU_TASK_TIMEOUT if timeout is None else timeout
+    stats["tasks"] += 1
+    if CPU_POOL_WORKERS <= 0:
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+        except asyncio.TimeoutError:
+            # the thread can't be stopped; it finishes in the background
+            stats["timeouts"] += 1
+            raise CPUTaskTimeout(f"{fn.__name__} took longer than {timeout:g}s")
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            _restart(pool)
+            raise CPUTaskTimeout(f"{fn.__name__} took longer than {timeout:g}s")
+        except BrokenProcessPool:
+            _restart(pool)
+            if attempt:
+                raise
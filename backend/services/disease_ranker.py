@@ -4,24 +4,17 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Iterable, Optional
 import os
 import pandas as pd
-from .adagio_loader import load_risk_table
-from .risk_annotator import annotate_risks
+from .adagio_loader import get_risk_table
+from .risk_annotator import score_risks, attach_tips
 
 SUPPORTED_DISEASES = [
     "alzheimers", "CHD", "hypertension", "multiple_sclerosis",
     "obesity", "parkinsons", "stroke", "T1D", "T2D", "rheumatoid_arthritis"
 ]
 
-# Simple in-memory cache to avoid reloading JSON every call
-_TABLE_CACHE: dict[str, pd.DataFrame] = {}
-
 def _get_table(disease: str) -> pd.DataFrame:
-    tbl = _TABLE_CACHE.get(disease)
-    if tbl is None:
-        tbl = load_risk_table(disease)
-        _TABLE_CACHE[disease] = tbl
-        
-    return tbl
+    # cached in adagio_loader so risk_annotator shares the same copy
+    return get_risk_table(disease)
 
 def _score_only(disease: str, user_genes: set[str]) -> Optional[dict]:
     """Return {'disease', 'score'} or None if no overlap."""
@@ -40,16 +33,14 @@ def _score_only(disease: str, user_genes: set[str]) -> Optional[dict]:
 
     return {"disease": disease, "score": round(score, 6)}
 
-def disease_scores(
+def rank_diseases(
         user_genes: set[str],
         top_n: int = 3,
-        include_tips: bool = True,
         max_workers: Optional[int] = None,
     ) -> list[dict]:
     """
-    Parallel scoring across all diseases.
-    1) compute scores (no tips) in parallel
-    2) annotate only top-N (optionally in parallel), returning:
+    The CPU half of disease_scores: score every disease, keep the top-N
+    and score their genes, without tips:
        [{disease, score, risks:[…]}] sorted by score desc
     """
     if not user_genes:
@@ -68,30 +59,39 @@ def disease_scores(
             if res:
                 scored.append(res)
 
-    if not scored:
-        return []
-
     # sort and take top-N
     scored.sort(key=lambda x: x["score"], reverse=True)
-    top = scored[:top_n]
+    return [{**e, "risks": score_risks(e["disease"], user_genes)} for e in scored[:top_n]]
+
+def add_tips(ranked: list[dict], max_workers: Optional[int] = None) -> list[dict]:
+    """The I/O half: fetch tips for every ranked disease's risks, in parallel."""
+    if not ranked:
+        return ranked
+
+    max_workers = max_workers or min(8, (os.cpu_count() or 2) * 4)
+    with ThreadPoolExecutor(max_workers=min(len(ranked), max_workers)) as ex:
+        list(ex.map(lambda e: attach_tips(e["disease"], e["risks"]), ranked))
+    return ranked
+
+def disease_scores(
+        user_genes: set[str],
+        top_n: int = 3,
+        include_tips: bool = True,
+        max_workers: Optional[int] = None,
+    ) -> list[dict]:
+    """
+    Parallel scoring across all diseases.
+    1) compute scores (no tips) in parallel
+    2) annotate only top-N (optionally in parallel), returning:
+       [{disease, score, risks:[…]}] sorted by score desc
+    """
+    top = rank_diseases(user_genes, top_n, max_workers)
 
     # annotate just the top-N diseases
     # To keep latency low during demo, can set include_tips=False and
     # let the frontend fetch tips lazily per gene if desired.
     if include_tips:
-        def _annotate(entry: dict) -> dict:
-            disease = entry["disease"]
-            risks = annotate_risks(disease, user_genes)  # function adds levels + tips
-            return {**entry, "risks": risks}
-
-        annotated: list[dict] = []
-        with ThreadPoolExecutor(max_workers=min(len(top), max_workers)) as ex:
-            futs = {ex.submit(_annotate, e): e["disease"] for e in top}
-            for fut in as_completed(futs):
-                annotated.append(fut.result())
-
-        annotated.sort(key=lambda x: x["score"], reverse=True)
-        return annotated
+        return add_tips(top, max_workers)
 
     # if don’t want tips here, still return consistent shape with empty risks
     for e in top:
@@ -1,8 +1,10 @@
 # services/genome_parser.py
-from myvariant import MyVariantInfo
+from .annotate import query_rsids
+from .rsid_index import RsidIndex
+from .upload_reader import Upload, open_upload
 import pandas as pd
 from io import BytesIO
-from typing import Optional
+from typing import Iterator, Optional
 
 FIELDS = "gene.symbol,dbsnp.gene.symbol"
 
@@ -19,7 +21,8 @@ def _symbol_from_hit(hit: dict) -> Optional[str]:
 
     return None
 
-def parse_genome_file(raw_bytes: bytes, max_rsids: int = 500) -> set[str]:
+def read_rsids(raw_bytes: bytes, max_rsids: int = 500) -> list[str]:
+    """The CPU-bound half: unique rsIDs from a 23andMe-style TXT."""
     df = pd.read_csv(
         BytesIO(raw_bytes),
         sep=r"\s+",
@@ -28,32 +31,59 @@ def parse_genome_file(raw_bytes: bytes, max_rsids: int = 500) -> set[str]:
         usecols=["rsid"],
         engine="python",
     )
-    rsids = [r for r in df["rsid"].astype(str).head(max_rsids).unique() if r.startswith("rs")]
-
-    mv = MyVariantInfo()
-    # querymany returns a list of per-query dicts; set as_dataframe=False to keep it simple
-    out = mv.querymany(
-        rsids,
-        scopes="dbsnp.rsid",
-        fields=FIELDS,
-        species="human",
-        returnall=False,
-        as_dataframe=False,
-        verbose=False,
-        size=1,
-    )
+    return [r for r in df["rsid"].astype(str).head(max_rsids).unique() if r.startswith("rs")]
 
-    genes = set()
-    for res in out:
-        # Client flattens top-level fields when possible; otherwise use hits
-        if "hits" in res and res["hits"]:
-            sym = _symbol_from_hit(res["hits"][0])
+def iter_rsid_batches(src: Upload, batch_size: int = 1000, max_rsids: Optional[int] = 500,
+                      index: Optional[RsidIndex] = None) -> Iterator[list[str]]:
+    """
+    read_rsids as a stream: batches of up to batch_size rsIDs not seen in
+    an earlier batch, from the first max_rsids rows (all if None) of a TXT
+    path or file object. With an `index`, rsIDs are screened against it
+    batch_size at a time and only the ones it holds are kept.
+    """
+    seen, pending, batch, rows = set(), [], [], 0
+
+    def screen():
+        for rsid in (index.filter(pending) if index is not None else pending):
+            if rsid not in seen:
+                seen.add(rsid)
+                batch.append(rsid)
+        pending.clear()
 
-        else:
-            # Sometimes fields appear at the top level
-            sym = _symbol_from_hit(res)
+    with open_upload(src) as f:
+        for line in f:
+            line = line.split(b"#", 1)[0]
+            fields = line.split(None, 1)
+            if not fields:
+                continue
+            if max_rsids is not None and rows >= max_rsids:
+                break
+            rows += 1
+            rsid = fields[0].decode()
+            if rsid.startswith("rs"):
+                pending.append(rsid)
+                if len(pending) >= batch_size:
+                    screen()
+                    while len(batch) >= batch_size:
+                        yield batch[:batch_size]
+                        del batch[:batch_size]
+    screen()
+    while batch:
+        yield batch[:batch_size]
+        del batch[:batch_size]
 
+def genes_for_rsids(rsids: list[str]) -> set[str]:
+    """The I/O-bound half: gene symbols for rsIDs via MyVariant."""
+    if not rsids:
+        return set()
+
+    genes = set()
+    for record in query_rsids(rsids, FIELDS).values():
+        sym = _symbol_from_hit(record) if record else None
         if sym:
             genes.add(sym.upper())
             
     return genes
+
+def parse_genome_file(raw_bytes: bytes, max_rsids: int = 500) -> set[str]:
+    return genes_for_rsids(read_rsids(raw_bytes, max_rsids))
@@ -0,0 +1,229 @@
+# services/metrics.py
+"""
+A small in-process metrics registry rendered in the Prometheus text
+format (version 0.0.4), enough for the pipeline's counters and
+histograms without another dependency.
+
+    with stage_timer("annotate", "upload"):
+        ...
+    observe_sizes("upload", rsids=len(rsids), genes=len(genes))
+
+Values are per process. Behind several workers, merge() combines their
+renders into one exposition with a `worker` label per series, so a scrape
+sees every worker whichever one answers it (sum by the other labels in
+PromQL for totals).
+"""
+import threading, time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+def _labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in self._values.items()]
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, list] = {}  # key -> [bucket counts..., sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-1] += value
+
+    def samples(self) -> list[str]:
+        out = []
+        with self._lock:
+            for key, state in self._values.items():
+                total = 0
+                for bound, n in zip(self.buckets, state):
+                    total += n
+                    le = 'le="' + _num(bound) + '"'
+                    out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}")
+                out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(state[-1])}")
+                out.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+        return out
+
+class Callback:
+    """A gauge or counter read at scrape time: fn() -> {label values tuple: value}."""
+
+    def __init__(self, name: str, help: str, type: str, labelnames: tuple, fn: Callable[[], dict]):
+        self.name, self.help, self.type, self.labelnames, self.fn = name, help, type, labelnames, fn
+
+    def samples(self) -> list[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return []
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in values.items() if v is not None]
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = ()) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_fn(self, name: str, help: str, fn: Callable[[], dict], labelnames: tuple = ()):
+        return self.register(Callback(name, help, "gauge", labelnames, fn))
+
+    def counter_fn(self, name: str, help: str, fn: Callable[[], dict], labelnames: tuple = ()):
+        return self.register(Callback(name, help, "counter", labelnames, fn))
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            samples = m.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+def merge(rendered: dict[str, str], label: str = "worker") -> str:
+    """One exposition from several Registry.render() outputs, keyed by `label` value."""
+    headers, samples = {}, {}
+    for value, text in rendered.items():
+        extra = f'{label}="{_escape(value)}"'
+        name = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                name = line.split(" ", 3)[2]
+                header = headers.setdefault(name, [])
+                if len(header) < 2:  # HELP and TYPE, from the first render that has them
+                    header.append(line)
+                continue
+            if not line:
+                continue
+            series, number = line.rsplit(" ", 1)
+            if "{" in series:
+                series = series.replace("{", "{" + extra + ",", 1)
+            else:
+                series = f"{series}{{{extra}}}"
+            samples.setdefault(name, []).append(f"{series} {number}")
+    lines = []
+    for name, header in headers.items():
+        lines.extend(header)
+        lines.extend(samples.get(name, ()))
+    return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (0, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+STAGE_SECONDS = registry.histogram(
+    "geneguard_stage_seconds",
+    "Wall time of one pipeline stage.",
+    ("endpoint", "stage"), LATENCY_BUCKETS,
+)
+STAGE_ERRORS = registry.counter(
+    "geneguard_stage_errors_total",
+    "Pipeline stages that raised.",
+    ("endpoint", "stage"),
+)
+INPUT_SIZE = registry.histogram(
+    "geneguard_input_size",
+    "Items entering the pipeline per analysis, by kind (variants, rsids, genes, risks).",
+    ("endpoint", "kind"), SIZE_BUCKETS,
+)
+ANALYSES = registry.counter(
+    "geneguard_analyses_total",
+    "Analyses finished, by outcome.",
+    ("endpoint", "outcome"),
+)
+
+# observations made under capture() are also collected, so a worker
+# process can hand them back to the API process (see replay)
+_local = threading.local()
+
+def _captured(event: tuple):
+    buf = getattr(_local, "buf", None)
+    if buf is not None:
+        buf.append(event)
+
+def record_stage(endpoint: str, stage: str, seconds: float, failed: bool = False):
+    if failed:
+        STAGE_ERRORS.inc(endpoint=endpoint, stage=stage)
+    STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=stage)
+    _captured(("stage", endpoint, stage, seconds, failed))
+
+def record_size(endpoint: str, kind: str, n: int):
+    INPUT_SIZE.observe(n, endpoint=endpoint, kind=kind)
+    _captured(("size", endpoint, kind, n))
+
+@contextmanager
+def capture():
+    _local.buf = buf = []
+    try:
+        yield buf
+    finally:
+        _local.buf = None
+
+def replay(events: list):
+    for kind, *args in events or ():
+        (record_stage if kind == "stage" else record_size)(*args)
+
+@contextmanager
+def stage_timer(stage: str, endpoint: str):
+    t0 = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record_stage(endpoint, stage, time.perf_counter() - t0, failed)
+
+def observe_sizes(endpoint: str, **sizes: Optional[int]):
+    for kind, n in sizes.items():
+        if n is not None:
+            record_size(endpoint, kind, n)
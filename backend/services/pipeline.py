@@ -0,0 +1,224 @@
+# services/pipeline.py
+"""
+The analysis pipeline as plain functions over an upload (a path, or the
+request's file object), shared by the synchronous endpoints and the job
+workers:
+
+    parse ⇉ annotate ⇉ burden → score/rank → tips   (→ persist, by the caller)
+
+The first three stages stream: rsIDs are read from the upload in batches
+of ANNOTATE_BATCH, each batch goes to MyVariant on a thread while the
+next one is parsed (at most ANNOTATE_INFLIGHT lookups at once), and genes
+and burden are folded in as batches come back. Memory stays flat however
+large the file; only the rsIDs seen so far are kept, for de-duplication.
+
+With a relevance index (see rsid_index) rsIDs outside every ADAGIO gene
+are dropped as they are read, so only the few that can matter are looked
+up and the whole file is read. Without one, uploads are capped at
+DEFAULT_MAX_RECORDS rows unless the caller says otherwise.
+
+`progress(stage, fraction)` is called as each stage starts, so a job can
+report where it is; the synchronous endpoints pass nothing.
+
+The async variants run the streaming scan on a thread, reading the
+upload where it is and overlapping its parse with the lookups; a process
+pool could only parse the whole file first and send every rsID back.
+Scoring, the CPU-heavy part, goes through run_cpu.
+"""
+import asyncio, os, time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from . import genome_parser, vcf_reader
+from .annotate import annotate_rsids
+from .burden import burden_scores
+from .risk_annotator import score_risks, attach_tips
+from .disease_ranker import rank_diseases, add_tips
+from .cpu_pool import run_cpu
+from .metrics import stage_timer, observe_sizes, record_stage
+from .rsid_index import RsidIndex, get_rsid_index
+from .upload_reader import Upload
+
+ANNOTATE_BATCH = int(os.getenv("ANNOTATE_BATCH", "1000"))      # rsIDs per MyVariant POST
+ANNOTATE_INFLIGHT = int(os.getenv("ANNOTATE_INFLIGHT", "2"))   # lookups overlapping the parse
+DEFAULT_MAX_RECORDS = int(os.getenv("DEFAULT_MAX_RECORDS", "10000"))  # rows read when nothing screens them
+
+DISCLAIMER_TXT = (
+    "Research-grade only; not a diagnostic tool. "
+    "Consult a licensed genetic counselor before acting."
+)
+
+Progress = Optional[Callable[[str, float], None]]
+
+def _noop(stage: str, fraction: float):
+    pass
+
+def file_kind(filename: str) -> Optional[str]:
+    if filename.endswith((".txt", ".tsv")):
+        return "TXT"
+    if filename.endswith((".vcf", ".vcf.gz")):
+        return "VCF"
+    return None
+
+def record_limit(max_records: Optional[int], index: Optional[RsidIndex]) -> Optional[int]:
+    """Rows to read: the caller's cap, else none with an index and DEFAULT_MAX_RECORDS without."""
+    if max_records:
+        return max_records
+    return None if index is not None else DEFAULT_MAX_RECORDS
+
+def rsid_batches(src: Upload, filename: str, max_records: Optional[int], batch_size: int = ANNOTATE_BATCH,
+                 index: Optional[RsidIndex] = None):
+    """(new rsIDs, variants read) per batch, screened by index; TXT uploads have no variant count."""
+    if file_kind(filename) == "TXT":
+        return ((b, None) for b in genome_parser.iter_rsid_batches(src, batch_size, max_records, index))
+    return vcf_reader.iter_rsid_batches(src, batch_size, max_records, index)
+
+def lookup(rsids: list[str], filename: str):
+    """
+    I/O: map rsIDs via MyVariant. TXT uploads give a set of genes, VCF
+    uploads the {rsid: {'gene', 'impact'}} annotation burden needs.
+    """
+    if file_kind(filename) == "TXT":
+        return genome_parser.genes_for_rsids(rsids)
+    return annotate_rsids(rsids)
+
+class Scan:
+    """What the streaming stages leave behind: genes, burden (VCF only) and input sizes."""
+
+    def __init__(self, vcf: bool):
+        self.genes: set[str] = set()
+        self.burden: Optional[Counter] = Counter() if vcf else None
+        self.rsids = 0
+        self.variants: Optional[int] = 0 if vcf else None
+
+    def add(self, found):
+        if self.burden is None:
+            self.genes |= found
+            return
+        # update, not +=: genes whose variants all weigh 0 stay in
+        self.burden.update(burden_scores(found, severe_only=False))
+        self.genes.update(self.burden)
+
+def scan(src: Upload, filename: str, max_records: Optional[int], endpoint: str, progress: Progress = None) -> Scan:
+    """
+    Parse, annotate and burden in one pass, with lookups overlapping the
+    parse. The three stage timings are recorded separately: time spent
+    reading, time blocked on lookups, and time folding results in.
+    """
+    progress = progress or _noop
+    index = get_rsid_index()
+    max_records = record_limit(max_records, index)
+    result = Scan(vcf=file_kind(filename) == "VCF")
+    timings = {"parse": 0.0, "annotate": 0.0, "burden": 0.0}
+    pending: deque = deque()
+
+    def fold(future):
+        t0 = time.perf_counter()
+        found = future.result()
+        t1 = time.perf_counter()
+        result.add(found)
+        timings["annotate"] += t1 - t0
+        timings["burden"] += time.perf_counter() - t1
+
+    progress("parse", 0.0)
+    stage, failed = "parse", True
+    try:
+        with ThreadPoolExecutor(ANNOTATE_INFLIGHT, thread_name_prefix="annotate") as pool:
+            batches = rsid_batches(src, filename, max_records, index=index)
+            while True:
+                stage, t0 = "parse", time.perf_counter()
+                batch = next(batches, None)
+                timings["parse"] += time.perf_counter() - t0
+                if batch is None:
+                    break
+                rsids, variants = batch
+                result.rsids += len(rsids)
+                if variants is not None:
+                    result.variants += variants
+                stage = "annotate"
+                pending.append(pool.submit(lookup, rsids, filename))
+                if len(pending) >= ANNOTATE_INFLIGHT:
+                    fold(pending.popleft())
+                    if max_records:
+                        progress("annotate", 0.2 + 0.4 * min(1.0, result.rsids / max_records))
+            stage = "annotate"
+            while pending:
+                fold(pending.popleft())
+        failed = False
+    finally:
+        for name, seconds in timings.items():
+            record_stage(endpoint, name, seconds, failed and name == stage)
+    return result
+
+def _analysis(genes: set[str], burden, risks: list[dict]) -> dict:
+    # inputs kept for re-scoring: sorted genes plus the aligned burden vector
+    gene_list = sorted(genes)
+    return {
+        "gene_count": len(genes),
+        "risks": risks,
+        "genes": gene_list,
+        "burden": [int(burden[g]) for g in gene_list] if burden else None,
+    }
+
+def _no_genes(filename: str) -> ValueError:
+    return ValueError("No gene symbols extracted from file." if file_kind(filename) == "TXT"
+                      else "No mappable rsIDs in file.")
+
+def analyze(src: Upload, filename: str, disease: str, max_records: Optional[int], progress: Progress = None,
+            endpoint: str = "job_analyze") -> dict:
+    """Score one upload against one disease."""
+    progress = progress or _noop
+    found = scan(src, filename, max_records, endpoint, progress)
+
+    progress("rank", 0.8)
+    with stage_timer("score", endpoint):
+        rows = score_risks(disease, sorted(found.genes))
+    with stage_timer("tips", endpoint):
+        risks = attach_tips(disease, rows)
+
+    observe_sizes(endpoint, variants=found.variants, rsids=found.rsids, genes=len(found.genes), risks=len(risks))
+    return _analysis(found.genes, found.burden, risks)
+
+def auto_rank(src: Upload, filename: str, max_records: Optional[int], progress: Progress = None,
+              endpoint: str = "job_auto_rank") -> dict:
+    """Rank every supported disease for one upload; top 3 with risks."""
+    progress = progress or _noop
+    found = scan(src, filename, max_records, endpoint, progress)
+    observe_sizes(endpoint, variants=found.variants, rsids=found.rsids, genes=len(found.genes))
+    if not found.genes:
+        raise _no_genes(filename)
+
+    progress("rank", 0.8)
+    with stage_timer("rank", endpoint):
+        ranked = rank_diseases(found.genes, top_n=3)
+    with stage_timer("tips", endpoint):
+        ranked = add_tips(ranked)
+    return {"gene_count": len(found.genes), "candidates": ranked}
+
+# async variants for request handlers: the streaming scan on a thread, scoring through run_cpu
+async def scan_async(src: Upload, filename: str, max_records: Optional[int], endpoint: str) -> Scan:
+    return await asyncio.to_thread(scan, src, filename, max_records, endpoint)
+
+async def analyze_async(src: Upload, filename: str, disease: str, max_records: Optional[int],
+                        endpoint: str = "upload") -> dict:
+    found = await scan_async(src, filename, max_records, endpoint)
+    with stage_timer("score", endpoint):
+        rows = await run_cpu(score_risks, disease, sorted(found.genes))
+    with stage_timer("tips", endpoint):
+        risks = await asyncio.to_thread(attach_tips, disease, rows)
+
+    observe_sizes(endpoint, variants=found.variants, rsids=found.rsids, genes=len(found.genes), risks=len(risks))
+    return _analysis(found.genes, found.burden, risks)
+
+async def auto_rank_async(src: Upload, filename: str, max_records: Optional[int], endpoint: str = "auto_rank") -> dict:
+    found = await scan_async(src, filename, max_records, endpoint)
+    observe_sizes(endpoint, variants=found.variants, rsids=found.rsids, genes=len(found.genes))
+    if not found.genes:
+        raise _no_genes(filename)
+
+    with stage_timer("rank", endpoint):
+        ranked = await run_cpu(rank_diseases, sorted(found.genes), 3)
+    with stage_timer("tips", endpoint):
+        ranked = await asyncio.to_thread(add_tips, ranked)
+    return {"gene_count": len(found.genes), "candidates": ranked}
@@ -1,42 +1,65 @@
 # services/risk_annotator.py
+import functools
+from typing import Iterable
 import numpy as np
 import pandas as pd
-from .adagio_loader import load_risk_table
+from .adagio_loader import get_risk_table
 from services.tip_service import get_tips
 
-def annotate_risks(disease: str, user_genes: set[str]):
+@functools.lru_cache(maxsize=None)
+def _scoring_arrays(disease: str):
     """
-    Return list[dict] rows ready for JSON, with levels defined by rank:
+    Risk table as flat arrays, rows pre-sorted by risk DESC, with the
+    rank-based level already assigned:
         -Top   100 → High
         -Next  200 → Medium
         -Next  200 → Low
     """
-    table = load_risk_table(disease)
-    if table.empty:
-        return []
-
-    # keep only user genes
-    hits = table.loc[table.index.intersection(user_genes)].copy()
-    if hits.empty:
-        return []
-
-    # sort by risk DESC so rank 0 = highest
-    hits.sort_values("risk", ascending=False, inplace=True)
-    hits.reset_index(inplace=True) # index column becomes 'index'
-    hits.rename(columns={"index": "gene"}, inplace=True)
-
-    # rank-based level assignment
-    n = len(hits)
-    ranks = np.arange(n)        # 0, 1, 2, …
-
-    hits["level"] = pd.cut(
-        hits["rank"],
+    table = get_risk_table(disease)
+    table = table.iloc[np.argsort(-table["risk"].to_numpy(), kind="stable")]
+    levels = pd.cut(
+        table["rank"],
         bins=[0, 100, 300, 1_000],       # 1-100 High, 101-300 Medium, 301+ Low
         labels=["High", "Medium", "Low"],
         right=True,  # include upper edge
     )
+    return (
+        table.index,
+        table["risk"].to_numpy(dtype=float),
+        table["rank"].to_numpy(),
+        np.asarray(levels.astype(object)),
+    )
 
-    # attach tips
-    hits["tips"] = hits.apply(lambda r: get_tips(r["gene"], disease), axis=1)
+def score_many(disease: str, gene_sets: Iterable[Iterable[str]]) -> list[list[dict]]:
+    """
+    Score several gene sets against one disease table without tips.
+    Each result is sorted by risk DESC (rank 0 = highest).
+    """
+    index, risk, rank, level = _scoring_arrays(disease)
+    out = []
+    for genes in gene_sets:
+        pos = index.get_indexer(list(genes))
+        pos = np.sort(pos[pos >= 0])     # table order == risk order
+        out.append([{
+            "gene": index[i],
+            "risk": float(risk[i]),
+            "rank": int(rank[i]),
+            "level": level[i],
+        } for i in pos])
+    return out
+
+def score_risks(disease: str, user_genes: Iterable[str]) -> list[dict]:
+    return score_many(disease, [user_genes])[0]
+
+def annotate_risks(disease: str, user_genes: set[str]):
+    """
+    Return list[dict] rows ready for JSON, with levels defined by rank
+    (see _scoring_arrays) and lifestyle tips attached.
+    """
+    return attach_tips(disease, score_risks(disease, user_genes))
 
-    return hits.to_dict(orient="records")
\ No newline at end of file
+def attach_tips(disease: str, rows: list[dict]) -> list[dict]:
+    """Add lifestyle tips to scored rows in place (network; keep off the CPU pool)."""
+    for row in rows:
+        row["tips"] = get_tips(row["gene"], disease)
+    return rows
@@ -0,0 +1,102 @@
+# services/rsid_index.py
+"""
+The relevance prefilter. Only rsIDs inside a gene of some adagio_*.json
+table can change a score, and on a consumer chip that is a small share of
+the file. tools/build_rsid_index.py writes those rsIDs' numbers as a
+sorted uint64 array (data/rsid_index.npy) with a sidecar recording the
+risk table version it was built for. Uploads are screened against it
+before anything goes to MyVariant.
+
+The array is memory-mapped, so it is read once into the page cache and
+shared by every worker on the box. Without an index file (or with one
+built for other tables) nothing is screened and uploads are capped at
+DEFAULT_MAX_RECORDS as before.
+"""
+import json, os, re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from .adagio_loader import DATA_DIR, risk_table_version
+
+RSID_INDEX = Path(os.getenv("RSID_INDEX", str(DATA_DIR / "rsid_index.npy")))
+RSID_PATTERN = r"^rs[0-9]{1,19}$"  # 19 digits always fit a uint64
+_RSID = re.compile(RSID_PATTERN)
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+def rsid_numbers(rsids: Iterable[str]) -> np.ndarray:
+    """uint64 numbers of well-formed rsIDs; anything else is dropped."""
+    return np.fromiter((int(r[2:]) for r in rsids if _RSID.match(r)), dtype=np.uint64)
+
+class RsidIndex:
+    """Membership over a sorted uint64 array of rsID numbers."""
+
+    def __init__(self, numbers: np.ndarray, version: Optional[str] = None):
+        self.numbers = numbers
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def contains(self, numbers: np.ndarray) -> np.ndarray:
+        if not len(self.numbers):
+            return np.zeros(len(numbers), dtype=bool)
+        i = np.searchsorted(self.numbers, numbers)
+        return self.numbers[np.minimum(i, len(self.numbers) - 1)] == numbers
+
+    def filter(self, rsids: list[str]) -> list[str]:
+        """The rsIDs in the index, in order."""
+        rsids = [r for r in rsids if _RSID.match(r)]
+        keep = self.contains(np.fromiter((int(r[2:]) for r in rsids), dtype=np.uint64, count=len(rsids)))
+        return [r for r, k in zip(rsids, keep.tolist()) if k]
+
+    def select(self, ids: pa.Array) -> pa.Array:
+        """filter for an Arrow string array; nulls and malformed IDs are dropped."""
+        ids = ids.filter(pc.match_substring_regex(ids, RSID_PATTERN))
+        numbers = pc.cast(pc.utf8_slice_codeunits(ids, 2), pa.uint64()).to_numpy()
+        return ids.filter(pa.array(self.contains(numbers)))
+
+def save_index(numbers: np.ndarray, path: Path = RSID_INDEX, sources: Optional[list[str]] = None) -> RsidIndex:
+    """Sort, de-duplicate and write an index for the current risk tables."""
+    numbers = np.unique(np.asarray(numbers, dtype=np.uint64))
+    np.save(path, numbers)
+    _meta_path(path).write_text(json.dumps({
+        "risk_table_version": risk_table_version(),
+        "rsids": len(numbers),
+        "sources": sources or [],
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }, indent=2) + "\n")
+    return RsidIndex(numbers, risk_table_version())
+
+def load_index(path: Path = RSID_INDEX) -> Optional[RsidIndex]:
+    """The index at path, memory-mapped; None if missing or built for other tables."""
+    if not path.exists():
+        return None
+    meta = json.loads(_meta_path(path).read_text()) if _meta_path(path).exists() else {}
+    version = meta.get("risk_table_version")
+    if version != risk_table_version():
+        print(f"rsid index {path} was built for risk tables {version}, not {risk_table_version()}; "
+              "not screening uploads until it is rebuilt")
+        return None
+    return RsidIndex(np.load(path, mmap_mode="r"), version)
+
+_UNSET = object()
+_index = _UNSET
+
+def get_rsid_index() -> Optional[RsidIndex]:
+    """The process-wide index, loaded on first use."""
+    global _index
+    if _index is _UNSET:
+        _index = load_index()
+        if _index is not None:
+            print(f"rsid index: {len(_index):,} relevant rsIDs from {RSID_INDEX}")
+    return _index
+
+def set_rsid_index(index: Optional[RsidIndex]):
+    """Swap the process-wide index (after a rebuild, or None to screen nothing)."""
+    global _index
+    _index = index
@@ -0,0 +1,100 @@
+# services/singleflight.py
+"""
+Single-flight call coalescing: while a call for a key is in flight, other
+callers for the same key wait for it and share its result (or error)
+instead of making their own. Nothing is cached once the call returns.
+
+Coalescing is per process; threads in the API process share flights,
+job and pool workers each have their own.
+"""
+import threading
+from typing import Callable, Hashable, Iterable
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        # calls: keys fetched upstream; shared: duplicate keys that rode along
+        self.stats = {"calls": 0, "shared": 0, "batches": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """Return fn(), or the result of an identical call already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            return call.result()
+
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def do_many(self, keys: Iterable[Hashable], fetch: Callable[[list], dict]) -> dict:
+        """
+        Batch form: fetch(keys) -> {key: value} is called once with only the
+        keys nobody else is fetching; the rest are waited for. Keys missing
+        from fetch's result map to None.
+        """
+        own, waiting = {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is not None:
+                    waiting[key] = call
+                else:
+                    own[key] = self._calls[key] = _Call()
+            self.stats["shared"] += len(waiting)
+            self.stats["calls"] += len(own)
+            self.stats["batches"] += bool(own)
+
+        out = {}
+        if own:
+            try:
+                got = fetch(list(own))
+                for key, call in own.items():
+                    out[key] = call.value = got.get(key)
+            except BaseException as e:
+                for call in own.values():
+                    call.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        del self._calls[key]
+                for call in own.values():
+                    call.event.set()
+
+        for key, call in waiting.items():
+            out[key] = call.result()
+        return out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), **self.stats}
@@ -1,16 +1,23 @@
 import functools, httpx, os, random, datetime, re
 from dotenv import load_dotenv
+from .singleflight import SingleFlight
 
 load_dotenv()
 
-ENDPOINT = "https://api.openai.com/v1/chat/completions"
+ENDPOINT = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/chat/completions"
 MODEL = "gpt-4o-mini"
 KEY = os.getenv("OPENAI_API_KEY")
 if not KEY:
     raise RuntimeError("OPENAI_API_KEY not set")
 
+# concurrent misses for the same (gene, disease) share one completion call
+tips_flight = SingleFlight("tips")
+
 @functools.lru_cache(maxsize=2048)
 def get_tips(gene: str, disease: str) -> list[str]:
+    return tips_flight.do((gene, disease), lambda: _fetch_tips(gene, disease))
+
+def _fetch_tips(gene: str, disease: str) -> list[str]:
     # Random seed so same gene/disease can vary day-to-day but still cached daily
     seed = datetime.date.today().isoformat()
     prompt = (
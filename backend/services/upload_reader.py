@@ -0,0 +1,27 @@
+# services/upload_reader.py
+"""
+Line-at-a-time access to an upload, whether it is a path on disk or the
+request's (spooled) file object, gzip-compressed or not. The TXT and VCF
+readers stream rsIDs from it in batches without holding the whole file.
+"""
+import gzip, os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Union
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+Upload = Union[str, os.PathLike, BinaryIO]
+
+@contextmanager
+def open_upload(src: Upload) -> Iterator[BinaryIO]:
+    """Binary lines of `src`, gunzipped if it starts with the gzip magic (BGZF included)."""
+    owned = isinstance(src, (str, os.PathLike))
+    f = open(src, "rb") if owned else src
+    try:
+        start = f.tell()
+        gzipped = f.read(2) == GZIP_MAGIC
+        f.seek(start)
+        yield gzip.GzipFile(fileobj=f, mode="rb") if gzipped else f
+    finally:
+        if owned:
+            f.close()
@@ -1,9 +1,29 @@
 # services/vcf_reader.py
+"""
+Two ways through a VCF:
+
+  - stream_variants: cyvcf2, one Variant namedtuple per ALT allele. Fine
+    for a few thousand records; on WGS-sized files the tuples themselves
+    are most of the cost.
+  - read_batches / iter_rsid_batches: pyarrow's CSV reader parses the
+    fixed columns in C into Arrow column chunks, so no Python object is
+    made per record. Only the unique rsIDs ever become Python strings.
+"""
+import os
 from cyvcf2 import VCF
 from collections import namedtuple
+from typing import Iterator, Optional
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+from .rsid_index import RsidIndex
+from .upload_reader import GZIP_MAGIC, Upload, open_upload
 
 Variant = namedtuple("Variant", ["chrom", "pos", "ref", "alt", "rsid"])
 
+BLOCK_SIZE = 1 << 20  # bytes of VCF text parsed per Arrow chunk
+BATCH_SIZE = 65_536   # rows per read_batches batch
+
 def stream_variants(vcf_path, max_records=None):
     """Yield Variant tuples from a .vcf(.gz) file."""
     for i, record in enumerate(VCF(vcf_path)):
@@ -12,3 +32,108 @@ def stream_variants(vcf_path, max_records=None):
         rsid = record.ID  # may be '.'
         for alt in record.ALT:                # multiallelic handled
             yield Variant(record.CHROM, record.POS, record.REF, alt, rsid)
+
+def _header(f) -> tuple[list[str], int, bool]:
+    """(column names, header lines, any data after them) from the #CHROM line."""
+    with open_upload(f) as lines:
+        for n, line in enumerate(lines, 1):
+            if line.startswith(b"#CHROM"):
+                names = line[1:].decode().rstrip("\r\n").split("\t")
+                return names, n, bool(next(lines, b"").strip())
+            if line[:1] != b"#":
+                break
+    raise ValueError("VCF has no #CHROM header line.")
+
+def _skip_row(row) -> str:
+    return "skip"  # short or ragged lines, like the line reader used to
+
+def _records(src: Upload, max_records=None, block_size: int = BLOCK_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Record-level Arrow chunks with columns CHROM, POS, ID, REF, ALT; '.'
+    is null. Gzip (BGZF included) is inflated by Arrow, off the GIL.
+    """
+    owned = isinstance(src, (str, os.PathLike))
+    f = open(src, "rb") if owned else src
+    try:
+        start = f.tell()
+        gzipped = f.read(2) == GZIP_MAGIC
+        f.seek(start)
+        names, skip, has_rows = _header(f)
+        f.seek(start)
+        # an Arrow reader over an empty body aborts the interpreter at exit (pyarrow 17)
+        if not has_rows:
+            return
+
+        stream = pa.PythonFile(f, mode="r")
+        if gzipped:
+            stream = pa.CompressedInputStream(stream, "gzip")
+        fixed = names[:5]  # CHROM POS ID REF ALT, whatever the header calls them
+        reader = pcsv.open_csv(
+            stream,
+            read_options=pcsv.ReadOptions(skip_rows=skip, column_names=names, block_size=block_size),
+            parse_options=pcsv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=_skip_row),
+            convert_options=pcsv.ConvertOptions(
+                include_columns=fixed,
+                column_types={n: pa.int64() if i == 1 else pa.string() for i, n in enumerate(fixed)},
+                null_values=["."],
+                strings_can_be_null=True,
+            ),
+        )
+        records = 0
+        for chunk in reader:
+            if max_records:
+                chunk = chunk.slice(0, max_records - records)
+            records += chunk.num_rows
+            yield chunk.rename_columns(["CHROM", "POS", "ID", "REF", "ALT"])
+            if max_records and records >= max_records:
+                break
+    finally:
+        if owned:
+            f.close()
+
+def read_batches(src: Upload, batch_size: int = BATCH_SIZE, max_records=None) -> Iterator[pa.RecordBatch]:
+    """
+    Arrow batches of up to batch_size rows with the Variant columns (chrom,
+    pos, ref, alt, rsid): one row per ALT allele like stream_variants,
+    rsid null where the ID is '.'. Use .column(...).to_numpy() for NumPy.
+    """
+    for rec in _records(src, max_records):
+        alts = pc.split_pattern(rec.column("ALT"), ",")
+        rows = pc.list_parent_indices(alts)  # record of each allele; ALT '.' has none
+        batch = pa.RecordBatch.from_arrays(
+            [rec.column("CHROM").take(rows), rec.column("POS").take(rows), rec.column("REF").take(rows),
+             pc.list_flatten(alts), rec.column("ID").take(rows)],
+            names=list(Variant._fields),
+        )
+        for i in range(0, batch.num_rows, batch_size):
+            yield batch.slice(i, batch_size)
+
+def iter_rsid_batches(src: Upload, batch_size: int = 1000, max_records=None,
+                      index: Optional[RsidIndex] = None) -> Iterator[tuple[list[str], int]]:
+    """
+    Stream (new rsIDs, variants read) batches from a .vcf(.gz) path or file
+    object. Each batch has up to batch_size rsIDs not seen in an earlier
+    one; variants counts ALT alleles like stream_variants. Works on the
+    Arrow chunks: alleles are counted, rsIDs screened against `index` (if
+    given) and de-duplicated per chunk before anything becomes a Python object.
+    """
+    seen, batch, variants = set(), [], 0
+    for rec in _records(src, max_records):
+        alleles = pc.sum(pc.add(pc.count_substring(rec.column("ALT"), ","), 1)).as_py()
+        variants += alleles or 0
+        if index is not None:
+            ids = pc.unique(index.select(rec.column("ID")))
+        else:
+            ids = pc.unique(rec.column("ID"))
+            ids = ids.filter(pc.starts_with(ids, "rs"))
+        # to_numpy builds the str objects several times faster than to_pylist
+        for rsid in ids.to_numpy(zero_copy_only=False).tolist():
+            if rsid in seen:
+                continue
+            seen.add(rsid)
+            batch.append(rsid)
+            if len(batch) >= batch_size:
+                yield batch, variants
+                batch, variants = [], 0
+    if batch or variants:
+        yield batch, variants
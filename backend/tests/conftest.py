@@ -0,0 +1,7 @@
+import os, pathlib, sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# read at import by services.tip_service; nothing here calls out
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,108 @@
+import asyncio, json
+from routes.admission import AdmissionController, AdmissionMiddleware, client_key, user_keys
+
+MB = 1 << 20
+
+def _controller(**kw):
+    return AdmissionController(**{"max_concurrent": 2, "max_bytes": 100 * MB, "max_per_user": 1,
+                                  "unknown_bytes": 10 * MB, **kw})
+
+def test_admit_and_release_balance():
+    c = _controller(max_per_user=2)
+    assert c.try_admit(("uid:a",), 5 * MB) is None
+    assert c.try_admit(("uid:a",), None) is None
+    assert (c.active, c.active_bytes) == (2, 15 * MB)
+    c.release(("uid:a",), 5 * MB)
+    c.release(("uid:a",), None)
+    snap = c.snapshot()
+    assert (snap["active"], snap["active_bytes"], snap["active_users"]) == (0, 0, 0)
+    assert snap["admitted"] == 2
+
+def test_concurrency_limit():
+    c = _controller(max_per_user=5)
+    assert c.try_admit(("uid:a",), MB) is None
+    assert c.try_admit(("uid:b",), MB) is None
+    assert c.try_admit(("uid:c",), MB) == "concurrency"
+    c.release(("uid:a",), MB)
+    assert c.try_admit(("uid:c",), MB) is None
+    assert c.stats["rejected_concurrency"] == 1
+
+def test_byte_limit_but_idle_worker_takes_anything():
+    c = _controller()
+    assert c.try_admit(("uid:a",), 500 * MB) is None  # alone, however large
+    assert c.try_admit(("uid:b",), MB) == "bytes"
+    c.release(("uid:a",), 500 * MB)
+    assert c.try_admit(("uid:b",), 60 * MB) is None
+    assert c.try_admit(("uid:c",), 50 * MB) == "bytes"
+    assert c.stats["rejected_bytes"] == 2
+
+def test_per_user_limit_is_per_key():
+    c = _controller()
+    assert c.try_admit(("uid:a",), MB) is None
+    assert c.try_admit(("uid:a",), MB) == "user"
+    assert c.try_admit(("uid:b",), MB) is None
+    assert c.stats["rejected_user"] == 1
+    assert c.snapshot()["active_users"] == 2
+
+def test_rejection_reserves_nothing():
+    c = _controller()
+    c.try_admit(("uid:a",), MB)
+    c.try_admit(("uid:a",), MB)
+    assert (c.active, c.active_bytes, c._per_user) == (1, MB, {"uid:a": 1})
+
+def _scope(query=b"", client=("203.0.113.7", 5000), headers=(), path="/upload-genome"):
+    return {"type": "http", "method": "POST", "path": path, "query_string": query,
+            "client": client, "headers": list(headers)}
+
+def test_signed_in_requests_keyed_on_uid():
+    scope = _scope(b"disease=T2D&firebase_uid=abc%2F123")
+    assert client_key(scope) == "uid:abc/123"
+    assert user_keys(scope) == ("uid:abc/123",)
+
+def test_anonymous_requests_keyed_on_ip():
+    assert user_keys(_scope(b"disease=T2D")) == ("ip:203.0.113.7",)
+    assert user_keys(_scope(b"firebase_uid=")) == ("ip:203.0.113.7",)
+    assert client_key(_scope(client=None)) == "ip:unknown"
+
+def test_users_behind_one_ip_do_not_share_a_bucket():
+    c = _controller(max_concurrent=10)
+    for uid in (b"a", b"b", b"c"):
+        assert c.try_admit(user_keys(_scope(b"firebase_uid=" + uid)), MB) is None
+
+async def _call(middleware, scope) -> list:
+    sent = []
+    async def send(message):
+        sent.append(message)
+    await middleware(scope, None, send)
+    return sent
+
+def test_middleware_rejects_with_retry_after_and_releases():
+    c = _controller(retry_after=7)
+    scope = _scope(b"firebase_uid=a", headers=[(b"content-length", b"1024")])
+    inner = []
+
+    async def app(scope, receive, send):
+        # the same user again while this request runs
+        inner.append(c.snapshot()["active_bytes"])
+        inner.append(await _call(middleware, scope))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    middleware = AdmissionMiddleware(app, c)
+    sent = asyncio.run(_call(middleware, scope))
+    assert sent[0]["status"] == 200
+    active_bytes, (start, body) = inner
+    assert active_bytes == 1024
+    assert start["status"] == 503
+    assert dict(start["headers"])[b"retry-after"] == b"7"
+    assert json.loads(body["body"])["detail"]
+    assert (c.active, c.active_bytes, c._per_user) == (0, 0, {})
+
+def test_middleware_ignores_other_routes():
+    c = _controller(max_concurrent=0)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    sent = asyncio.run(_call(AdmissionMiddleware(app, c), _scope(path="/analyses")))
+    assert sent[0]["status"] == 200
+    assert c.stats["admitted"] == 0
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+import pytest
+from starlette.requests import Request
+from routes import http_cache
+
+def _request(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    http_cache.response_cache.clear()
+    http_cache.version_cache.clear()
+
+KEY = ("analysis", "a1", "v1@2026-01-01T00:00:00+00:00")
+
+def test_etag_is_stable_and_quoted():
+    assert http_cache.make_etag(*KEY) == http_cache.make_etag(*KEY)
+    assert http_cache.make_etag(*KEY).startswith('"') and http_cache.make_etag(*KEY).endswith('"')
+    assert http_cache.make_etag("analysis", "a1", "v2") != http_cache.make_etag(*KEY)
+    assert http_cache.make_etag("csv", *KEY[1:]) != http_cache.make_etag(*KEY)
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ("{etag}", True),
+    ("W/{etag}", True),
+    ('"other", {etag}', True),
+    ('"other"', False),
+])
+def test_etag_matches(header, matches):
+    etag = http_cache.make_etag(*KEY)
+    assert http_cache.etag_matches(header and header.format(etag=etag), etag) is matches
+
+def test_not_modified_only_for_current_version():
+    etag = http_cache.make_etag(*KEY)
+    resp = http_cache.not_modified(_request(etag), KEY)
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert resp.headers["cache-control"] == http_cache.CACHE_CONTROL
+    assert resp.body == b""
+    assert http_cache.not_modified(_request(etag), ("analysis", "a1", "v2")) is None
+    assert http_cache.not_modified(_request(), KEY) is None
+
+def test_store_lookup_respond():
+    entry = http_cache.store(KEY, b'{"id": "a1"}', "application/json", {"X-Extra": "1"})
+    assert http_cache.lookup(KEY) is entry
+    assert http_cache.lookup(("analysis", "a1", "v2")) is None
+
+    full = http_cache.respond(_request(), entry)
+    assert full.status_code == 200
+    assert full.body == b'{"id": "a1"}'
+    assert full.headers["etag"] == entry.etag
+    assert full.headers["x-extra"] == "1"
+
+    revalidated = http_cache.respond(_request(entry.etag), entry)
+    assert revalidated.status_code == 304
+    assert revalidated.body == b""
+
+def test_version_of():
+    scored = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert http_cache.version_of(None) is None
+    assert http_cache.version_of(("v1", scored)) == "v1@2026-01-01T00:00:00+00:00"
+    assert http_cache.version_of((None, None)) == "unscored"
+
+def test_remember_version_caches_found_analyses_only():
+    assert http_cache.cached_version("a1") is None
+    assert http_cache.remember_version("a1", ("v1", datetime(2026, 1, 1))) == "v1@2026-01-01T00:00:00"
+    assert http_cache.cached_version("a1") == "v1@2026-01-01T00:00:00"
+    assert http_cache.remember_version("gone", None) is None
+    assert http_cache.cached_version("gone") is None
@@ -0,0 +1,47 @@
+import base64, json, uuid
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException, Response
+from routes.database_routes import _encode_cursor, _decode_cursor, _paginate
+
+TS = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+ROW_ID = uuid.UUID("3f2b8c1e-0d4a-4e9b-9a61-1f0c2d3e4b5a")
+
+def test_cursor_round_trip():
+    assert _decode_cursor(_encode_cursor(TS, ROW_ID)) == (TS, str(ROW_ID))
+
+def test_cursor_is_url_safe():
+    cursor = _encode_cursor(TS, ROW_ID)
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+def _b64(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    _b64("just a string"),
+    _b64([TS.isoformat()]),
+    _b64(["yesterday", str(ROW_ID)]),
+    _b64([TS.isoformat(), "not-a-uuid"]),
+    _b64([TS.isoformat(), None]),
+])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        _decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+def _rows(n):
+    return [(uuid.UUID(int=i), f"row {i}", TS.replace(microsecond=i)) for i in range(n)]
+
+def test_paginate_trims_look_ahead_row_and_links_next_page():
+    response = Response()
+    page = _paginate(_rows(4), 3, response, ts_col=2)
+    assert page == _rows(3)
+    assert _decode_cursor(response.headers["X-Next-Cursor"]) == (page[-1][2], str(page[-1][0]))
+
+@pytest.mark.parametrize("n", [0, 2, 3])
+def test_paginate_last_page_has_no_cursor(n):
+    response = Response()
+    assert _paginate(_rows(n), 3, response, ts_col=2) == _rows(n)
+    assert "X-Next-Cursor" not in response.headers
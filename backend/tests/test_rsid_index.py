@@ -0,0 +1,47 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+from services import rsid_index
+from services.rsid_index import RsidIndex, rsid_numbers, save_index, load_index
+
+@pytest.fixture
+def index():
+    return RsidIndex(np.array([3, 7412, 429358, 1801133, 2 ** 63], dtype=np.uint64))
+
+def test_contains_uses_sorted_numbers(index):
+    probe = np.array([0, 3, 4, 7412, 429358, 429359, 1801133, 2 ** 63, 2 ** 64 - 1], dtype=np.uint64)
+    assert index.contains(probe).tolist() == [False, True, False, True, True, False, True, True, False]
+
+def test_empty_index_contains_nothing():
+    assert RsidIndex(np.array([], dtype=np.uint64)).contains(np.array([1, 2], dtype=np.uint64)).tolist() == [False, False]
+
+def test_filter_keeps_order_and_drops_malformed(index):
+    rsids = ["rs1801133", "rs1", "i6000001", "rs429358", "RS7412", "rs", "rs7412", "rs3", "rs12345678901234567890"]
+    assert index.filter(rsids) == ["rs1801133", "rs429358", "rs7412", "rs3"]
+
+def test_filter_of_nothing(index):
+    assert index.filter([]) == []
+
+def test_select_matches_filter(index):
+    ids = pa.array(["rs7412", None, "rs999", "x", "rs429358", "rs7412"])
+    assert index.select(ids).to_pylist() == ["rs7412", "rs429358", "rs7412"]
+
+def test_rsid_numbers_drops_malformed():
+    assert rsid_numbers(["rs12", "rsx", "i5", "rs0"]).tolist() == [12, 0]
+
+def test_save_and_load_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(rsid_index, "risk_table_version", lambda: "v1")
+    path = tmp_path / "rsid_index.npy"
+    save_index(np.array([9, 3, 9, 5], dtype=np.uint64), path, ["adagio_T2D.json"])
+    loaded = load_index(path)
+    assert loaded.version == "v1"
+    assert loaded.numbers.tolist() == [3, 5, 9]
+    assert loaded.filter(["rs9", "rs4"]) == ["rs9"]
+
+def test_index_for_other_tables_is_not_used(tmp_path, monkeypatch):
+    path = tmp_path / "rsid_index.npy"
+    monkeypatch.setattr(rsid_index, "risk_table_version", lambda: "v1")
+    save_index(np.array([1], dtype=np.uint64), path)
+    monkeypatch.setattr(rsid_index, "risk_table_version", lambda: "v2")
+    assert load_index(path) is None
+    assert load_index(tmp_path / "missing.npy") is None
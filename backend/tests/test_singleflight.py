@@ -0,0 +1,69 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services.singleflight import SingleFlight
+
+def _leader_blocked(flight: SingleFlight, n_waiters: int, timeout: float = 5.0):
+    """Wait until n_waiters callers have joined flights already in the air."""
+    deadline = time.monotonic() + timeout
+    while flight.stats["shared"] < n_waiters:
+        assert time.monotonic() < deadline, "waiters never joined"
+        time.sleep(0.005)
+
+def test_concurrent_calls_share_one_upstream_call():
+    flight, release, calls = SingleFlight("test"), threading.Event(), []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.do, "k", fetch) for _ in range(8)]
+        _leader_blocked(flight, 7)
+        release.set()
+        assert [f.result() for f in futures] == ["value"] * 8
+    assert len(calls) == 1
+    assert flight.snapshot() == {"in_flight": 0, "calls": 1, "shared": 7, "batches": 0}
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight, release = SingleFlight("test"), threading.Event()
+
+    def boom():
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, "k", boom) for _ in range(3)]
+        _leader_blocked(flight, 2)
+        release.set()
+        for f in futures:
+            with pytest.raises(RuntimeError, match="upstream down"):
+                f.result()
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+def test_sequential_calls_are_not_cached():
+    flight, calls = SingleFlight("test"), []
+    assert flight.do("k", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("k", lambda: calls.append(1) or len(calls)) == 2
+
+def test_do_many_fetches_only_keys_not_in_flight():
+    flight, release, batches = SingleFlight("test"), threading.Event(), []
+
+    def fetch(keys):
+        batches.append(sorted(keys))
+        if "a" in keys:
+            release.wait(5)
+        return {k: k.upper() for k in keys if k != "missing"}
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(flight.do_many, ["a", "b"], fetch)
+        while flight.snapshot()["in_flight"] < 2:
+            time.sleep(0.005)
+        second = pool.submit(flight.do_many, ["b", "c", "c", "missing"], fetch)
+        _leader_blocked(flight, 1)
+        release.set()
+        assert first.result() == {"a": "A", "b": "B"}
+        assert second.result() == {"b": "B", "c": "C", "missing": None}
+    assert batches == [["a", "b"], ["c", "missing"]]
+    assert flight.snapshot() == {"in_flight": 0, "calls": 4, "shared": 1, "batches": 2}
@@ -0,0 +1,130 @@
+import json, os, threading, time
+import pytest
+from routes.write_queue import WriteBehindQueue, QueueFull
+
+def _age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+@pytest.fixture
+def written():
+    return []
+
+@pytest.fixture
+def wq(tmp_path, written):
+    q = WriteBehindQueue(tmp_path, written.append, backoff=0, stale_after=0.4)
+    yield q
+    q.stop(5)
+
+def test_submit_spools_before_returning(tmp_path, written):
+    q = WriteBehindQueue(tmp_path, written.append)
+    for d in ("pending", "claimed", "dead"):
+        (tmp_path / d).mkdir()
+    q.submit("a1", {"n": 1})  # not started: nothing consumes it
+    assert json.loads((tmp_path / "pending" / "a1.json").read_text()) == {"n": 1}
+    assert q.status("a1") == "pending"
+    assert not list((tmp_path / "pending").glob(".*.tmp"))
+
+def test_submit_rejects_when_full(tmp_path):
+    q = WriteBehindQueue(tmp_path, lambda p: None, maxsize=1)
+    (tmp_path / "pending").mkdir()
+    q.submit("a1", {})
+    with pytest.raises(QueueFull):
+        q.submit("a2", {})
+    assert q.stats["rejected"] == 1
+
+def test_claims_writes_and_removes(wq, tmp_path, written):
+    wq.start()
+    wq.submit("a1", {"n": 1})
+    _wait_for(lambda: wq.stats["written"] == 1)
+    assert written == [{"n": 1}]
+    assert not list((tmp_path / "claimed").iterdir())
+    assert wq.status("a1") is None
+
+def test_claim_is_renamed_to_owner(tmp_path):
+    entered, release = threading.Event(), threading.Event()
+    q = WriteBehindQueue(tmp_path, lambda p: (entered.set(), release.wait(5)))
+    q.start()
+    try:
+        q.submit("a1", {})
+        assert entered.wait(5)
+        assert (tmp_path / "claimed" / f"a1.{q.owner}.json").exists()
+        assert not (tmp_path / "pending" / "a1.json").exists()
+        assert q.status("a1") == "pending"
+    finally:
+        release.set()
+        q.stop(5)
+
+def test_start_replays_pending(tmp_path, written):
+    (tmp_path / "pending").mkdir()
+    (tmp_path / "pending" / "a1.json").write_text('{"n": 1}')
+    q = WriteBehindQueue(tmp_path, written.append)
+    q.start()
+    q.stop(5)
+    assert written == [{"n": 1}]
+
+def test_reclaims_stale_claim_of_dead_owner_at_start(tmp_path, written):
+    (tmp_path / "claimed").mkdir()
+    stale = tmp_path / "claimed" / "a1.deadbeef.json"
+    stale.write_text('{"n": 1}')
+    _age(stale, 60)
+    q = WriteBehindQueue(tmp_path, written.append, stale_after=10)
+    q.start()
+    q.stop(5)
+    assert written == [{"n": 1}]
+    assert q.stats["reclaimed"] == 1
+
+def test_leaves_fresh_claims_alone(tmp_path, written):
+    (tmp_path / "claimed").mkdir()
+    (tmp_path / "claimed" / "a1.beefcafe.json").write_text('{"n": 1}')  # its owner is still touching it
+    q = WriteBehindQueue(tmp_path, written.append, stale_after=10)
+    q.start()
+    q.stop(5)
+    assert written == []
+    assert (tmp_path / "claimed" / "a1.beefcafe.json").exists()
+
+def test_reclaims_while_busy(wq, tmp_path, written):
+    wq.handler = lambda p: (time.sleep(0.02), written.append(p))
+    wq.start()
+    stale = tmp_path / "claimed" / "ghost.deadbeef.json"
+    stale.write_text('{"n": "ghost"}')
+    _age(stale, 60)
+    # ~2s of queued writes; the claim must come back long before they drain
+    for i in range(100):
+        wq.submit(f"a{i}", {"n": i})
+    _wait_for(lambda: wq.stats["reclaimed"] == 1)
+    assert wq.depth() > 0
+    _wait_for(lambda: {"n": "ghost"} in written)
+
+def test_permanent_error_goes_to_dead_letter(tmp_path):
+    def fail(payload):
+        raise KeyError("no such user")
+    q = WriteBehindQueue(tmp_path, fail, permanent_errors=(KeyError,), backoff=0)
+    q.start()
+    q.submit("a1", {"n": 1})
+    q.stop(5)
+    dead = json.loads((tmp_path / "dead" / "a1.json").read_text())
+    assert dead["payload"] == {"n": 1}
+    assert q.status("a1") == "failed"
+    assert (q.stats["dead"], q.stats["retries"]) == (1, 0)
+
+def test_transient_error_is_retried(tmp_path, written):
+    attempts = []
+    def flaky(payload):
+        attempts.append(payload)
+        if len(attempts) < 3:
+            raise ConnectionError("db down")
+        written.append(payload)
+    q = WriteBehindQueue(tmp_path, flaky, backoff=0)
+    q.start()
+    q.submit("a1", {"n": 1})
+    q.stop(5)
+    assert written == [{"n": 1}]
+    assert q.stats["retries"] == 2
@@ -0,0 +1,282 @@
+"""
+Offline micro-benchmarks for the analysis hot paths: parse, stream
+(per-variant tuples and Arrow batches), annotate, the streaming upload
+scan (with and without the relevance index), burden, risk scoring and
+disease ranking.
+
+MyVariant and OpenAI are replaced by in-process stubs, so the numbers
+are our own CPU and memory cost, not the network's. Inputs are synthetic
+TXT/VCF files of increasing size from tools/synthetic_genome.py, with
+--hit-rate of their rsIDs inside ADAGIO genes.
+
+    python -m tools.bench_pipeline                           # print a report
+    python -m tools.bench_pipeline --out tools/bench_baseline.json
+    python -m tools.bench_pipeline --baseline tools/bench_baseline.json
+
+Each case is timed --repeat times (median) and then run once more under
+tracemalloc for peak Python-heap memory; allocations inside cyvcf2's C
+code are not seen. With --baseline the run fails (exit 1) when a case is
+more than --tolerance times slower (cases under --min-ms excepted) or
+--mem-tolerance times larger.
+
+Timings only compare on the same machine, so the report records the
+machine and Python it ran on, and a baseline from any other is not
+compared at all: refresh it with --out on the box that runs the check.
+On the same machine, each timed run is preceded by a fixed calibration
+workload, and a case's baseline is scaled by how much slower that ran
+("box"), so a busy or throttled box does not read as a regression.
+"""
+
+import argparse, gc, json, os, pathlib, platform, random, statistics, sys, tempfile, time, tracemalloc
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# tip_service refuses to import without a key; the stub never sends it
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import httpx                                               # noqa: E402
+from myvariant import MyVariantInfo                        # noqa: E402
+from services.annotate import annotate_variants            # noqa: E402
+from services.burden import burden_scores                  # noqa: E402
+from services.disease_ranker import SUPPORTED_DISEASES, disease_scores  # noqa: E402
+from services.genome_parser import parse_genome_file       # noqa: E402
+from services.pipeline import scan                         # noqa: E402
+from services.risk_annotator import annotate_risks         # noqa: E402
+from services.rsid_index import RsidIndex, set_rsid_index  # noqa: E402
+from services.tip_service import get_tips                  # noqa: E402
+from services.vcf_reader import read_batches, stream_variants  # noqa: E402
+from services.adagio_loader import all_genes              # noqa: E402
+from tools.build_rsid_index import from_files              # noqa: E402
+from tools.synthetic_genome import gene_for_rsid, write_txt, write_vcf  # noqa: E402
+
+# stubs
+class StubUpstreams:
+    """MyVariant answers from synthetic_genome.gene_for_rsid; OpenAI returns five fixed tips."""
+
+    @staticmethod
+    def querymany(_mv, rsids, **kwargs):
+        out = []
+        for rsid in rsids:
+            hit = gene_for_rsid(rsid)
+            if hit is None:
+                out.append({"query": rsid, "notfound": True})
+                continue
+            gene, impact = hit
+            record = {"query": rsid, "gene": {"symbol": gene}}
+            if impact:
+                record["snpeff"] = {"ann": [{"impact": impact}]}
+            out.append(record)
+        return out
+
+    @staticmethod
+    def post(*args, **kwargs):
+        content = "\n".join(f"{i}. Synthetic tip {i} (NIH)" for i in range(1, 6))
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]},
+                              request=httpx.Request("POST", args[0] if args else "http://stub"))
+
+    @classmethod
+    def install(cls):
+        MyVariantInfo.querymany = cls.querymany
+        httpx.post = cls.post
+
+# cases: each runs one hot path over ctx and returns the items it processed
+def cases(ctx: dict) -> dict:
+    def parse():
+        parse_genome_file(ctx["txt_bytes"], max_rsids=ctx["n"])
+        return ctx["n"]
+
+    def stream():
+        return sum(1 for _ in stream_variants(str(ctx["vcf"])))
+
+    def batches():
+        return sum(b.num_rows for b in read_batches(ctx["vcf"]))
+
+    def annotate():
+        annotate_variants(ctx["variants"])
+        return len(ctx["variants"])
+
+    # the upload path: streamed parse, overlapped lookups, incremental burden
+    def scan_txt():
+        return scan(ctx["txt"], "upload.txt", ctx["n"], "bench").rsids
+
+    def scan_vcf():
+        return scan(ctx["vcf"], "upload.vcf.gz", ctx["n"], "bench").rsids
+
+    # the same scans screened by an index built for the inputs
+    def screened(fn):
+        def run():
+            set_rsid_index(ctx["index"])
+            try:
+                return fn()
+            finally:
+                set_rsid_index(None)
+        return run
+
+    def burden():
+        burden_scores(ctx["annotation"])
+        return len(ctx["annotation"])
+
+    # tips are an lru_cache in production; cleared so each run pays for the lookups
+    def risks():
+        get_tips.cache_clear()
+        return len(annotate_risks(ctx["disease"], ctx["genes"]))
+
+    def rank():
+        get_tips.cache_clear()
+        disease_scores(ctx["genes"])
+        return len(ctx["genes"])
+
+    return {
+        "parse_genome_file": parse,
+        "stream_variants": stream,
+        "read_batches": batches,
+        "annotate_variants": annotate,
+        "scan_txt": scan_txt,
+        "scan_vcf": scan_vcf,
+        "scan_txt_indexed": screened(scan_txt),
+        "scan_vcf_indexed": screened(scan_vcf),
+        "burden_scores": burden,
+        "annotate_risks": risks,
+        "disease_scores": rank,
+    }
+
+# machine and calibration: what a baseline's timings are relative to
+def machine() -> dict:
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    return {
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "arch": platform.machine(),
+        "cpu": cpu,
+        "cpus": os.cpu_count(),
+    }
+
+def calibration():
+    """A fixed CPU workload (sorting, hashing, numpy) like the cases', ~20 ms."""
+    rng = random.Random(0)
+    keys = [f"rs{rng.randrange(10 ** 9)}" for _ in range(20_000)]
+    sorted(keys)
+    len(set(keys))
+    np.sort(np.random.default_rng(0).integers(0, 2 ** 63, 100_000, dtype=np.uint64))
+
+def _timed(fn):
+    # a full collection left pending by setup can land in one run and
+    # quadruple it; start every run from a collected heap instead
+    gc.collect()
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # warm caches that persist in production (risk tables, scoring arrays)
+    calibration()
+    timings, calibrations, items = [], [], 0
+    for _ in range(repeat):
+        # calibrated right next to the case, so both see the same load
+        calibrations.append(_timed(calibration)[0])
+        seconds, items = _timed(fn)
+        timings.append(seconds)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        "items": items,
+        "median_s": round(median, 6),
+        "items_per_s": round(items / median) if median else None,
+        "peak_kib": round(peak / 1024),
+        "calibration_s": round(statistics.median(calibrations), 6),
+    }
+
+def run(sizes: list[int], repeat: int, hit_rate: float, disease: str, seed: int, only: set) -> dict:
+    StubUpstreams.install()
+    set_rsid_index(None)  # a local data/rsid_index.npy must not screen the plain scans
+    genes = frozenset(g.upper() for g in all_genes())
+    report = {}
+    with tempfile.TemporaryDirectory(prefix="geneguard_bench_") as tmp:
+        for n in sizes:
+            txt, vcf = pathlib.Path(tmp) / f"{n}.txt", pathlib.Path(tmp) / f"{n}.vcf.gz"
+            write_txt(txt, n, hit_rate, seed)
+            write_vcf(vcf, n, hit_rate, seed, samples=1, multiallelic=0.05)
+
+            ctx = {"n": n, "disease": disease, "txt": txt, "txt_bytes": txt.read_bytes(), "vcf": vcf}
+            ctx["variants"] = list(stream_variants(str(vcf)))
+            ctx["annotation"] = annotate_variants(ctx["variants"])
+            ctx["genes"] = set(burden_scores(ctx["annotation"]))
+            ctx["index"] = RsidIndex(np.unique(from_files([txt, vcf], genes, workers=1, quiet=True)))
+
+            for name, fn in cases(ctx).items():
+                if only and name not in only:
+                    continue
+                key = f"{name}@{n}"
+                report[key] = measure(fn, repeat)
+                r = report[key]
+                print(f"{key:<28} {r['median_s'] * 1000:>10.2f} ms {r['items_per_s'] or 0:>12,}/s {r['peak_kib']:>10,} KiB")
+    return report
+
+def compare(report: dict, baseline: dict, tolerance: float, mem_tolerance: float, min_ms: float) -> list[str]:
+    if baseline.get("machine") != report["machine"]:
+        print(f"\nbaseline not compared: it is from {baseline.get('machine') or 'an unrecorded machine'}, "
+              f"this run from {report['machine']}; refresh it with --out here")
+        return []
+    failures = []
+    print(f"\n{'case':<28} {'box':>8} {'time':>8} {'memory':>8}")
+    for key, res in report["cases"].items():
+        base = baseline["cases"].get(key)
+        if not base:
+            print(f"{key:<28} {'':>8} {'new':>8}")
+            continue
+        # >1 when the box ran slower than for the baseline; a faster
+        # calibration is as likely noise, so it never tightens the check
+        speed = max(1.0, res["calibration_s"] / base["calibration_s"])
+        dt = res["median_s"] / (base["median_s"] * speed) if base["median_s"] else 1.0
+        dm = res["peak_kib"] / base["peak_kib"] if base["peak_kib"] else 1.0
+        problems = []
+        # sub-millisecond cases swing by 2x on scheduler noise alone
+        if dt > tolerance and res["median_s"] * 1000 >= min_ms:
+            problems.append(f"{dt:.1f}x slower")
+        if dm > mem_tolerance:
+            problems.append(f"{dm:.1f}x more memory")
+        if problems:
+            failures.append(key)
+        print(f"{key:<28} {speed:>7.2f}x {dt:>7.2f}x {dm:>7.2f}x  {', '.join(problems)}")
+    return failures
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", default="1000,10000,100000", help="comma-separated input sizes (records)")
+    p.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    p.add_argument("--hit-rate", type=float, default=0.3, help="share of rsIDs that map to an ADAGIO gene")
+    p.add_argument("--disease", default="T2D", choices=SUPPORTED_DISEASES)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--only", default="", help="comma-separated case names")
+    p.add_argument("--out", type=pathlib.Path, help="write the report here (JSON)")
+    p.add_argument("--baseline", type=pathlib.Path, help="compare against this report")
+    p.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor vs baseline")
+    p.add_argument("--min-ms", type=float, default=5.0, help="ignore slowdowns of cases faster than this")
+    p.add_argument("--mem-tolerance", type=float, default=1.25, help="allowed peak memory growth vs baseline")
+    args = p.parse_args()
+
+    report = {"machine": machine()}
+    report["cases"] = run([int(s) for s in args.sizes.split(",")], args.repeat, args.hit_rate,
+                          args.disease, args.seed, set(filter(None, args.only.split(","))))
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        failures = compare(report, json.loads(args.baseline.read_text()), args.tolerance, args.mem_tolerance, args.min_ms)
+        if failures:
+            print(f"\nFAILED: {', '.join(failures)}")
+            sys.exit(1)
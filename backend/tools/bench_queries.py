@@ -0,0 +1,451 @@
+"""
+Seed a scratch Postgres with a large synthetic dataset, then record the
+EXPLAIN (ANALYZE, BUFFERS) plan and timing of every query the routes in
+routes/database_routes.py run: reads (paged ones on their first page and
+after a cursor) and writes, which are rolled back after each run.
+
+Point it at a throw-away database; it migrates the schema and writes
+millions of rows:
+
+    python -m tools.bench_queries --database-url postgresql://.../geneguard_bench --seed
+    python -m tools.bench_queries --database-url ... --out plans.json
+    python -m tools.bench_queries --database-url ... --baseline plans.json
+
+The run fails (exit 1) when a query seq-scans one of the large tables or,
+with --baseline, gets more than --tolerance times slower.
+"""
+
+import argparse, json, os, pathlib, re, statistics, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# big tables that every hot query must reach through an index
+LARGE_TABLES = {"users", "genetic_analyses", "risk_results", "recommendations",
+                "group_members", "shared_analyses", "analysis_summaries"}
+
+DISEASES = ["alzheimers", "CHD", "hypertension", "multiple_sclerosis", "obesity",
+            "parkinsons", "stroke", "T1D", "T2D", "rheumatoid_arthritis"]
+
+# (route, sql); keep in step with routes/database_routes.py
+QUERIES = {
+    "get_firebase_uid": """
+        SELECT id FROM users WHERE firebase_uid = :uid LIMIT 1
+    """,
+    "is_group_member": """
+        SELECT id FROM group_members WHERE group_id = :group_id AND user_id = :user_id
+    """,
+    "get_user": """
+        SELECT id, firebase_uid, email, display_name, phone FROM users WHERE firebase_uid = :uid
+    """,
+    "get_user_groups": """
+        SELECT g.id, g.name, g.invite_code, g.created_at, creator.display_name,
+               (SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.id)
+        FROM groups g
+        JOIN group_members my_membership ON g.id = my_membership.group_id
+        JOIN users me ON my_membership.user_id = me.id
+        JOIN users creator ON g.creator_id = creator.id
+        WHERE me.firebase_uid = :uid
+        ORDER BY g.created_at DESC, g.id DESC
+        LIMIT 101
+    """,
+    "get_group_members": """
+        SELECT gm.id, u.id, u.display_name, u.email, u.phone, gm.joined_at, gm.role, u.firebase_uid,
+            EXISTS(SELECT 1 FROM shared_analyses sa WHERE sa.group_id = :group_id AND sa.shared_by = u.id)
+        FROM group_members gm
+        JOIN users u ON gm.user_id = u.id
+        WHERE gm.group_id = :group_id
+        ORDER BY gm.joined_at, gm.id
+        LIMIT 101
+    """,
+    "share_analysis.verify": """
+        SELECT
+            EXISTS(SELECT 1 FROM genetic_analyses WHERE id = :analysis_id and user_id = :user_id),
+            EXISTS(SELECT 1 FROM group_members WHERE group_id = :group_id AND user_id = :user_id)
+    """,
+    "view_group_analyses": """
+        SELECT sa.id, ga.id, ga.disease, ga.analysis_date, u.display_name, sa.shared_at, s.top_risks
+        FROM shared_analyses sa
+        JOIN genetic_analyses ga ON sa.analysis_id = ga.id
+        JOIN users u ON sa.shared_by = u.id
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE sa.group_id = :group_id
+        ORDER BY sa.shared_at DESC, sa.id DESC
+        LIMIT 51
+    """,
+    "get_user_analyses": """
+        SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date,
+            s.top_risks, s.risk_count, s.top_score, s.disease_score
+        FROM genetic_analyses ga
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE ga.user_id = :user_id
+        ORDER BY ga.analysis_date DESC, ga.id DESC
+        LIMIT 11
+    """,
+    "get_analysis_by_id.analysis": """
+        SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date
+        FROM genetic_analyses ga WHERE ga.id = :analysis_id
+    """,
+    "get_analysis_by_id.risks": """
+        SELECT rr.gene, rr.risk_score, rr.risk_level, rr.rank,
+            json_agg(json_build_object('text', r.tip_text, 'order', r.tip_order) ORDER BY r.tip_order)
+                FILTER (WHERE r.id IS NOT NULL)
+        FROM risk_results rr
+        LEFT JOIN recommendations r ON rr.id = r.risk_result_id
+        WHERE rr.analysis_id = :analysis_id
+        GROUP BY rr.id, rr.gene, rr.risk_score, rr.risk_level, rr.rank
+        ORDER BY rr.rank
+    """,
+    "export_csv": """
+        SELECT rr.gene, rr.risk_score, rr.risk_level, rr.rank
+        FROM risk_results rr WHERE rr.analysis_id = :analysis_id ORDER BY rr.rank
+    """,
+    "get_analysis_status": """
+        SELECT 1 FROM genetic_analyses WHERE id = :analysis_id
+    """,
+    "join_group.invite_code": """
+        SELECT id, name FROM groups WHERE invite_code = :code
+    """,
+    "get_user_preferences": """
+        SELECT theme FROM users WHERE firebase_uid = :uid
+    """,
+    # keyset pages: the same queries from halfway down the list
+    "get_user_groups.after_cursor": """
+        SELECT g.id, g.name, g.invite_code, g.created_at, creator.display_name,
+               (SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.id)
+        FROM groups g
+        JOIN group_members my_membership ON g.id = my_membership.group_id
+        JOIN users me ON my_membership.user_id = me.id
+        JOIN users creator ON g.creator_id = creator.id
+        WHERE me.firebase_uid = :uid AND (g.created_at, g.id) < (:cursor_ts, :cursor_id)
+        ORDER BY g.created_at DESC, g.id DESC
+        LIMIT 101
+    """,
+    "get_group_members.after_cursor": """
+        SELECT gm.id, u.id, u.display_name, u.email, u.phone, gm.joined_at, gm.role, u.firebase_uid,
+            EXISTS(SELECT 1 FROM shared_analyses sa WHERE sa.group_id = :group_id AND sa.shared_by = u.id)
+        FROM group_members gm
+        JOIN users u ON gm.user_id = u.id
+        WHERE gm.group_id = :group_id AND (gm.joined_at, gm.id) > (:cursor_ts, :cursor_id)
+        ORDER BY gm.joined_at, gm.id
+        LIMIT 101
+    """,
+    "view_group_analyses.after_cursor": """
+        SELECT sa.id, ga.id, ga.disease, ga.analysis_date, u.display_name, sa.shared_at, s.top_risks
+        FROM shared_analyses sa
+        JOIN genetic_analyses ga ON sa.analysis_id = ga.id
+        JOIN users u ON sa.shared_by = u.id
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE sa.group_id = :group_id AND (sa.shared_at, sa.id) < (:cursor_ts, :cursor_id)
+        ORDER BY sa.shared_at DESC, sa.id DESC
+        LIMIT 51
+    """,
+    "get_user_analyses.after_cursor": """
+        SELECT ga.id, ga.disease, ga.filename, ga.gene_count, ga.analysis_date,
+            s.top_risks, s.risk_count, s.top_score, s.disease_score
+        FROM genetic_analyses ga
+        LEFT JOIN analysis_summaries s ON s.analysis_id = ga.id
+        WHERE ga.user_id = :user_id AND (ga.analysis_date, ga.id) < (:cursor_ts, :cursor_id)
+        ORDER BY ga.analysis_date DESC, ga.id DESC
+        LIMIT 11
+    """,
+    # writes
+    "sync_user": """
+        INSERT INTO users (firebase_uid, email, display_name, phone, last_login)
+        VALUES (:uid, :email, :display_name, :phone, CURRENT_TIMESTAMP)
+        ON CONFLICT (firebase_uid)
+        DO UPDATE SET
+            last_login = CURRENT_TIMESTAMP,
+            display_name = COALESCE(EXCLUDED.display_name, users.display_name),
+            phone = COALESCE(EXCLUDED.phone, users.phone)
+        RETURNING id, firebase_uid, email, display_name, phone
+    """,
+    "update_profile": """
+        UPDATE users SET display_name = :display_name, phone = :phone WHERE firebase_uid = :uid RETURNING id
+    """,
+    "update_user_preferences": """
+        UPDATE users SET theme = :theme WHERE firebase_uid = :uid RETURNING id
+    """,
+    "create_group.group": """
+        INSERT INTO groups (id, name, invite_code, creator_id)
+        VALUES (:id, :name, :invite_code, :user_id)
+        RETURNING id, name, invite_code, created_at
+    """,
+    "create_group.member": """
+        INSERT INTO group_members (group_id, user_id, role) VALUES (:group_id, :user_id, 'creator')
+    """,
+    "join_group.member": """
+        INSERT INTO group_members (group_id, user_id) VALUES (:group_id, :user_id)
+    """,
+    "leave_group": """
+        DELETE FROM group_members WHERE group_id = :group_id AND user_id = :user_id RETURNING id
+    """,
+    "share_analysis.insert": """
+        INSERT INTO shared_analyses (analysis_id, group_id, shared_by)
+        VALUES (:analysis_id, :group_id, :user_id)
+        ON CONFLICT (analysis_id, group_id) DO NOTHING
+    """,
+    "unshare_analysis": """
+        DELETE FROM shared_analyses
+        WHERE analysis_id = :analysis_id AND group_id = :group_id AND shared_by = :user_id
+        RETURNING id
+    """,
+    "save_analysis.analysis": """
+        INSERT INTO genetic_analyses (id, user_id, disease, filename, gene_count)
+        VALUES (:id, :user_id, :disease, :filename, :gene_count)
+    """,
+    "save_analysis.inputs": """
+        INSERT INTO analysis_inputs (analysis_id, genes, burden, risk_table_version)
+        VALUES (:analysis_id, :genes, :burden, :version)
+    """,
+    "write_risks.risk_results": """
+        INSERT INTO risk_results (id, analysis_id, gene, risk_score, risk_level, rank)
+        VALUES (:id, :analysis_id, :gene, :risk_score, :risk_level, :rank)
+    """,
+    "write_risks.recommendations": """
+        INSERT INTO recommendations (risk_result_id, tip_text, tip_order)
+        VALUES (:risk_result_id, :tip_text, :tip_order)
+    """,
+    "write_risks.summary": """
+        INSERT INTO analysis_summaries (analysis_id, top_risks, gene_count, risk_count, top_score, disease_score)
+        VALUES (:analysis_id, CAST(:top_risks AS JSONB), :gene_count, :risk_count, :top_score, :disease_score)
+        ON CONFLICT (analysis_id) DO UPDATE SET
+            top_risks = EXCLUDED.top_risks,
+            gene_count = EXCLUDED.gene_count,
+            risk_count = EXCLUDED.risk_count,
+            top_score = EXCLUDED.top_score,
+            disease_score = EXCLUDED.disease_score
+    """,
+    "log_action": """
+        INSERT INTO audit_log (user_id, action, resource_type, resource_id)
+        VALUES (:user_id, :action, :resource_type, :resource_id)
+    """,
+}
+
+# parameters a query binds to a different sample value than its name's
+OVERRIDES = {
+    "create_group.member": {"group_id": "other_group_id"},  # a group the user is not in yet
+    "join_group.member": {"group_id": "other_group_id"},
+}
+
+def seed(conn, users: int, analyses: int, risks: int, tips: int, groups: int, members: int):
+    """Bulk-generate rows server-side with generate_series."""
+    from sqlalchemy import text
+
+    steps = [
+        ("users", """
+            INSERT INTO users (firebase_uid, email, display_name)
+            SELECT 'bench-' || i, 'bench' || i || '@example.com', 'Bench User ' || i
+            FROM generate_series(1, :users) i
+        """),
+        ("genetic_analyses", """
+            INSERT INTO genetic_analyses (user_id, disease, filename, gene_count, analysis_date)
+            SELECT u.id, (:diseases)[1 + (random() * 9)::int], 'bench.vcf', 100 + (random() * 400)::int,
+                   now() - random() * interval '730 days'
+            FROM users u, generate_series(1, :analyses)
+            WHERE u.firebase_uid LIKE 'bench-%'
+        """),
+        ("risk_results", """
+            INSERT INTO risk_results (analysis_id, gene, risk_score, risk_level, rank)
+            SELECT ga.id, 'GENE' || g, random(),
+                   CASE WHEN g <= 100 THEN 'High' WHEN g <= 300 THEN 'Medium' ELSE 'Low' END, g
+            FROM genetic_analyses ga, generate_series(1, :risks) g
+        """),
+        ("analysis_summaries", """
+            INSERT INTO analysis_summaries (analysis_id, top_risks, gene_count, risk_count, top_score, disease_score)
+            SELECT rr.analysis_id,
+                   jsonb_agg(jsonb_build_object('gene', rr.gene, 'risk', rr.risk_score,
+                                                'level', rr.risk_level, 'rank', rr.rank) ORDER BY rr.rank)
+                       FILTER (WHERE rr.rank <= 10),
+                   MAX(ga.gene_count), COUNT(*), MAX(rr.risk_score), SUM(rr.risk_score)
+            FROM risk_results rr
+            JOIN genetic_analyses ga ON ga.id = rr.analysis_id
+            GROUP BY rr.analysis_id
+        """),
+        ("recommendations", """
+            INSERT INTO recommendations (risk_result_id, tip_text, tip_order)
+            SELECT rr.id, 'Synthetic tip ' || t || ' for ' || rr.gene, t - 1
+            FROM risk_results rr, generate_series(1, :tips) t
+        """),
+        ("groups", """
+            INSERT INTO groups (name, invite_code, creator_id)
+            SELECT 'Bench Group ' || i, 'BENCH' || lpad(i::text, 11, '0'),
+                   (SELECT id FROM users WHERE firebase_uid = 'bench-' || (1 + (i * 7919) % :users))
+            FROM generate_series(1, :groups) i
+        """),
+        ("group_members", """
+            INSERT INTO group_members (group_id, user_id, role, joined_at)
+            SELECT g.id, u.id, 'member', now() - random() * interval '365 days'
+            FROM groups g
+            JOIN LATERAL (
+                SELECT id FROM users
+                WHERE firebase_uid LIKE 'bench-%'
+                ORDER BY md5(g.id::text || id::text)
+                LIMIT :members
+            ) u ON TRUE
+            WHERE g.invite_code LIKE 'BENCH%'
+            ON CONFLICT DO NOTHING
+        """),
+        ("shared_analyses", """
+            INSERT INTO shared_analyses (analysis_id, group_id, shared_by, shared_at)
+            SELECT ga.id, gm.group_id, gm.user_id, ga.analysis_date + interval '1 hour'
+            FROM group_members gm
+            JOIN LATERAL (
+                SELECT id, analysis_date FROM genetic_analyses
+                WHERE user_id = gm.user_id
+                ORDER BY analysis_date DESC
+                LIMIT 3
+            ) ga ON TRUE
+            ON CONFLICT DO NOTHING
+        """),
+    ]
+    params = {"users": users, "analyses": analyses, "risks": risks, "tips": tips,
+              "groups": groups, "members": members, "diseases": DISEASES}
+    for table, sql in steps:
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params)
+        conn.commit()
+        print(f"seeded {table:<18} {time.perf_counter() - t0:8.1f}s")
+
+    conn.execute(text("ANALYZE"))
+    conn.commit()
+
+def sample_params(conn) -> dict:
+    """
+    Pick the heaviest user, the busiest group they are in, a group they
+    are not in (to join), one of their analyses and one of its risk rows;
+    plus a value for every other parameter QUERIES binds.
+    """
+    import uuid
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import text
+
+    user_id, uid = conn.execute(text("""
+        SELECT u.id, u.firebase_uid FROM users u
+        JOIN group_members gm ON gm.user_id = u.id
+        GROUP BY u.id, u.firebase_uid ORDER BY COUNT(*) DESC LIMIT 1
+    """)).fetchone()
+    group_id = conn.execute(text("""
+        SELECT gm.group_id FROM group_members gm
+        LEFT JOIN shared_analyses sa ON sa.group_id = gm.group_id
+        WHERE gm.user_id = :u
+        GROUP BY gm.group_id ORDER BY COUNT(sa.id) DESC LIMIT 1
+    """), {"u": user_id}).scalar()
+    other_group_id, code = conn.execute(text("""
+        SELECT g.id, g.invite_code FROM groups g
+        WHERE NOT EXISTS (SELECT 1 FROM group_members gm WHERE gm.group_id = g.id AND gm.user_id = :u)
+        LIMIT 1
+    """), {"u": user_id}).fetchone()
+    analysis_id = conn.execute(text("""
+        SELECT id FROM genetic_analyses WHERE user_id = :u ORDER BY analysis_date DESC LIMIT 1
+    """), {"u": user_id}).scalar()
+    risk_result_id = conn.execute(text("""
+        SELECT id FROM risk_results WHERE analysis_id = :a ORDER BY rank LIMIT 1
+    """), {"a": analysis_id}).scalar()
+
+    return {
+        "uid": uid, "user_id": str(user_id), "group_id": str(group_id),
+        "other_group_id": str(other_group_id), "code": code, "analysis_id": str(analysis_id),
+        "risk_result_id": str(risk_result_id),
+        # writes: fresh keys, rolled back after each run
+        "id": str(uuid.uuid4()), "invite_code": uuid.uuid4().hex[:16].upper(), "name": "Bench Group",
+        "email": "bench@example.com", "display_name": "Bench User", "phone": None, "theme": "dark",
+        "disease": DISEASES[0], "filename": "bench.vcf", "gene_count": 2, "genes": ["APOE", "TCF7L2"],
+        "burden": [1, 2], "version": "bench", "action": "bench", "resource_type": "analysis",
+        "resource_id": str(analysis_id), "top_risks": json.dumps([]), "risk_count": 0,
+        "top_score": None, "disease_score": None, "gene": "APOE", "risk_score": 0.5,
+        "risk_level": "Medium", "rank": 1, "tip_text": "Bench tip", "tip_order": 0,
+        # keyset pages start from halfway down a two-year history
+        "cursor_ts": datetime.now(timezone.utc) - timedelta(days=180),
+        "cursor_id": "ffffffff-ffff-ffff-ffff-ffffffffffff",
+    }
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+def explain(conn, sql: str, params: dict, repeat: int) -> dict:
+    """Plan and time one query; writes run too, and are rolled back."""
+    from sqlalchemy import text
+
+    needed = {k: params[k] for k in re.findall(r"(?<![:\w]):(\w+)", sql)}
+    plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), needed).scalar()[0]
+    conn.rollback()
+
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = conn.execute(text(sql), needed)
+        if result.returns_rows:
+            result.fetchall()
+        timings.append((time.perf_counter() - t0) * 1000)
+        conn.rollback()
+
+    nodes = list(_walk(plan["Plan"]))
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "execution_ms": plan.get("Execution Time"),
+        "planning_ms": plan.get("Planning Time"),
+        "seq_scans": sorted({n["Relation Name"] for n in nodes
+                             if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in LARGE_TABLES}),
+        "indexes": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+        "shared_hit": plan["Plan"].get("Shared Hit Blocks"),
+        "shared_read": plan["Plan"].get("Shared Read Blocks"),
+        "plan": plan,
+    }
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--database-url", required=True, help="scratch database; never production")
+    p.add_argument("--seed", action="store_true", help="migrate and load synthetic data first")
+    p.add_argument("--users", type=int, default=5_000)
+    p.add_argument("--analyses", type=int, default=20, help="analyses per user")
+    p.add_argument("--risks", type=int, default=50, help="risk rows per analysis")
+    p.add_argument("--tips", type=int, default=2, help="tips per risk row")
+    p.add_argument("--groups", type=int, default=500)
+    p.add_argument("--members", type=int, default=25, help="members per group")
+    p.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    p.add_argument("--out", type=pathlib.Path, help="write the report here (JSON)")
+    p.add_argument("--baseline", type=pathlib.Path, help="compare median timings against this report")
+    p.add_argument("--tolerance", type=float, default=2.0, help="allowed slowdown factor vs baseline")
+    args = p.parse_args()
+
+    # routes.database reads DATABASE_URL at import
+    os.environ["DATABASE_URL"] = args.database_url
+    from routes.database import engine
+    from tools.migrate import apply_migrations
+
+    if args.seed:
+        apply_migrations(engine)
+
+    with engine.connect() as conn:
+        if args.seed:
+            seed(conn, args.users, args.analyses, args.risks, args.tips, args.groups, args.members)
+
+        params = sample_params(conn)
+        report = {}
+        for name, sql in QUERIES.items():
+            bound = {**params, **{k: params[v] for k, v in OVERRIDES.get(name, {}).items()}}
+            report[name] = explain(conn, sql, bound, args.repeat)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    failures = []
+    print(f"\n{'query':<30} {'median ms':>10} {'baseline':>10}  indexes / problems")
+    for name, res in report.items():
+        base = baseline.get(name, {}).get("median_ms")
+        problems = [f"seq scan on {t}" for t in res["seq_scans"]]
+        if base and res["median_ms"] > base * args.tolerance:
+            problems.append(f"{res['median_ms'] / base:.1f}x slower than baseline")
+        if problems:
+            failures.append(name)
+
+        print(f"{name:<30} {res['median_ms']:>10.2f} {base or '-':>10}  "
+              f"{', '.join(problems) or ', '.join(res['indexes']) or '-'}")
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2, default=str))
+
+    if failures:
+        print(f"\nFAILED: {', '.join(failures)}")
+        sys.exit(1)
@@ -0,0 +1,145 @@
+"""
+Build the relevance prefilter (services/rsid_index.py): every rsID that
+can map to a gene of some adagio_*.json table, written as a sorted uint64
+array to data/rsid_index.npy (or --out) with a .json sidecar.
+
+Two sources, which can be combined:
+
+  - gene queries (unless --no-genes): every variant with an rsID that
+    MyVariant files under each ADAGIO gene, by the top-level gene.symbol
+    or by dbsnp.gene.symbol; the pipeline takes a variant's gene from
+    either (annotate._gene_symbol_from_hit). Thorough, but two paged
+    queries per gene.
+  - --from FILE: the rsIDs of candidate files (chip manifests, TXT or VCF
+    uploads, plain one-per-line lists), looked up the way the pipeline
+    does and kept if they land in an ADAGIO gene.
+
+    python -m tools.build_rsid_index
+    python -m tools.build_rsid_index --from gsa_manifest.txt --from cohort.vcf.gz
+    python -m tools.build_rsid_index --no-genes --from chip.txt --out /tmp/rsid_index.npy
+
+An index built from files alone only knows the rsIDs of those files:
+an upload from any other chip or a VCF loses every relevant rsID it has
+that they lack, silently. Keep --no-genes for tests and for deployments
+that only take uploads of the listed chips.
+
+--check FILE scans sample uploads with and without the new index, reading
+every row both times, and fails unless the gene hits (and VCF burden)
+match. The unscreened scan looks every rsID up, so keep the samples small.
+
+Rebuild after every risk table refresh: the server ignores an index built
+for another risk_table_version and falls back to capped, unscreened uploads.
+MYVARIANT_URL points both sources at another MyVariant (e.g. the
+tools/loadtest.py stubs).
+"""
+
+import argparse, pathlib, sys, time
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from myvariant import MyVariantInfo                                    # noqa: E402
+from services import genome_parser, vcf_reader                         # noqa: E402
+from services.adagio_loader import all_genes                           # noqa: E402
+from services.annotate import MYVARIANT_DELAY, MYVARIANT_URL, annotate_rsids  # noqa: E402
+from services.pipeline import scan                                     # noqa: E402
+from services.rsid_index import RSID_INDEX, RsidIndex, rsid_numbers, save_index, set_rsid_index  # noqa: E402
+
+# where the pipeline reads a variant's gene from, in annotate._gene_symbol_from_hit's order
+GENE_FIELDS = ("gene.symbol", "dbsnp.gene.symbol")
+
+def gene_rsids(gene: str) -> np.ndarray:
+    """Every rsID MyVariant files under this gene symbol, in any field the pipeline reads."""
+    mv = MyVariantInfo(url=MYVARIANT_URL)
+    mv.delay = MYVARIANT_DELAY
+    hits = chain.from_iterable(
+        mv.query(f'{field}:"{gene}"', fields="dbsnp.rsid", species="human", fetch_all=True, verbose=False)
+        for field in GENE_FIELDS
+    )
+    return rsid_numbers(h["dbsnp"]["rsid"] for h in hits if isinstance(h.get("dbsnp", {}).get("rsid"), str))
+
+def from_genes(genes: tuple[str, ...], workers: int) -> np.ndarray:
+    parts = []
+    with ThreadPoolExecutor(workers) as pool:
+        for i, found in enumerate(pool.map(gene_rsids, genes), 1):
+            parts.append(found)
+            if i % 100 == 0 or i == len(genes):
+                print(f"genes: {i}/{len(genes)}, {sum(map(len, parts)):,} rsIDs")
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+def _relevant(rsids: list[str], genes: frozenset) -> list[str]:
+    return [r for r, info in annotate_rsids(rsids).items() if info["gene"] in genes]
+
+def from_files(paths: list[pathlib.Path], genes: frozenset, workers: int, batch_size: int = 1000,
+               quiet: bool = False) -> np.ndarray:
+    """Screen every rsID in the files through MyVariant; keep those in an ADAGIO gene."""
+    kept, seen = [], 0
+    for path in paths:
+        if ".vcf" in path.suffixes:
+            batches = (b for b, _ in vcf_reader.iter_rsid_batches(path, batch_size))
+        else:  # TXT-like: the first column of every non-comment row
+            batches = genome_parser.iter_rsid_batches(path, batch_size, max_rsids=None)
+        with ThreadPoolExecutor(workers) as pool:
+            futures = []
+            for batch in batches:
+                seen += len(batch)
+                futures.append(pool.submit(_relevant, batch, genes))
+            for f in futures:
+                kept += f.result()
+        if not quiet:
+            print(f"{path}: {seen:,} rsIDs screened so far, {len(kept):,} relevant")
+    return rsid_numbers(kept)
+
+def check(index: RsidIndex, paths: list[pathlib.Path]) -> bool:
+    """True if every sample scans to the same genes (and burden) with the index as without it."""
+    ok = True
+    for path in paths:
+        found = {}
+        for name, screen in (("unscreened", None), ("screened", index)):
+            set_rsid_index(screen)
+            found[name] = scan(path, path.name, sys.maxsize, "check_index")  # every row, both times
+        plain, screened = found["unscreened"], found["screened"]
+        missing = sorted(plain.genes - screened.genes)
+        same = not missing and plain.genes == screened.genes and plain.burden == screened.burden
+        print(f"check {path}: {len(plain.genes)} genes from {plain.rsids:,} rsIDs unscreened, "
+              f"{len(screened.genes)} from {screened.rsids:,} screened: {'ok' if same else 'MISMATCH'}")
+        if missing:
+            print(f"  dropped by the index: {', '.join(missing[:20])}{' ...' if len(missing) > 20 else ''}")
+        ok &= same
+    set_rsid_index(None)
+    return ok
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--from", dest="files", type=pathlib.Path, action="append", default=[],
+                   help="candidate TXT/VCF/rsID-list file (repeatable)")
+    p.add_argument("--no-genes", action="store_true", help="skip the per-gene MyVariant queries")
+    p.add_argument("--workers", type=int, default=4, help="concurrent MyVariant requests")
+    p.add_argument("--out", type=pathlib.Path, default=RSID_INDEX)
+    p.add_argument("--check", type=pathlib.Path, action="append", default=[],
+                   help="sample TXT/VCF upload to scan with and without the index (repeatable)")
+    args = p.parse_args()
+    if args.no_genes and not args.files:
+        p.error("nothing to build from: give --from files or drop --no-genes")
+    if args.no_genes:
+        print("warning: --no-genes: uploads with relevant rsIDs missing from the --from files "
+              "will have them dropped without notice")
+
+    t0 = time.perf_counter()
+    genes = all_genes()
+    parts, sources = [], []
+    if not args.no_genes:
+        parts.append(from_genes(genes, args.workers))
+        sources.append(f"myvariant:{'+'.join(GENE_FIELDS)} x {len(genes)} genes")
+    if args.files:
+        parts.append(from_files(args.files, frozenset(g.upper() for g in genes), args.workers))
+        sources += [str(f) for f in args.files]
+
+    index = save_index(np.concatenate(parts), args.out, sources)
+    print(f"{args.out}: {len(index):,} rsIDs ({args.out.stat().st_size / 1e6:.1f} MB) "
+          f"for risk tables {index.version} in {time.perf_counter() - t0:.1f}s")
+    if args.check and not check(index, args.check):
+        sys.exit("the index drops gene hits the pipeline finds without it")
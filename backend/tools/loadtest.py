@@ -0,0 +1,318 @@
+"""
+End-to-end load test for one GeneGuard node.
+
+Starts stub MyVariant and OpenAI servers (with configurable latency and
+error injection) and the API itself pointed at them. The API runs the
+way production does, gunicorn.conf.py with --workers as WEB_CONCURRENCY,
+against a scratch Postgres. The harness then
+drives a weighted mix of uploads, auto-ranks, group and history reads
+from --concurrency virtual users, and reports throughput plus p50/p95/p99
+latency per endpoint.
+
+    # local Postgres, e.g. `docker compose up postgres`
+    python -m tools.loadtest --database-url postgresql://.../geneguard_load \\
+        --concurrency 32 --duration 60 --workers 4
+
+    # slower, flakier upstreams; a different traffic mix
+    python -m tools.loadtest --database-url ... --mv-latency 400 --mv-error-rate 0.02 \\
+        --openai-latency 1500 --mix upload=2,auto_rank=1,groups=4,history=4,group_feed=2
+
+    # stubs only, for an API started some other way (MYVARIANT_URL / OPENAI_BASE_URL)
+    python -m tools.loadtest --stubs-only --stub-port 9100
+
+Upload files come from tools/synthetic_genome.py, and the MyVariant stub
+answers with its rsID-to-gene mapping. 503s from admission control are
+counted as shed load, not errors. The database is migrated and seeded
+with --users users and one group per ten of them.
+"""
+
+import argparse, asyncio, json, os, pathlib, random, subprocess, sys, tempfile, threading, time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import httpx
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# tip_service refuses to import without a key; only the stub ever sees it
+os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+
+from services.disease_ranker import SUPPORTED_DISEASES              # noqa: E402
+from tools.synthetic_genome import gene_for_rsid, write_txt, write_vcf  # noqa: E402
+
+DEFAULT_MIX = "upload=3,auto_rank=2,groups=3,history=3,group_feed=1"
+TIPS = "\n".join(f"{i}. Synthetic tip {i} (NIH)" for i in range(1, 6))
+
+# stub upstreams
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+    settings: dict = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay_or_fail(self, service: str) -> bool:
+        latency = self.settings[f"{service}_latency"] / 1000
+        if latency:
+            time.sleep(latency * random.uniform(0.5, 1.5))
+        if random.random() < self.settings[f"{service}_error_rate"]:
+            self._reply(503 if service == "mv" else 429, {"error": "injected failure"})
+            return True
+        return False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/query"):
+            if self._delay_or_fail("mv"):
+                return
+            out = []
+            # biothings sends each term quoted; MyVariant answers with them bare
+            for rsid in parse_qs(body.decode()).get("q", [""])[0].split(","):
+                rsid = rsid.strip('"')
+                hit = gene_for_rsid(rsid)
+                if hit is None:
+                    out.append({"query": rsid, "notfound": True})
+                    continue
+                record = {"query": rsid, "_id": rsid, "gene": {"symbol": hit[0]}}
+                if hit[1]:
+                    record["snpeff"] = {"ann": [{"impact": hit[1]}]}
+                out.append(record)
+            self._reply(200, out)
+        elif path.endswith("/chat/completions"):
+            if self._delay_or_fail("openai"):
+                return
+            self._reply(200, {"choices": [{"message": {"role": "assistant", "content": TIPS}}]})
+        else:
+            self._reply(404, {"error": "not found"})
+
+def start_stubs(port: int, settings: dict) -> ThreadingHTTPServer:
+    StubHandler.settings = settings
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stubs", daemon=True).start()
+    return server
+
+# the API under test
+def start_app(port: int, workers: int, database_url: str, stub_url: str, log_path: pathlib.Path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "MYVARIANT_URL": stub_url,
+        "OPENAI_BASE_URL": stub_url,
+        "OPENAI_API_KEY": "loadtest",
+        "BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(workers),
+    }
+    log = open(log_path, "w")
+    # the production server: preloaded master, forked workers, bounded drain
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", os.devnull, "main:app"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited with {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{base}/diseases", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"API did not come up; see {log_path}")
+
+def migrate(database_url: str):
+    # routes.database reads DATABASE_URL at import
+    os.environ["DATABASE_URL"] = database_url
+    from tools.migrate import apply_migrations
+    apply_migrations()
+
+async def seed(client: httpx.AsyncClient, users: int) -> dict:
+    """Users loadtest-<i>; every tenth creates a group the next nine join."""
+    uids = [f"loadtest-{i}" for i in range(users)]
+    sem = asyncio.Semaphore(16)
+
+    async def sync(uid):
+        async with sem:
+            r = await client.post("/users/sync", json={
+                "firebase_uid": uid, "email": f"{uid}@example.com", "display_name": uid})
+            r.raise_for_status()
+    await asyncio.gather(*(sync(u) for u in uids))
+
+    groups = {}
+    for i in range(0, users, 10):
+        r = await client.post("/groups", params={"firebase_uid": uids[i]}, json={"name": f"Load {i}"})
+        r.raise_for_status()
+        group = r.json()
+        groups[uids[i]] = group["id"]
+        for uid in uids[i + 1:i + 10]:
+            r = await client.post("/groups/join", params={"firebase_uid": uid},
+                                  json={"invite_code": group["invite_code"]})
+            if r.status_code not in (200, 400):  # 400 = already a member, from an earlier run
+                r.raise_for_status()
+            groups[uid] = group["id"]
+    return {"uids": uids, "groups": groups}
+
+# traffic
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in REQUESTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name} (known: {', '.join(REQUESTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def _upload(uploads: list) -> dict:
+    name, data = random.choice(uploads)
+    return {"file": (name, data)}
+
+def _limit(ctx: dict) -> dict:
+    return {"max_records": ctx["max_records"]} if ctx["max_records"] else {}
+
+REQUESTS = {
+    "upload": lambda c, uid, ctx: c.post("/upload-genome", files=_upload(ctx["uploads"]), params={
+        "disease": random.choice(SUPPORTED_DISEASES), "firebase_uid": uid, **_limit(ctx)}),
+    "auto_rank": lambda c, uid, ctx: c.post("/auto-rank", files=_upload(ctx["uploads"]), params=_limit(ctx)),
+    "groups": lambda c, uid, ctx: c.get(f"/groups/{uid}"),
+    "history": lambda c, uid, ctx: c.get(f"/users/{uid}/analyses"),
+    "group_feed": lambda c, uid, ctx: c.get(f"/groups/{ctx['groups'][uid]}/analyses",
+                                            params={"firebase_uid": uid}),
+}
+
+async def virtual_user(client, ctx: dict, mix: dict, stop_at: float, results: dict):
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < stop_at:
+        name = random.choices(names, weights)[0]
+        uid = random.choice(ctx["uids"])
+        t0 = time.perf_counter()
+        try:
+            status = (await REQUESTS[name](client, uid, ctx)).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results[name].append((time.perf_counter() - t0, status))
+
+def _pct(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def report(results: dict, elapsed: float) -> dict:
+    out = {}
+    print(f"\n{'endpoint':<12} {'reqs':>7} {'ok':>7} {'shed':>6} {'errors':>7} {'req/s':>8}"
+          f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, samples in sorted(results.items()):
+        ok = sorted(t for t, s in samples if isinstance(s, int) and s < 400)
+        shed = sum(1 for _, s in samples if s == 503)
+        errors = defaultdict(int)
+        for _, s in samples:
+            if not (isinstance(s, int) and s < 400) and s != 503:
+                errors[str(s)] += 1
+        row = {
+            "requests": len(samples), "ok": len(ok), "shed": shed, "errors": dict(errors),
+            "ok_per_s": round(len(ok) / elapsed, 2),
+            **{f"p{p}_ms": round(_pct(ok, p) * 1000, 1) for p in (50, 95, 99)},
+            "max_ms": round(ok[-1] * 1000, 1) if ok else 0.0,
+        }
+        out[name] = row
+        print(f"{name:<12} {row['requests']:>7} {row['ok']:>7} {shed:>6} {sum(errors.values()):>7}"
+              f" {row['ok_per_s']:>8} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+        if errors:
+            print(f"{'':<12} errors: {', '.join(f'{k} x{v}' for k, v in sorted(errors.items()))}")
+    total_ok = sum(r["ok"] for r in out.values())
+    print(f"\n{total_ok} ok in {elapsed:.1f}s = {total_ok / elapsed:.1f} req/s")
+    return out
+
+async def drive(base: str, args, uploads: list) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+        ctx = {**await seed(client, args.users), "uploads": uploads, "max_records": args.max_records}
+        results = defaultdict(list)
+        print(f"driving {args.concurrency} virtual users for {args.duration}s against {base}")
+        t0 = time.monotonic()
+        await asyncio.gather(*(virtual_user(client, ctx, parse_mix(args.mix), t0 + args.duration, results)
+                               for _ in range(args.concurrency)))
+        return report(results, time.monotonic() - t0)
+
+def make_uploads(tmp: pathlib.Path, args) -> list:
+    files = []
+    if args.txt_rows:
+        write_txt(tmp / "chip.txt", args.txt_rows, args.hit_rate, args.seed)
+        files.append(("chip.txt", (tmp / "chip.txt").read_bytes()))
+    if args.vcf_rows:
+        write_vcf(tmp / "genome.vcf.gz", args.vcf_rows, args.hit_rate, args.seed, multiallelic=0.02)
+        files.append(("genome.vcf.gz", (tmp / "genome.vcf.gz").read_bytes()))
+    return files
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--database-url", help="scratch database; never production")
+    p.add_argument("--target", help="drive an API that is already running instead of starting one")
+    p.add_argument("--stubs-only", action="store_true", help="just serve the stub upstreams until Ctrl-C")
+    p.add_argument("--port", type=int, default=8800, help="API port when the harness starts it")
+    p.add_argument("--workers", type=int, default=1, help="gunicorn workers for the API (WEB_CONCURRENCY)")
+    p.add_argument("--app-log", type=pathlib.Path, default=pathlib.Path(tempfile.gettempdir()) / "geneguard_loadtest_api.log")
+    p.add_argument("--stub-port", type=int, default=8801)
+    p.add_argument("--mv-latency", type=float, default=150, help="MyVariant stub latency per request (ms)")
+    p.add_argument("--mv-error-rate", type=float, default=0.0)
+    p.add_argument("--openai-latency", type=float, default=800, help="OpenAI stub latency per request (ms)")
+    p.add_argument("--openai-error-rate", type=float, default=0.0)
+    p.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    p.add_argument("--duration", type=float, default=30, help="seconds of traffic")
+    p.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    p.add_argument("--users", type=int, default=200, help="users to seed")
+    p.add_argument("--txt-rows", type=int, default=20_000, help="rows in the TXT upload (0 = none)")
+    p.add_argument("--vcf-rows", type=int, default=20_000, help="records in the VCF upload (0 = none)")
+    p.add_argument("--hit-rate", type=float, default=0.05)
+    p.add_argument("--max-records", type=int, help="rows read per upload (default: the server's limit)")
+    p.add_argument("--timeout", type=float, default=120)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=pathlib.Path, help="write the report here (JSON)")
+    args = p.parse_args()
+
+    stub_settings = {"mv_latency": args.mv_latency, "mv_error_rate": args.mv_error_rate,
+                     "openai_latency": args.openai_latency, "openai_error_rate": args.openai_error_rate}
+    stubs = start_stubs(args.stub_port, stub_settings)
+    stub_url = f"http://127.0.0.1:{args.stub_port}/v1"
+    if args.stubs_only:
+        print(f"stubs on {stub_url}; set MYVARIANT_URL and OPENAI_BASE_URL to it")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    if not args.target and not args.database_url:
+        p.error("--database-url is required unless --target or --stubs-only is given")
+
+    random.seed(args.seed)
+    app = None
+    with tempfile.TemporaryDirectory(prefix="geneguard_load_") as tmp:
+        tmp = pathlib.Path(tmp)
+        uploads = make_uploads(tmp, args)
+        try:
+            if args.target:
+                base = args.target.rstrip("/")
+            else:
+                migrate(args.database_url)
+                app, base = start_app(args.port, args.workers, args.database_url, stub_url, args.app_log)
+            result = asyncio.run(drive(base, args, uploads))
+        finally:
+            if app is not None:
+                app.terminate()
+                app.wait(timeout=int(os.getenv("GRACEFUL_TIMEOUT", "140")) + 10)
+            stubs.shutdown()
+
+    if args.out:
+        args.out.write_text(json.dumps({"args": vars(args), "endpoints": result}, indent=2, default=str) + "\n")
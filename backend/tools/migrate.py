@@ -0,0 +1,74 @@
+"""
+Apply the SQL migrations in backend/migrations to DATABASE_URL.
+
+Each NNNN_name.sql file runs once, in order, in its own transaction, and
+is recorded in schema_migrations. A Postgres advisory lock keeps two
+containers starting at the same time from racing each other.
+
+    python -m tools.migrate            # apply pending migrations
+    python -m tools.migrate --status   # list applied / pending
+"""
+
+import argparse, pathlib, sys
+from sqlalchemy import text
+
+ROOT           = pathlib.Path(__file__).resolve().parents[1]
+MIGRATIONS_DIR = ROOT / "migrations"
+LOCK_KEY       = 0x6E6E6775  # arbitrary, constant per app
+
+sys.path.insert(0, str(ROOT))
+from routes.database import engine  # noqa: E402
+
+def migration_files() -> list[pathlib.Path]:
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.sql"))
+
+def applied_versions(conn) -> set[str]:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     TEXT PRIMARY KEY,
+            applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """))
+    versions = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+    conn.commit()
+    return versions
+
+def apply_migrations(eng=engine) -> list[str]:
+    """Apply pending migrations; return the versions that ran."""
+    ran = []
+    with eng.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        conn.commit()
+        try:
+            done = applied_versions(conn)
+            for fp in migration_files():
+                version = fp.stem
+                if version in done:
+                    continue
+
+                with conn.begin():
+                    conn.exec_driver_sql(fp.read_text())
+                    conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+                ran.append(version)
+                print(f"applied {version}")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+
+    return ran
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--status", action="store_true", help="show applied / pending and exit")
+    args = p.parse_args()
+
+    if args.status:
+        with engine.connect() as conn:
+            done = applied_versions(conn)
+        for fp in migration_files():
+            print(f"{'applied' if fp.stem in done else 'pending'}  {fp.stem}")
+        sys.exit(0)
+
+    ran = apply_migrations()
+    if not ran:
+        print("schema up to date")
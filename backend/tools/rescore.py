@@ -0,0 +1,130 @@
+"""
+Re-score stored analyses against the current ADAGIO tables.
+
+Every analysis saved with its inputs (analysis_inputs) records the risk
+table version it was scored with. After a table refresh this job picks up
+the stale ones in batches, scores them with the vectorized path (no
+parsing, no annotation), and swaps their risk rows and summaries in one
+transaction per batch. Tips already stored for a gene are reused; only
+genes new to an analysis go to the tip service. The bump to scored_at
+changes the analyses' cache version and ETag (routes/http_cache.py), so
+the servers' caches and clients stop using the old bodies.
+
+    python -m tools.rescore                      # re-score everything stale
+    python -m tools.rescore --disease T2D --dry-run
+    python -m tools.rescore --no-new-tips        # never call the tip service
+"""
+
+import argparse, pathlib, sys, time
+from collections import defaultdict
+from sqlalchemy import text
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from routes.database import SessionLocal                  # noqa: E402
+from routes.database_routes import write_risks            # noqa: E402
+from services.adagio_loader import risk_table_version     # noqa: E402
+from services.risk_annotator import score_many            # noqa: E402
+
+STALE_QUERY = text("""
+    SELECT ai.analysis_id, ga.disease, ai.genes
+    FROM analysis_inputs ai
+    JOIN genetic_analyses ga ON ga.id = ai.analysis_id
+    WHERE ai.risk_table_version <> :version
+        AND (CAST(:disease AS TEXT) IS NULL OR ga.disease = :disease)
+        AND (CAST(:after AS UUID) IS NULL OR ai.analysis_id > CAST(:after AS UUID))
+    ORDER BY ai.analysis_id
+    LIMIT :limit
+""")
+
+TIPS_QUERY = text("""
+    SELECT rr.analysis_id, rr.gene, r.tip_text
+    FROM risk_results rr
+    JOIN recommendations r ON r.risk_result_id = rr.id
+    WHERE rr.analysis_id = ANY(CAST(:ids AS UUID[]))
+    ORDER BY rr.analysis_id, rr.gene, r.tip_order
+""")
+
+def existing_tips(db, ids: list[str]) -> dict:
+    """(analysis_id, gene) -> stored tips, so unchanged genes keep theirs."""
+    tips = defaultdict(list)
+    for analysis_id, gene, tip in db.execute(TIPS_QUERY, {"ids": ids}):
+        tips[(str(analysis_id), gene)].append(tip)
+    return tips
+
+def rescore_batch(db, rows, version: str, new_tips: bool) -> int:
+    by_disease = defaultdict(list)
+    for analysis_id, disease, genes in rows:
+        by_disease[disease].append((str(analysis_id), genes))
+
+    tips = existing_tips(db, [str(r[0]) for r in rows])
+    if new_tips:
+        from services.tip_service import get_tips
+
+    for disease, items in by_disease.items():
+        scored = score_many(disease, [genes for _, genes in items])
+        for (analysis_id, genes), risks in zip(items, scored):
+            for risk in risks:
+                key = (analysis_id, risk["gene"])
+                if key in tips:
+                    risk["tips"] = tips[key]
+                elif new_tips:
+                    risk["tips"] = get_tips(risk["gene"], disease)
+
+            db.execute(text("""
+                DELETE FROM risk_results
+                WHERE analysis_id = :analysis_id
+            """), {"analysis_id": analysis_id})
+            write_risks(db, analysis_id, len(genes), risks)
+
+    db.execute(text("""
+        UPDATE analysis_inputs
+        SET risk_table_version = :version, scored_at = now()
+        WHERE analysis_id = ANY(CAST(:ids AS UUID[]))
+    """), {"version": version, "ids": [str(r[0]) for r in rows]})
+    return len(rows)
+
+def rescore(batch_size: int = 500, disease: str = None, dry_run: bool = False, new_tips: bool = True) -> int:
+    version = risk_table_version()
+    done, after = 0, None
+    t0 = time.perf_counter()
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(STALE_QUERY, {
+                "version": version,
+                "disease": disease,
+                "after": after,
+                "limit": batch_size
+            }).fetchall()
+            if not rows:
+                break
+            after = str(rows[-1][0])
+
+            if dry_run:
+                done += len(rows)
+                db.rollback()
+                continue
+
+            done += rescore_batch(db, rows, version, new_tips)
+            db.commit()
+            print(f"re-scored {done} analyses ({time.perf_counter() - t0:.1f}s)")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return done
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--batch-size", type=int, default=500)
+    p.add_argument("--disease", help="only re-score analyses for this disease")
+    p.add_argument("--dry-run", action="store_true", help="count stale analyses and exit")
+    p.add_argument("--no-new-tips", action="store_true", help="don't fetch tips for genes that have none stored")
+    args = p.parse_args()
+
+    n = rescore(args.batch_size, args.disease, args.dry_run, not args.no_new_tips)
+    print(f"{'stale' if args.dry_run else 're-scored'}: {n} analyses at table version {risk_table_version()}")
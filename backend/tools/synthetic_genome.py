@@ -0,0 +1,162 @@
+"""
+Seeded, offline generator for large synthetic genome files.
+
+Unlike sample_file_generator.py (a few hundred rows, rsIDs looked up on
+myvariant.info), this needs no network: "hit" rsIDs come from a reserved
+range above any real dbSNP ID and map deterministically onto the genes of
+the local ADAGIO tables (see gene_for_rsid). The MyVariant stubs in
+tools/bench_pipeline.py and tools/loadtest.py answer with that mapping,
+so a file's hit rate is exactly what was asked for. Every other rsID is
+an ordinary-looking ID the stubs report as not found.
+
+    # consumer chip (23andMe-style TXT), 30% of rows in ADAGIO genes
+    python -m tools.synthetic_genome chip.txt --rows 640000 --hit-rate 0.3
+
+    # WGS-scale VCF, gzip-compressed, hits only in T2D genes
+    python -m tools.synthetic_genome wgs.vcf.gz --rows 5000000 --hit-rate 0.001 --disease T2D
+
+    # multi-sample VCF with multi-allelic sites and missing IDs
+    python -m tools.synthetic_genome cohort.vcf.gz --rows 200000 --samples 50 \\
+        --multiallelic 0.05 --missing-ids 0.1
+
+The same --seed always produces the same file. Rows are built in NumPy
+chunks and streamed to disk, so memory stays flat whatever --rows is.
+"""
+
+import argparse, gzip, pathlib, sys, time
+from typing import Optional
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from services.adagio_loader import all_genes, get_risk_table  # noqa: E402
+
+# dbSNP is at ~rs2.2e9; IDs from here up never collide with a real one
+HIT_BASE = 5_000_000_000
+IMPACTS = ["HIGH", "MODERATE", "LOW", None]  # the impacts burden.IMPACT_WEIGHT knows
+CHROMS = [str(c) for c in range(1, 23)] + ["X"]
+BASES = np.array(list("ACGT"))
+CHUNK = 100_000
+
+def gene_for_rsid(rsid: str) -> Optional[tuple[str, Optional[str]]]:
+    """(gene, snpEff impact) for a synthetic hit rsID, else None; hit rsIDs index into all_genes()."""
+    try:
+        n = int(rsid[2:]) - HIT_BASE
+    except ValueError:
+        return None
+    if n < 0:
+        return None
+    genes = all_genes()
+    return genes[n % len(genes)], IMPACTS[(n // len(genes)) % len(IMPACTS)]
+
+def _hit_indexes(disease: Optional[str]) -> np.ndarray:
+    genes = all_genes()
+    if disease is None:
+        return np.arange(len(genes))
+    wanted = set(get_risk_table(disease).index)
+    return np.array([i for i, g in enumerate(genes) if g in wanted])
+
+def _rows(rows: int, hit_rate: float, seed: int, disease: Optional[str], missing_ids: float):
+    """Yield chunks of (chrom, positions, rsids, hits in chunk, rng), sorted by chromosome then position."""
+    rng = np.random.default_rng(seed)
+    genes = len(all_genes())
+    hit_idx = _hit_indexes(disease)
+    per_chrom = np.diff(np.linspace(0, rows, len(CHROMS) + 1).astype(np.int64))
+    hits = misses = 0
+
+    for chrom, n_chrom in zip(CHROMS, per_chrom):
+        pos = 0
+        for start in range(0, n_chrom, CHUNK):
+            n = min(CHUNK, n_chrom - start)
+            pos = pos + np.cumsum(rng.integers(1, 2_000, n))
+            is_hit = rng.random(n) < hit_rate
+            k = int(is_hit.sum())
+
+            ids = np.empty(n, dtype=object)
+            # replica counter * genes + gene index: unique, and gene_for_rsid reverses it
+            gi = rng.choice(hit_idx, k)
+            ids[is_hit] = [f"rs{HIT_BASE + (hits + j) * genes + g}" for j, g in enumerate(gi.tolist())]
+            ids[~is_hit] = [f"rs{1_000 + (misses + j) * 7}" for j in range(n - k)]
+            if missing_ids:
+                ids[~is_hit & (rng.random(n) < missing_ids)] = "."
+            hits, misses = hits + k, misses + n - k
+
+            yield chrom, pos, ids, k, rng
+            pos = pos[-1]
+
+def _open(path: pathlib.Path, compresslevel: int):
+    if path.suffix == ".gz":
+        return gzip.open(path, "wt", compresslevel=compresslevel)
+    return open(path, "w")
+
+def write_txt(path, rows: int, hit_rate: float, seed: int = 0, disease: Optional[str] = None,
+              compresslevel: int = 1) -> dict:
+    """A 23andMe-style raw data file: rsid, chromosome, position, genotype."""
+    path, hits = pathlib.Path(path), 0
+    with _open(path, compresslevel) as f:
+        f.write("# This data file generated by GeneGuard tools.synthetic_genome\n")
+        f.write("# rsid\tchromosome\tposition\tgenotype\n")
+        for chrom, pos, ids, k, rng in _rows(rows, hit_rate, seed, disease, 0.0):
+            gt = np.char.add(BASES[rng.integers(0, 4, len(ids))], BASES[rng.integers(0, 4, len(ids))])
+            f.write("".join(f"{r}\t{chrom}\t{p}\t{g}\n" for r, p, g in zip(ids, pos.tolist(), gt.tolist())))
+            hits += k
+    return {"path": str(path), "rows": rows, "hits": hits}
+
+def write_vcf(path, rows: int, hit_rate: float, seed: int = 0, disease: Optional[str] = None,
+              samples: int = 1, multiallelic: float = 0.0, missing_ids: float = 0.0,
+              compresslevel: int = 1) -> dict:
+    """A VCF 4.2 file with GT for `samples` samples (0 for sites only)."""
+    path, hits = pathlib.Path(path), 0
+    names = [f"SAMPLE{i + 1}" for i in range(samples)]
+    with _open(path, compresslevel) as f:
+        f.write("##fileformat=VCFv4.2\n##source=GeneGuardSynthetic\n")
+        f.writelines(f"##contig=<ID={c}>\n" for c in CHROMS)
+        if samples:
+            f.write('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n')
+        f.write("\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+                          + (["FORMAT"] + names if samples else [])) + "\n")
+
+        for chrom, pos, ids, k, rng in _rows(rows, hit_rate, seed, disease, missing_ids):
+            n = len(ids)
+            ref = rng.integers(0, 4, n)
+            alt1 = (ref + rng.integers(1, 4, n)) % 4
+            alt2 = (alt1 + rng.integers(1, 3, n)) % 4
+            alt2 = np.where(alt2 == ref, (alt2 + 1) % 4, alt2)
+            multi = rng.random(n) < multiallelic
+            alts = np.where(multi, np.char.add(np.char.add(BASES[alt1], ","), BASES[alt2]), BASES[alt1])
+
+            if samples:
+                gts = np.array(["0/0", "0/1", "1/1", "./."])[rng.choice(4, (n, samples), p=[.6, .25, .14, .01])]
+                tails = ["\tGT\t" + "\t".join(row) for row in gts.tolist()]
+            else:
+                tails = [""] * n
+
+            f.write("".join(
+                f"{chrom}\t{p}\t{r}\t{BASES[rf]}\t{a}\t50\tPASS\t.{t}\n"
+                for p, r, rf, a, t in zip(pos.tolist(), ids, ref.tolist(), alts.tolist(), tails)
+            ))
+            hits += k
+    return {"path": str(path), "rows": rows, "hits": hits}
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("out", type=pathlib.Path, help=".txt, .vcf or .vcf.gz; the suffix picks the format")
+    p.add_argument("--rows", type=int, default=640_000)
+    p.add_argument("--hit-rate", type=float, default=0.01, help="share of rows inside an ADAGIO gene")
+    p.add_argument("--disease", help="only hit this disease's genes (stem of adagio_*.json)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--samples", type=int, default=1, help="VCF genotype columns (0 = sites only)")
+    p.add_argument("--multiallelic", type=float, default=0.0, help="share of VCF sites with two ALTs")
+    p.add_argument("--missing-ids", type=float, default=0.0, help="share of non-hit VCF sites with ID '.'")
+    p.add_argument("--compresslevel", type=int, default=1, help="gzip level for .gz output")
+    args = p.parse_args()
+
+    t0 = time.perf_counter()
+    if ".vcf" in args.out.suffixes:
+        res = write_vcf(args.out, args.rows, args.hit_rate, args.seed, args.disease,
+                        args.samples, args.multiallelic, args.missing_ids, args.compresslevel)
+    else:
+        res = write_txt(args.out, args.rows, args.hit_rate, args.seed, args.disease, args.compresslevel)
+    print(f"{res['path']}: {res['rows']:,} rows, {res['hits']:,} hits "
+          f"in {time.perf_counter() - t0:.1f}s ({args.out.stat().st_size / 1e6:.1f} MB)")